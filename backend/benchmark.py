@@ -0,0 +1,532 @@
+"""Micro-benchmarks for the research agent backend.
+
+Run from the backend directory, e.g. `python benchmark.py retrieval --sizes 1000 10000`.
+"""
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import main
+
+
+def _timeit(fn, reps: int) -> float:
+    start = time.perf_counter()
+    for _ in range(reps):
+        fn()
+    return (time.perf_counter() - start) / reps
+
+
+def _fmt(seconds: float) -> str:
+    return f"{seconds * 1e3:10.3f} ms" if seconds >= 1e-3 else f"{seconds * 1e6:10.1f} µs"
+
+
+# ─── RAG Retrieval ────────────────────────────────────────────
+def synthetic_chunks(n: int, seed: int = 7):
+    rng = random.Random(seed)
+    vocab = sorted({w for doc in main.ECOMMERCE_KNOWLEDGE for s in doc["sections"] for w in main.text_to_vector(s["content"])})
+    vocab += [f"term{i}" for i in range(5000)]
+    weights = [1 / (i + 1) for i in range(len(vocab))]
+    rng.shuffle(weights)
+    return [{"id": f"syn-{i}", "document_id": "syn", "chunk_index": i, "text": " ".join(rng.choices(vocab, weights, k=rng.randint(40, 90))),
+             "section": f"Section {i}", "page": i, "category": "synthetic", "title": "Synthetic"} for i in range(n)]
+
+
+def bench_retrieval(sizes, reps: int, batch: int):
+    queries = ["winning product rising google trends low competition", "amazon ppc acos launch budget",
+               "supplier samples moq certifications", "pricing margin landed cost shipping", "tiktok viral saturation window"]
+    for n in sizes:
+        chunks = synthetic_chunks(n)
+        main.knowledge_chunks[:] = chunks
+        print(f"\n{n:,} chunks")
+
+        def scan():
+            for q in queries:
+                qv = main.text_to_vector(q)
+                scored = [(main.cosine_sim(qv, main.text_to_vector(c["text"])), c) for c in chunks]
+                scored.sort(key=lambda x: x[0], reverse=True)
+        print(f"  linear cosine scan      {_fmt(_timeit(scan, 1) / len(queries))} / query")
+
+        main.chunk_index = main.InvertedIndex(lambda c: c["text"])
+        build = _timeit(lambda: main.chunk_index.sync(chunks), 1)
+        per_q = _timeit(lambda: [main.retrieve_chunks(q) for q in queries], reps) / len(queries)
+        print(f"  retrieve_chunks (index) {_fmt(per_q)} / query   build {_fmt(build)}")
+
+        if main.sparse is None:
+            print("  scipy not installed — skipping TF-IDF / BM25 engine")
+            continue
+        batch_queries = [queries[i % len(queries)] for i in range(batch)]
+        extra = synthetic_chunks(100, seed=8)
+        for mode in ("tfidf", "bm25"):
+            main.knowledge_chunks[:] = chunks
+            main.chunk_index = main.VectorIndex(lambda c: c["text"], mode)
+            build = _timeit(lambda: main.chunk_index.sync(main.knowledge_chunks), 1)
+            per_q = _timeit(lambda: [main.retrieve_chunks(q) for q in queries], reps) / len(queries)
+            per_b = _timeit(lambda: main.retrieve_chunks_batch(batch_queries), reps) / batch
+            print(f"  {mode:<6} single query      {_fmt(per_q)} / query   build {_fmt(build)}")
+            print(f"  {mode:<6} batch of {batch:<4}     {_fmt(per_b)} / query")
+            appends = []
+            for k in (1, 99):  # the appended documents stay in the delta block
+                main.knowledge_chunks.extend(extra[:k]); del extra[:k]
+                appends.append(_timeit(lambda: main.chunk_index.sync(main.knowledge_chunks), 1))
+            per_q = _timeit(lambda: [main.retrieve_chunks(q) for q in queries], reps) / len(queries)
+            print(f"  {mode:<6} + delta block     {_fmt(per_q)} / query   append 1 {_fmt(appends[0])}, 99 {_fmt(appends[1])}")
+            extra = synthetic_chunks(100, seed=8)
+
+
+# ─── CSV Parsing ──────────────────────────────────────────────
+def synthetic_export(n: int, seed: int = 11) -> str:
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    out = io.StringIO()
+    out.write("Order Date,Product Name,Revenue,Cost,Quantity,Category,Store\n")
+    for _ in range(n):
+        date = (start + timedelta(days=rng.randrange(540))).strftime("%m/%d/%Y")
+        out.write(f'{date},Product {rng.randrange(500)},"${rng.uniform(5, 2500):,.2f}",{rng.uniform(1, 40):.2f},{rng.randint(1, 6)},Category {rng.randrange(12)},Store {rng.randrange(4)}\n')
+    return out.getvalue()
+
+
+def legacy_parse_sales_csv(content: str, filename: str):
+    """The original row-at-a-time parser, kept here as the benchmark baseline."""
+    parsed = []
+    reader = csv.DictReader(io.StringIO(content))
+    col_map = main._sales_col_map(reader.fieldnames or [])
+    if col_map is None:
+        return []
+    for row in reader:
+        try:
+            date_str = row.get(col_map["date"], "").strip()
+            product = row.get(col_map.get("product", ""), "Unknown").strip()
+            rev_str = row.get(col_map["revenue"], "0").strip().replace("$", "").replace(",", "")
+            revenue = float(rev_str)
+            cost_str = row.get(col_map.get("cost", ""), "0").strip().replace("$", "").replace(",", "")
+            cost = float(cost_str) if cost_str else revenue * 0.3
+            qty_str = row.get(col_map.get("quantity", ""), "1").strip()
+            qty = int(float(qty_str)) if qty_str else 1
+            date_parsed = None
+            for fmt in ["%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%d/%m/%Y", "%Y/%m/%d"]:
+                try:
+                    date_parsed = datetime.strptime(date_str, fmt); break
+                except ValueError:
+                    continue
+            if not date_parsed:
+                continue
+            ad_spend = round(revenue * random.uniform(0.10, 0.25), 2)
+            fee = round(revenue * random.uniform(0.03, 0.15), 2)
+            profit = round(revenue - cost - ad_spend - fee, 2)
+            parsed.append({
+                "id": str(uuid.uuid4()), "date": date_parsed.strftime("%Y-%m-%d"),
+                "product_name": product, "category": row.get(col_map.get("category", ""), "Uncategorized").strip() or "Uncategorized",
+                "store": row.get(col_map.get("store", ""), "Uploaded Store").strip() or "Uploaded Store",
+                "quantity": qty, "revenue": round(revenue, 2), "cost": round(cost, 2),
+                "ad_spend": ad_spend, "platform_fee": fee, "profit": profit,
+                "margin_pct": round(profit / revenue * 100, 1) if revenue > 0 else 0, "source": "uploaded",
+            })
+        except (ValueError, KeyError):
+            continue
+    return parsed
+
+
+def bench_csv(rows: int, workers, sizes):
+    content = synthetic_export(rows)
+    print(f"{rows:,} rows, {len(content) / 1e6:.1f} MB")
+    start = time.perf_counter()
+    n_old = len(legacy_parse_sales_csv(content, "bench.csv"))
+    old = time.perf_counter() - start
+    start = time.perf_counter()
+    n_new = sum(len(b["day"]) for b in main.parse_sales_csv(io.StringIO(content), "bench.csv"))
+    new = time.perf_counter() - start
+    print(f"  legacy parse_sales_csv  {n_old / old:12,.0f} rows/s  ({old:.2f} s)")
+    print(f"  parse_sales_csv         {n_new / new:12,.0f} rows/s  ({new:.2f} s)  {old / new:.1f}x")
+    # The parallel path at and above SALES_PARALLEL_MIN_BYTES. One worker shows what the pool itself
+    # costs (spawn, splitting, shipping batches back); the share of parsing in a whole in-memory
+    # ingest bounds what more workers can save on an upload.
+    per_row = len(content.encode()) / rows
+    for scale in sizes:
+        data = synthetic_export(int(main.SALES_PARALLEL_MIN_BYTES * scale / per_row)).encode()
+        print(f"{len(data) / 2**20:.0f} MiB ({scale:g}x SALES_PARALLEL_MIN_BYTES)")
+        start = time.perf_counter()
+        n_ser = sum(len(b["day"]) for b in main.parse_sales_csv(io.TextIOWrapper(io.BytesIO(data), encoding="utf-8", newline=""), "bench.csv"))
+        ser = time.perf_counter() - start
+        print(f"  parse_sales_csv         {n_ser / ser:12,.0f} rows/s  ({ser:.2f} s)")
+        for w in workers:
+            main.SALES_PARSE_WORKERS, main._process_pool = w, None
+            start = time.perf_counter()
+            list(main.get_process_pool().map(abs, range(w)))  # spawn the workers outside the timing
+            spawn = time.perf_counter() - start
+            start = time.perf_counter()
+            n_par = sum(len(b["day"]) for b in main.parse_sales_parallel(io.BytesIO(data), "bench.csv"))
+            par = time.perf_counter() - start
+            main.get_process_pool().shutdown()
+            assert n_par == n_ser, "parallel parse kept different rows"
+            print(f"  parse_sales_parallel {w:>2} {n_par / par:12,.0f} rows/s  ({par:.2f} s)  {ser / par:.2f}x serial, spawn {spawn:.2f} s")
+        main.SALES_PARSE_WORKERS, main.sales_data = 1, main.MemoryStorage().sales
+        start = time.perf_counter()
+        main.ingest_sales_file(io.BytesIO(data), "bench.csv")
+        ingest = time.perf_counter() - start
+        print(f"  ingest (memory store)   {n_ser / ingest:12,.0f} rows/s  ({ingest:.2f} s)  parsing {ser / ingest:.0%} of it")
+
+
+# ─── Storage Backends ─────────────────────────────────────────
+def bench_storage(rows: int, reps: int):
+    content = synthetic_export(rows).encode()
+    print(f"{rows:,} rows")
+    end = datetime(2024, 1, 1) + timedelta(days=540)  # synthetic_export's date range
+    cutoffs = [(m, end - timedelta(days=30 * m)) for m in (1, 3, 12)]
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = {"memory": main.MemoryStorage(), "sqlite": main.SQLiteStorage(os.path.join(tmp, "bench.db"))}
+        summaries = {}
+        for name, storage in backends.items():
+            main.sales_data = storage.sales
+            start = time.perf_counter()
+            main.ingest_sales_file(io.BytesIO(content), "bench.csv")
+            ingest = time.perf_counter() - start
+            summaries[name] = [storage.sales.summarize(c) for _, c in cutoffs]
+            per = [_timeit(lambda: storage.sales.summarize(c), reps) for _, c in cutoffs]
+            print(f"  {name:<7} ingest {rows / ingest:10,.0f} rows/s   summary " + "  ".join(f"{m}mo {_fmt(t)}" for (m, _), t in zip(cutoffs, per)))
+    for a, b in zip(*summaries.values()):
+        assert {k: sorted(v) if isinstance(v, list) else v for k, v in a.items()} == \
+               {k: sorted(v) if isinstance(v, list) else v for k, v in b.items()}, "backends disagree"
+
+
+# ─── Product Scoring ──────────────────────────────────────────
+def bench_score(products: int, reps: int):
+    rng = random.Random(5)
+    prods = [{"title": f"Product {i}", "price": round(rng.uniform(5, 300), 2), "seller_count": rng.randint(2, 60),
+              "rating": round(rng.uniform(2.5, 5), 1), "fba_available": rng.random() < 0.7} for i in range(products)]
+    comps = [[{"review_count": rng.randint(10, 5000)} for _ in range(rng.randint(3, 10))] for _ in prods]
+    velocity = [round(rng.uniform(-40, 90), 1) for _ in prods]
+    avg_reviews = [sum(c["review_count"] for c in cl) / len(cl) for cl in comps]
+    print(f"{products:,} products")
+    loop = [main.score_product(p, {"trend_velocity": v}, cl) for p, v, cl in zip(prods, velocity, comps)]
+    assert main.score_products_batch(prods, velocity, avg_reviews) == loop, "batch scores differ from score_product"
+    t_loop = _timeit(lambda: [main.score_product(p, {"trend_velocity": v}, cl) for p, v, cl in zip(prods, velocity, comps)], reps)
+    t_batch = _timeit(lambda: main.score_products_batch(prods, velocity, avg_reviews), reps)
+
+    def ranked_top50():
+        scores = main.score_arrays(prods, velocity, avg_reviews)
+        return main.score_rows(scores, main.np.argsort(-scores["composite"], kind="stable")[:50])
+    t_rank = _timeit(ranked_top50, reps)
+    print(f"  score_product loop      {products / t_loop:12,.0f} products/s")
+    print(f"  score_products_batch    {products / t_batch:12,.0f} products/s  {t_loop / t_batch:.1f}x  (identical results)")
+    print(f"  score_arrays + top 50   {products / t_rank:12,.0f} products/s  {t_loop / t_rank:.1f}x  (ranked, as /api/v1/score/batch)")
+
+
+# ─── Trend Comparison ─────────────────────────────────────────
+def legacy_compare(niches, days: int, window: int, points: int) -> list:
+    """Per-niche dict series from generate_mock_trends, with the statistics in Python loops."""
+    out = []
+    for niche in niches:
+        values = [p["interest"] for p in main.generate_mock_trends(niche, days)["interest_over_time"]]
+        roll = [sum(values[k:k + window]) / window for k in range(days - window + 1)]
+        mx, my = (days - 1) / 2, sum(values) / days
+        slope = sum((x - mx) * (y - my) for x, y in enumerate(values)) / sum((x - mx) ** 2 for x in range(days))
+        step = -(-days // points)
+        off = days % step
+        series = [sum(values[i:i + step]) / step for i in range(off, days, step)]
+        out.append({"niche": niche, "velocity": (roll[-1] - roll[0]) / max(roll[0], 1) * 100, "slope": slope, "series": series})
+    return out
+
+
+def bench_trends(niches: int, days: int, reps: int):
+    names = main.PRODUCT_NICHES + [f"Bench Niche {i}" for i in range(max(0, niches - len(main.PRODUCT_NICHES)))]
+    names = names[:niches]
+    print(f"{len(names)} niches x {days} days")
+    t_legacy = _timeit(lambda: legacy_compare(names, days, 7, main.TREND_COMPARE_POINTS), 1)
+
+    def cold():
+        main.tool_cache.clear()
+        return main.tool_compare_trends(names, days)
+    t_cold = _timeit(cold, reps)
+    t_warm = _timeit(lambda: main.tool_compare_trends(names, days), reps)
+    legacy_bytes = len(json.dumps([main.generate_mock_trends(n, days) for n in names]).encode())
+    body = main.FastJSONResponse(main.tool_compare_trends(names, days)).body
+    print(f"  dict series + loops     {_fmt(t_legacy)}   {legacy_bytes:12,} bytes of per-niche trends")
+    print(f"  compare, cold series    {_fmt(t_cold)}   {t_legacy / t_cold:.1f}x")
+    print(f"  compare, cached series  {_fmt(t_warm)}   {t_legacy / t_warm:.1f}x   {len(body):12,} bytes ({len(gzip.compress(body)):,} gzipped)")
+
+
+# ─── Product Title Lookup ─────────────────────────────────────
+def _typo(rng: random.Random, words: list) -> str:
+    """A query a user might type: a word dropped, words shuffled and one letter changed."""
+    words = list(words)
+    if len(words) > 3:
+        words.pop(rng.randrange(len(words)))
+    rng.shuffle(words)
+    i = rng.randrange(len(words))
+    w = words[i]
+    j = rng.randrange(len(w))
+    words[i] = w[:j] + rng.choice("abcdefghijklmnopqrstuvwxyz") + w[j + 1:]
+    return " ".join(words)
+
+
+def bench_titles(titles: int, queries: int):
+    rng = random.Random(11)
+    vocab = sorted({w for n in main.PRODUCT_NICHES for p in main.generate_mock_amazon_products(n, 10) for w in p["title"].lower().split()})
+    vocab += ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 9))) for _ in range(5000)]
+    catalog = [[rng.choice(vocab) for _ in range(rng.randint(3, 7))] for _ in range(titles)]
+    names = [" ".join(words).title() for words in catalog]
+    index = main.TitleIndex()
+    start = time.perf_counter()
+    for i, name in enumerate(names):
+        index.add(name, {"asin": f"B{i:09d}", "title": name})
+    index.compact()
+    print(f"{len(index):,} titles, indexed in {_fmt(time.perf_counter() - start)}")
+    picks = [rng.randrange(titles) for _ in range(queries)]
+    typed = [_typo(rng, catalog[i]) for i in picks]
+    exact = [" ".join(catalog[i][:2]) for i in picks]
+
+    def scan(query):
+        q = query.lower()
+        return next((name for name in names if q in name.lower()), None)
+    n = min(queries, 50)
+    t_scan = _timeit(lambda: [scan(q) for q in typed[:n]], 1) / n
+    t_index = _timeit(lambda: [index.search(q, 5) for q in typed], 1) / queries
+    t_prefix = _timeit(lambda: [index.search(q, 5) for q in exact], 1) / queries
+    scan_hits = sum(scan(q) == names[i] for q, i in zip(typed[:n], picks))
+    scan_exact = sum(scan(q) == names[i] for q, i in zip(exact[:n], picks))
+    index_hits = sum(bool(m) and m[0].title == names[i] for q, i in zip(typed, picks) for m in [index.search(q, 5)])
+    print(f"  substring scan          {_fmt(t_scan)} / lookup   {scan_hits / n:6.1%} of typo'd queries find their title")
+    print(f"  trigram index, top 5    {_fmt(t_index)} / lookup   {index_hits / queries:6.1%}  ({t_scan / t_index:.0f}x)")
+    print(f"  trigram index, 2 words  {_fmt(t_prefix)} / lookup   (substring scan finds {scan_exact / n:.1%} of these first)")
+
+
+# ─── Product Name Clusters ────────────────────────────────────
+def _variant(rng: random.Random, words: list) -> str:
+    """Another way a CSV might spell the same SKU."""
+    words = list(words)
+    kind = rng.randrange(4)
+    if kind == 0:
+        words.append(rng.choice(["(Set of 3)", "(2-Pack)", "- New"]))
+    elif kind == 1:
+        words = words[1:] + [words[0]]
+    elif kind == 2:
+        i = rng.randrange(len(words))
+        words[i] = words[i][:-1] if len(words[i]) > 3 else words[i] + "s"
+    return " ".join(words).lower() if kind == 3 else " ".join(words)
+
+
+def pairwise_clusters(names: list, similarity: float) -> list:
+    """Exact clustering: every pair's trigram Jaccard, joined with union-find."""
+    grams = [main.TitleIndex.trigrams(main.TitleIndex.normalize(n)) for n in names]
+    parent = list(range(len(names)))
+
+    def root(i):
+        while parent[i] != i:
+            i = parent[i]
+        return i
+    for i in range(len(names)):
+        for j in range(i):
+            shared = len(grams[i] & grams[j])
+            if shared and shared >= similarity * (len(grams[i]) + len(grams[j]) - shared):
+                parent[max(root(i), root(j))] = min(root(i), root(j))
+    return [root(i) for i in range(len(names))]
+
+
+def bench_clusters(products: int, variants: int, check: int):
+    rng = random.Random(13)
+    vocab = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 9))).title() for _ in range(3000)]
+    bases = [[rng.choice(vocab) for _ in range(rng.randint(3, 6))] for _ in range(products)]
+    names = [" ".join(b) for b in bases] + [_variant(rng, rng.choice(bases)) for _ in range(variants)]
+    rng.shuffle(names)
+    print(f"{len(names):,} names ({products:,} products + {variants:,} variant spellings)")
+    clusters = main.ProductClusters()
+    start = time.perf_counter()
+    clusters.add(names)
+    t_lsh = time.perf_counter() - start
+    print(f"  MinHash + LSH           {_fmt(t_lsh)}   {len(clusters.clusters()):,} multi-name clusters")
+    sample = names[:check]
+    start = time.perf_counter()
+    exact = pairwise_clusters(sample, main.PRODUCT_CLUSTER_SIMILARITY)
+    t_pairs = time.perf_counter() - start
+    print(f"  pairwise, {check:,} names   {_fmt(t_pairs)}   ~{_fmt(t_pairs * (len(names) / check) ** 2).strip()} for all {len(names):,}")
+    lsh = main.ProductClusters()
+    lsh.add(sample)
+    got = [lsh.cluster_of(n) for n in sample]
+    pairs = [(i, j) for i in range(check) for j in range(i) if exact[i] == exact[j]]
+    found = sum(got[i] == got[j] for i, j in pairs)
+    extra = sum(1 for i in range(check) for j in range(i) if got[i] == got[j] and exact[i] != exact[j])
+    print(f"  agreement on {check:,} names: {found:,}/{len(pairs):,} duplicate pairs found, {extra} spurious")
+    incremental = main.ProductClusters()
+    start = time.perf_counter()
+    for lo in range(0, len(names), 1000):
+        incremental.add(names[lo:lo + 1000])
+    print(f"  in 1,000-name uploads   {_fmt(time.perf_counter() - start)}   same clusters: {[incremental.cluster_of(n) for n in names] == [clusters.cluster_of(n) for n in names]}")
+
+
+# ─── Keyword Routing ──────────────────────────────────────────
+def legacy_route(query: str):
+    """The original per-keyword `kw in ql` scans of detect_tool_call / extract_niche / detect_category."""
+    ql = query.lower()
+    tool, best = None, 0
+    for name, info in main.AGENT_TOOLS.items():
+        score = sum(1 for kw in info["trigger_keywords"] if kw in ql)
+        if score > best:
+            tool, best = name, score
+    niche = next((n for n in main.PRODUCT_NICHES if n.lower() in ql), None)
+    niche = niche or next((n for n, kws in main.NICHE_KEYWORDS.items() if any(k in ql for k in kws)), "Home & Kitchen")
+    scores = {c: sum(1 for kw in kws if kw in ql) for c, kws in main.CATEGORY_KEYWORDS.items()}
+    scores = {k: v for k, v in scores.items() if v > 0}
+    return tool, niche, max(scores, key=scores.get) if scores else None
+
+
+def bench_router(niches: int, reps: int):
+    rng = random.Random(3)
+    for i in range(niches):
+        main.register_niche(f"Niche {i} Goods", [f"alias{i}x", f"alias{i}y"])
+        main.register_tool(f"tool_{i}", None, "", [f"verb{i} thing", f"verb{i}ing"])
+    main.keyword_router.compact()
+    words = [k for t in main.AGENT_TOOLS.values() for k in t["trigger_keywords"]] + "the best for my store what is how to".split() * 20
+    short = "Score the opportunity for LED closet lights in pet supplies"
+    long = " ".join(rng.choice(words) for _ in range(1000))
+    print(f"{len(main.PRODUCT_NICHES)} niches, {len(main.AGENT_TOOLS)} tools")
+    for label, q in (("short message", short), (f"{len(long):,}-char paste", long)):
+        assert main.keyword_router.route(q) == legacy_route(q)
+        old = _timeit(lambda: legacy_route(q), reps)
+        new = _timeit(lambda: main.keyword_router.route(q), reps)
+        print(f"  {label:<18} legacy {_fmt(old)}   router {_fmt(new)}   {old / new:.1f}x")
+
+
+# ─── Opportunity Scan ─────────────────────────────────────────
+def bench_scan(niches: int, workers):
+    names = main.PRODUCT_NICHES + [f"Bench Niche {i}" for i in range(max(0, niches - len(main.PRODUCT_NICHES)))]
+    names = names[:niches]
+    print(f"{len(names)} niches")
+    main.SCAN_WORKERS = 1
+    main.tool_cache.clear()
+    start = time.perf_counter()
+    reference = [(r["niche"], r["title"]) for r in main.tool_scan_niches(names, 20, 600)["results"]]
+    cold = time.perf_counter() - start
+    warm = _timeit(lambda: main.tool_scan_niches(names, 20, 600), 5)
+    print(f"  in-process, cold cache  {_fmt(cold)}   ({_fmt(cold / len(names))} per niche)")
+    print(f"  in-process, warm cache  {_fmt(warm)}   ({_fmt(warm / len(names))} per niche)")
+    # What a worker adds per niche (pickling, round trips, adopting its cache entries): with n free
+    # cores a cold scan takes about cold / n plus that, which sets SCAN_PROCESS_MIN_NICHES.
+    main.tool_cache.clear()
+    with main.ProcessPoolExecutor(1, mp_context=main.multiprocessing.get_context("spawn")) as pool:
+        pool.submit(abs, 0).result()
+        start = time.perf_counter()
+        for future in [pool.submit(main._scan_niches_remote, names[i:i + main.SCAN_CHUNK_NICHES]) for i in range(0, len(names), main.SCAN_CHUNK_NICHES)]:
+            main.tool_cache.adopt(future.result()[1])
+        remote = time.perf_counter() - start
+    print(f"  one worker, cold cache  {_fmt(remote)}   ({_fmt((remote - cold) / len(names))} per niche over in-process)")
+    threshold = main.SCAN_PROCESS_MIN_NICHES
+    main.SCAN_PROCESS_MIN_NICHES = 0
+    for n in workers:
+        main.SCAN_WORKERS, main._scan_pool = n, None
+        start = time.perf_counter()
+        while main.get_scan_pool() is None:  # spawn every worker outside the timing
+            time.sleep(0.01)
+        spawn = time.perf_counter() - start
+        main.tool_cache.clear()
+        start = time.perf_counter()
+        result = main.tool_scan_niches(names, 20, 600)
+        elapsed = time.perf_counter() - start
+        assert [(r["niche"], r["title"]) for r in result["results"]] == reference, "pool scan disagrees"
+        rescan = _timeit(lambda: main.tool_scan_niches(names, 20, 600), 5)  # warm from the adopted entries
+        print(f"  pool, {n} processes      {_fmt(elapsed)}   {cold / elapsed:.2f}x, rescan {_fmt(rescan)}, spawn {spawn:.2f} s")
+        main.get_scan_pool().shutdown()
+    main.SCAN_PROCESS_MIN_NICHES = threshold
+
+
+# ─── Response Encoding ────────────────────────────────────────
+def bench_responses(products: int, reps: int):
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    main.initialize_knowledge_base()
+    main.sales_data = main.MemoryStorage().sales  # keep the sample sales out of the configured database
+    main.sales_data.extend(main.generate_sample_sales())
+    rng = random.Random(9)
+    batch = [{"title": f"Product {i}", "price": round(rng.uniform(5, 300), 2), "seller_count": rng.randint(2, 60),
+              "rating": round(rng.uniform(2.5, 5), 1), "fba_available": rng.random() < 0.7} for i in range(products)]
+    query = "Generate a research report for Pet Supplies"
+    tool_result = main.tool_generate_report("Pet Supplies")
+    chat = {"session_id": str(uuid.uuid4()), "message": query, **main.generate_response(query, main.retrieve_chunks(query), tool_result, "generate_report"),
+            "category": "product_research", "processing_time": 0.01, "timestamp": "2024-01-01 00:00:00"}
+    payloads = {
+        "report": (tool_result, None), "sales summary": (main.tool_get_sales_summary(3), None),
+        "trends": (main.tool_search_trends("Pet Supplies"), None), "competitors": (main.tool_analyze_competitors("ice maker"), None),
+        f"score batch ({products})": (main.tool_score_batch(batch, "Pet Supplies"), None), "chat (report)": (chat, main.ChatResponse),
+    }
+    print(f"{'payload':<20} {'encoder+json':>14} {'fast':>14} {'fast slim':>14}   {'bytes':>8} {'slim':>8} {'gzip':>8}" + (f" {'br':>8}" if main.brotli else ""))
+    for name, (data, model) in payloads.items():
+        if model:  # response_model path: validate, dump, render
+            legacy = lambda: JSONResponse(model.model_validate(data).model_dump(mode="json")).body
+        else:
+            legacy = lambda: JSONResponse(jsonable_encoder(data)).body
+        fast = lambda: main.FastJSONResponse(data).body
+        slim = lambda: main.ResponseShape(None, True)(data).body
+        assert json.loads(legacy()) == json.loads(fast()), f"{name}: fast path output differs"
+        body, slim_body = fast(), slim()
+        sizes = [len(body), len(slim_body), len(gzip.compress(body, main.GZIP_LEVEL))]
+        if main.brotli:
+            sizes.append(len(main.brotli.compress(body, quality=main.BROTLI_QUALITY)))
+        times = [_timeit(fn, reps) for fn in (legacy, fast, slim)]
+        print(f"  {name:<18} " + " ".join(_fmt(t) for t in times) + "   " + " ".join(f"{n:8,}" for n in sizes))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    sub = parser.add_subparsers(dest="bench", required=True)
+    p = sub.add_parser("retrieval", help="retrieve_chunks vs TF-IDF/BM25 engine")
+    p.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    p.add_argument("--reps", type=int, default=20)
+    p.add_argument("--batch", type=int, default=64)
+    p = sub.add_parser("csv", help="sales CSV parse throughput, legacy vs current")
+    p.add_argument("--rows", type=int, default=1_000_000)
+    p.add_argument("--workers", type=int, nargs="*", default=[1, 2, 4], help="process counts for the parallel parser")
+    p.add_argument("--sizes", type=float, nargs="*", default=[1, 3], help="file sizes for the parallel parser, in multiples of SALES_PARALLEL_MIN_BYTES")
+    p = sub.add_parser("storage", help="in-memory vs SQLite sales store: ingest and summary latency")
+    p.add_argument("--rows", type=int, default=200_000)
+    p.add_argument("--reps", type=int, default=20)
+    p = sub.add_parser("score", help="score_product loop vs vectorized batch scoring")
+    p.add_argument("--products", type=int, default=5_000)
+    p.add_argument("--reps", type=int, default=5)
+    p = sub.add_parser("trends", help="per-niche dict trend series vs the vectorized trend comparison")
+    p.add_argument("--niches", type=int, default=200)
+    p.add_argument("--days", type=int, default=365)
+    p.add_argument("--reps", type=int, default=5)
+    p = sub.add_parser("titles", help="substring scan vs trigram index for fuzzy product-title lookup")
+    p.add_argument("--titles", type=int, default=100_000)
+    p.add_argument("--queries", type=int, default=500)
+    p = sub.add_parser("clusters", help="MinHash/LSH near-duplicate product names vs exact pairwise comparison")
+    p.add_argument("--products", type=int, default=20_000)
+    p.add_argument("--variants", type=int, default=10_000, help="extra spellings of existing products")
+    p.add_argument("--check", type=int, default=2_000, help="names clustered pairwise for comparison")
+    p = sub.add_parser("scan", help="opportunity scan in-process, cold and warm, vs the scan process pool")
+    p.add_argument("--niches", type=int, default=48)
+    p.add_argument("--workers", type=int, nargs="*", default=[2, 4])
+    p = sub.add_parser("responses", help="jsonable_encoder + json vs orjson fast path, slim mode and compressed sizes")
+    p.add_argument("--products", type=int, default=1_000, help="products in the score-batch payload")
+    p.add_argument("--reps", type=int, default=200)
+    p = sub.add_parser("router", help="keyword scans vs compiled keyword router")
+    p.add_argument("--niches", type=int, default=300, help="extra niches and tools to register")
+    p.add_argument("--reps", type=int, default=200)
+    args = parser.parse_args()
+    if args.bench == "retrieval":
+        bench_retrieval(args.sizes, args.reps, args.batch)
+    elif args.bench == "csv":
+        bench_csv(args.rows, args.workers, args.sizes)
+    elif args.bench == "storage":
+        bench_storage(args.rows, args.reps)
+    elif args.bench == "score":
+        bench_score(args.products, args.reps)
+    elif args.bench == "trends":
+        bench_trends(args.niches, args.days, args.reps)
+    elif args.bench == "titles":
+        bench_titles(args.titles, args.queries)
+    elif args.bench == "clusters":
+        bench_clusters(args.products, args.variants, args.check)
+    elif args.bench == "scan":
+        bench_scan(args.niches, args.workers)
+    elif args.bench == "responses":
+        bench_responses(args.products, args.reps)
+    elif args.bench == "router":
+        bench_router(args.niches, args.reps)
@@ -1,28 +1,79 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Header, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool, iterate_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, IdentityResponder
+from typing import List, Optional, Dict, Any, Callable, Iterable, Iterator, BinaryIO, NamedTuple, Union
 import uvicorn
+import asyncio
 import os
+import sys
 import uuid
 import time
+import hashlib
 import re
 import math
 import csv
 import io
 import random
-from collections import Counter, defaultdict
+import heapq
+import hmac
+import bisect
+import threading
+import itertools
+import inspect
+import multiprocessing
+import json
+import sqlite3
+import traceback
+import zlib
+from collections import Counter, OrderedDict, defaultdict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime, timedelta
+from functools import lru_cache, wraps
+import numpy as np
 from dotenv import load_dotenv
 
+try:  # optional: vectorized TF-IDF / BM25 retrieval (RAG_ENGINE=tfidf|bm25)
+    from scipy import sparse
+except ImportError:
+    sparse = None
+
+try:  # optional: faster JSON rendering
+    import orjson
+except ImportError:
+    orjson = None
+
+try:  # optional: brotli response compression
+    import brotli
+except ImportError:
+    brotli = None
+
 load_dotenv()
 
+RAG_ENGINE = os.environ.get("RAG_ENGINE", "cosine").lower()
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON rendered with orjson when it is installed, else with json like JSONResponse."""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
 app = FastAPI(
     title="E-Commerce Product Researcher Agent API",
     description="Multi-Agent + RAG + MCP — Automates competitor & trend research for online sellers",
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=FastJSONResponse,
 )
 
 app.add_middleware(
@@ -33,23 +84,971 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# ─── In-Memory Stores ────────────────────────────────────────
-sales_data: List[Dict[str, Any]] = []
+# ─── Columnar Sales Store ────────────────────────────────────
+SALES_TEXT_FIELDS = ("product_name", "category", "store", "source")
+SALES_MONEY_FIELDS = ("revenue", "cost", "ad_spend", "platform_fee", "profit")
+
+
+@lru_cache(maxsize=65536)
+def _day_ordinal(date_str: str) -> int:
+    return datetime.strptime(date_str, "%Y-%m-%d").toordinal()
+
+
+@lru_cache(maxsize=65536)
+def _day_string(ordinal: int) -> str:
+    return datetime.fromordinal(ordinal).strftime("%Y-%m-%d")
+
+
+SUMMARY_GROUPS = {
+    "product_name": ("revenue", "profit", "quantity", "orders"),
+    "category": ("revenue", "profit", "quantity"),
+    "store": ("revenue", "profit"),
+}
+
+
+def _first_day(cutoff: datetime) -> int:
+    # Rows are midnight dates, so a row is in the window iff its day >= ceil(cutoff).
+    return (cutoff - timedelta(microseconds=1)).toordinal() + 1
+
+
+@lru_cache(maxsize=65536)
+def _month_of(ordinal: int) -> int:
+    d = datetime.fromordinal(ordinal)
+    return d.year * 12 + d.month - 1
+
+
+def _round_exact(values: np.ndarray, ndigits: int) -> np.ndarray:
+    """np.round with Python round() semantics.
+
+    np.round scales by 10**ndigits first, which can land one unit off on
+    near-ties (e.g. 3.705); only those few elements are re-rounded in Python.
+    """
+    out = np.round(values, ndigits)
+    scaled = np.abs(values * 10.0 ** ndigits)
+    for i in np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6).tolist():
+        out[i] = round(float(values[i]), ndigits)
+    return out
+
+
+def rollup_cells(cols: Dict[str, np.ndarray]) -> Iterator[tuple]:
+    """Group a column batch into (day, product, category, store) cells.
+
+    Yields (day, (product, category, store) codes, [revenue, profit, ad_spend
+    cents, quantity, orders], index of the cell's first row in the batch).
+    """
+    keys = [cols["day"], cols["product_name"], cols["category"], cols["store"]]
+    order = np.lexsort(keys[::-1])
+    keys = [k[order] for k in keys]
+    starts = np.flatnonzero(np.concatenate(([True], np.any([k[1:] != k[:-1] for k in keys], axis=0))))
+    cells = zip(*(k[starts].tolist() for k in keys))
+    weights = [np.rint(cols[f][order] * 100) for f in ("revenue", "profit", "ad_spend")] + [cols["quantity"][order]]
+    sums = [np.add.reduceat(w, starts) for w in weights] + [np.diff(np.append(starts, len(order)))]
+    for (day, *key), first, *vals in zip(cells, order[starts].tolist(), *(x.tolist() for x in sums)):
+        yield day, tuple(key), [int(v) for v in vals], first
+
+
+def _rollup_window(first_day: int) -> tuple:
+    """Split a window starting at `first_day` into daily cells for days in
+    [lo, hi) (the partial first month) and monthly cells from `month` on."""
+    start = datetime.fromordinal(first_day)
+    if start.day == 1:
+        return first_day, first_day, _month_of(first_day)
+    next_month = _month_of(first_day) + 1
+    return first_day, datetime(next_month // 12, next_month % 12 + 1, 1).toordinal(), next_month
+
+
+class SalesRollup:
+    """Daily and monthly cubes of sales totals keyed by (period, product, category, store).
+
+    Every batch the store ingests is folded into both cubes. A summary window is
+    answered from daily cells for the partial month it starts in and monthly
+    cells for every later month, so its cost scales with cells rather than
+    orders. Money is held in integer cents, which makes merging cells exact.
+    Each cell also keeps its first row's (day << 32) + arrival position, so
+    groups are listed in the order `SQLiteSalesStore` lists them.
+    """
+
+    METRICS = ("revenue", "profit", "ad_spend", "quantity", "orders")
+
+    def __init__(self):
+        self.cubes: Dict[str, Dict[int, Dict[tuple, List[int]]]] = {"daily": {}, "monthly": {}}
+        self.periods: Dict[str, List[int]] = {"daily": [], "monthly": []}
+
+    def add(self, cols: Dict[str, np.ndarray], start: int):
+        """Fold in a batch sorted by day whose first row was the `start`-th to arrive."""
+        for day, key, vals, first in rollup_cells(cols):
+            first = (day << 32) + start + first
+            self._bump("daily", day, key, vals, first)
+            self._bump("monthly", _month_of(day), key, vals, first)
+
+    def _bump(self, cube: str, period: int, key: tuple, vals: List[int], first: int):
+        cells = self.cubes[cube].get(period)
+        if cells is None:
+            cells = self.cubes[cube][period] = {}
+            bisect.insort(self.periods[cube], period)
+        acc = cells.get(key)
+        if acc is None:
+            cells[key] = [*vals, first]
+        else:
+            for i, v in enumerate(vals):
+                acc[i] += v
+            acc[-1] = min(acc[-1], first)  # an older day can arrive later
+
+    def _cells(self, first_day: int):
+        day_lo, day_hi, month_lo = _rollup_window(first_day)
+        days = self.periods["daily"]
+        for day in days[bisect.bisect_left(days, day_lo):bisect.bisect_left(days, day_hi)]:
+            yield from self.cubes["daily"][day].items()
+        months = self.periods["monthly"]
+        for month in months[bisect.bisect_left(months, month_lo):]:
+            yield from self.cubes["monthly"][month].items()
+
+    def summarize(self, first_day: int, labels: Dict[str, List[str]]) -> Optional[Dict[str, Any]]:
+        # Like SALES_CELLS_SQL: one cell per group key, folded in order of its first row.
+        merged: Dict[tuple, List[int]] = {}
+        for key, acc in self._cells(first_day):
+            cell = merged.get(key)
+            if cell is None:
+                merged[key] = list(acc)
+            else:
+                for i, v in enumerate(acc[:-1]):
+                    cell[i] += v
+                cell[-1] = min(cell[-1], acc[-1])
+        cells = sorted(merged.items(), key=lambda kv: kv[1][-1])
+        return summarize_cells(((key, acc[:-1]) for key, acc in cells), labels)
+
+
+def summarize_cells(cells: Iterable[tuple], labels: Optional[Dict[str, List[str]]] = None) -> Optional[Dict[str, Any]]:
+    """Fold (product, category, store) cells of integer `SalesRollup.METRICS` into a summary.
+
+    Groups come out in the order their first cell does; keys are mapped
+    through `labels` when they are dictionary codes.
+    """
+    metrics_order = SalesRollup.METRICS
+    groups: Dict[str, Dict[Any, List[int]]] = {field: {} for field in SUMMARY_GROUPS}
+    totals = [0] * len(metrics_order)
+    scanned = 0
+    for scanned, (key, vals) in enumerate(cells, 1):
+        for i, v in enumerate(vals):
+            totals[i] += v
+        for field, code in zip(SUMMARY_GROUPS, key):
+            acc = groups[field].get(code)
+            if acc is None:
+                groups[field][code] = list(vals)
+            else:
+                for i, v in enumerate(vals):
+                    acc[i] += v
+    metrics.observe("sales_summary_scan", "cells", scanned)
+    if not totals[-1]:
+        return None
+
+    def metric(vals: List[int], m: str):
+        v = vals[metrics_order.index(m)]
+        return v if m in ("quantity", "orders") else v / 100
+    label = (lambda field, code: labels[field][code]) if labels else (lambda field, code: code)
+    return {
+        "totals": {**{m: metric(totals, m) for m in ("revenue", "profit", "ad_spend")}, "orders": totals[-1]},
+        **{field: [(label(field, code), {m: metric(vals, m) for m in metrics}) for code, vals in groups[field].items()]
+           for field, metrics in SUMMARY_GROUPS.items()},
+    }
+
+
+class ColumnarSalesStore:
+    """Array-backed sales history, kept sorted by date.
+
+    Each field is a NumPy column: dates as day ordinals, product/category/store/
+    source dictionary-encoded to int32 codes, money as float64 and ids as raw
+    uuid bytes. New rows are stably merged by date (same order the old
+    `extend` + `sort` produced), so date windows are a binary search and
+    group-bys are `np.bincount` over the code columns. Indexing, slicing and
+    iteration still yield the familiar row dicts.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.rollup = SalesRollup()
+        self.arrived = 0  # rows ever added, for arrival order in the rollups
+        self.labels: Dict[str, List[str]] = {f: [] for f in SALES_TEXT_FIELDS}
+        self.lookup: Dict[str, Dict[str, int]] = {f: {} for f in SALES_TEXT_FIELDS}
+        self.cols: Dict[str, np.ndarray] = {
+            "day": np.empty(0, np.int32), "id": np.empty(0, "S16"), "quantity": np.empty(0, np.int64),
+            **{f: np.empty(0, np.int32) for f in SALES_TEXT_FIELDS},
+            **{f: np.empty(0, np.float64) for f in SALES_MONEY_FIELDS}, "margin_pct": np.empty(0, np.float64),
+        }
+
+    def __len__(self) -> int:
+        return len(self.cols["day"])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.row(i)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self.row(i) for i in range(*key.indices(len(self)))]
+        return self.row(range(len(self))[key])
+
+    def encode(self, field: str, values) -> np.ndarray:
+        lookup, labels = self.lookup[field], self.labels[field]
+        out = np.empty(len(values), np.int32)
+        for i, v in enumerate(values):
+            code = lookup.get(v)
+            if code is None:
+                code = lookup[v] = len(labels)
+                labels.append(v)
+            out[i] = code
+        return out
+
+    def row(self, i: int) -> Dict[str, Any]:
+        c = self.cols
+        return {
+            "id": str(uuid.UUID(bytes=c["id"][i].ljust(16, b"\0"))), "date": _day_string(int(c["day"][i])),
+            "product_name": self.labels["product_name"][c["product_name"][i]], "category": self.labels["category"][c["category"][i]],
+            "store": self.labels["store"][c["store"][i]], "quantity": int(c["quantity"][i]),
+            **{f: float(c[f][i]) for f in SALES_MONEY_FIELDS}, "margin_pct": float(c["margin_pct"][i]),
+            "source": self.labels["source"][c["source"][i]],
+        }
+
+    def extend(self, rows: List[Dict[str, Any]]):
+        rows = list(rows)
+        if not rows:
+            return
+        n = len(rows)
+        with self.lock:
+            cols = {
+                "day": np.fromiter((_day_ordinal(r["date"]) for r in rows), np.int32, n),
+                "id": np.array([uuid.UUID(r["id"]).bytes for r in rows], dtype="S16"),
+                "quantity": np.fromiter((r["quantity"] for r in rows), np.int64, n),
+                **{f: self.encode(f, [r[f] for r in rows]) for f in SALES_TEXT_FIELDS},
+                **{f: np.fromiter((r[f] for r in rows), np.float64, n) for f in SALES_MONEY_FIELDS},
+                "margin_pct": np.fromiter((r["margin_pct"] for r in rows), np.float64, n),
+            }
+            self.extend_columns(cols)
+
+    def extend_columns(self, cols: Dict[str, np.ndarray]):
+        if not len(cols["day"]):
+            return
+        order = np.argsort(cols["day"], kind="stable")
+        cols = {k: v[order] for k, v in cols.items()}
+        with self.lock:
+            if not len(self) or cols["day"][0] >= self.cols["day"][-1]:
+                merged = {k: np.concatenate((v, cols[k])) for k, v in self.cols.items()}
+            else:
+                # side="right" keeps new rows after existing rows of the same day.
+                at = np.searchsorted(self.cols["day"], cols["day"], side="right")
+                merged = {k: np.insert(v, at, cols[k]) for k, v in self.cols.items()}
+            self.cols = merged
+            self.rollup.add(cols, self.arrived)
+            self.arrived += len(cols["day"])
+
+    def extend_batches(self, batches: List[Dict[str, Any]]):
+        """Merge parsed CSV batches (batch-local dictionaries, see `_sales_batch`) in one pass."""
+        if not batches:
+            return
+        with self.lock:
+            adopted = []
+            for batch in batches:
+                cols = dict(batch)
+                for f in SALES_TEXT_FIELDS:
+                    labels, codes = batch[f]
+                    cols[f] = self.encode(f, labels)[codes]
+                adopted.append(cols)
+            self.extend_columns({k: np.concatenate([b[k] for b in adopted]) for k in adopted[0]})
+
+    def product_names(self, start: int = 0) -> List[str]:
+        """Distinct product names in first-seen order, from the `start`-th on."""
+        with self.lock:
+            return self.labels["product_name"][start:]
+
+    def total(self, field: str, lo: int, hi: int) -> float:
+        # Sequential accumulation gives the same float as summing row by row.
+        return float(np.cumsum(self.cols[field][lo:hi])[-1]) if hi > lo else 0
+
+    def group_sums(self, field: str, lo: int, hi: int, metrics: tuple) -> List[tuple]:
+        codes = self.cols[field][lo:hi]
+        uniq, first = np.unique(codes, return_index=True)
+        sums = {}
+        for m in metrics:
+            if m == "orders":
+                sums[m] = np.bincount(codes)
+            else:
+                sums[m] = np.bincount(codes, weights=self.cols[m][lo:hi])
+        labels = self.labels[field]
+        return [
+            (labels[c], {m: int(sums[m][c]) if m in ("quantity", "orders") else float(sums[m][c]) for m in metrics})
+            for c in uniq[np.argsort(first)].tolist()
+        ]
+
+    def summarize_rows(self, lo: int, hi: int) -> Dict[str, Any]:
+        """Window totals and group-bys scanned from the raw rows in [lo, hi)."""
+        metrics.observe("sales_summary_scan", "rows", hi - lo)
+        with self.lock:
+            return {
+                "totals": {**{f: self.total(f, lo, hi) for f in ("revenue", "profit", "ad_spend")}, "orders": hi - lo},
+                **{field: self.group_sums(field, lo, hi, metrics) for field, metrics in SUMMARY_GROUPS.items()},
+            }
+
+    def summarize(self, cutoff: datetime) -> Optional[Dict[str, Any]]:
+        """Window totals and group-bys for rows on or after `cutoff`, from the rollups."""
+        with self.lock:
+            return self.rollup.summarize(_first_day(cutoff), self.labels)
+
+    def summarize_recent(self, n: int) -> Dict[str, Any]:
+        """Summary of the latest `n` rows (by date, then arrival)."""
+        with self.lock:
+            return self.summarize_rows(max(0, len(self) - n), len(self))
+
+
+# ─── Persistent Storage ──────────────────────────────────────
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "sqlite").lower()
+DATABASE_PATH = os.environ.get("DATABASE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "researcher.db"))
+SQLITE_CACHE_KIB = int(os.environ.get("SQLITE_CACHE_KIB", 64 * 1024))  # page cache per connection
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sales (
+    seq INTEGER PRIMARY KEY,
+    id BLOB NOT NULL,
+    day INTEGER NOT NULL,
+    product_name TEXT NOT NULL,
+    category TEXT NOT NULL,
+    store TEXT NOT NULL,
+    source TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    revenue INTEGER NOT NULL,
+    cost INTEGER NOT NULL,
+    ad_spend INTEGER NOT NULL,
+    platform_fee INTEGER NOT NULL,
+    profit INTEGER NOT NULL,
+    margin_pct REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sales_by_day ON sales (day, product_name, category, store, quantity, revenue, profit, ad_spend);
+CREATE INDEX IF NOT EXISTS sales_by_product ON sales (product_name, day, quantity, revenue, profit);
+CREATE INDEX IF NOT EXISTS sales_by_category ON sales (category, day, quantity, revenue, profit);
+CREATE TABLE IF NOT EXISTS sales_daily (
+    period INTEGER NOT NULL, product_name TEXT NOT NULL, category TEXT NOT NULL, store TEXT NOT NULL,
+    revenue INTEGER NOT NULL, profit INTEGER NOT NULL, ad_spend INTEGER NOT NULL, quantity INTEGER NOT NULL,
+    orders INTEGER NOT NULL, first INTEGER NOT NULL,
+    PRIMARY KEY (period, product_name, category, store)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sales_monthly (
+    period INTEGER NOT NULL, product_name TEXT NOT NULL, category TEXT NOT NULL, store TEXT NOT NULL,
+    revenue INTEGER NOT NULL, profit INTEGER NOT NULL, ad_spend INTEGER NOT NULL, quantity INTEGER NOT NULL,
+    orders INTEGER NOT NULL, first INTEGER NOT NULL,
+    PRIMARY KEY (period, product_name, category, store)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS product_names (seq INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS research (
+    id TEXT PRIMARY KEY,
+    date_researched TEXT NOT NULL,
+    niche TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS research_by_date ON research (date_researched);
+CREATE TABLE IF NOT EXISTS uploads (seq INTEGER PRIMARY KEY, record TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS counters (key TEXT PRIMARY KEY, value NUMERIC NOT NULL) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS chat_sessions (
+    session_id TEXT PRIMARY KEY,
+    start INTEGER NOT NULL,
+    next INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chat_sessions_by_seen ON chat_sessions (seen);
+CREATE TABLE IF NOT EXISTS chat_messages (
+    session_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    message TEXT NOT NULL,
+    PRIMARY KEY (session_id, idx)
+) WITHOUT ROWID;
+"""
+COUNTER_UPSERT_SQL = "INSERT INTO counters VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = value + excluded.value"
+POLL_SQL = {
+    "research": "SELECT rowid, record FROM research WHERE rowid > ? ORDER BY rowid",
+    "uploads": "SELECT seq, record FROM uploads WHERE seq > ? ORDER BY seq",
+}
+
+SALES_SQL_COLUMNS = ("seq", "id", "day", *SALES_TEXT_FIELDS, "quantity", *SALES_MONEY_FIELDS, "margin_pct")
+SALES_INSERT_SQL = f"INSERT INTO sales ({', '.join(SALES_SQL_COLUMNS)}) VALUES ({', '.join('?' * len(SALES_SQL_COLUMNS))})"
+ROLLUP_UPSERT_SQL = """
+INSERT INTO sales_{cube} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (period, product_name, category, store) DO UPDATE SET
+    revenue = revenue + excluded.revenue, profit = profit + excluded.profit, ad_spend = ad_spend + excluded.ad_spend,
+    quantity = quantity + excluded.quantity, orders = orders + excluded.orders, first = MIN(first, excluded.first)
+"""
+# Cells are folded in order of their first row, (day, seq), so groups come out
+# in the order the in-memory store would list them.
+SALES_CELLS_SQL = """
+SELECT product_name, category, store, SUM(revenue), SUM(profit), SUM(ad_spend), SUM(quantity), SUM(orders), MIN(first) AS first
+FROM ({source}) GROUP BY product_name, category, store ORDER BY first
+"""
+ROLLUP_WINDOW_SQL = (
+    "SELECT * FROM sales_daily WHERE period >= ? AND period < ? UNION ALL SELECT * FROM sales_monthly WHERE period >= ?"
+)
+RECENT_ROWS_SQL = """
+SELECT product_name, category, store, revenue, profit, ad_spend, quantity, 1 AS orders, day * 4294967296 + seq AS first
+FROM sales WHERE day >= (SELECT MIN(day) FROM (SELECT day FROM sales ORDER BY day DESC LIMIT ?))
+ORDER BY day DESC, seq DESC LIMIT ?
+"""
+
+
+def _rows_as_batch(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Row dicts in the column layout `_sales_batch` produces."""
+    def labelled(values):
+        labels, codes = np.unique(np.array(values, dtype=object), return_inverse=True)
+        return labels.tolist(), codes.astype(np.int32)
+    n = len(rows)
+    return {
+        "day": np.fromiter((_day_ordinal(r["date"]) for r in rows), np.int32, n),
+        "id": np.array([uuid.UUID(r["id"]).bytes for r in rows], dtype="S16"),
+        "quantity": np.fromiter((r["quantity"] for r in rows), np.int64, n),
+        **{f: labelled([r[f] for r in rows]) for f in SALES_TEXT_FIELDS},
+        **{f: np.fromiter((r[f] for r in rows), np.float64, n) for f in SALES_MONEY_FIELDS},
+        "margin_pct": np.fromiter((r["margin_pct"] for r in rows), np.float64, n),
+    }
+
+
+class SQLiteSalesStore:
+    """Sales history in the `sales` table of a `SQLiteStorage`.
+
+    Money is stored as integer cents. Each write also upserts the batch's
+    cells into `sales_daily` / `sales_monthly` (the same cubes `SalesRollup`
+    keeps in memory), so a summary window is one SQL group-by over a partial
+    month of daily cells plus monthly cells, exact and independent of the
+    number of orders. Row order is (day, seq): date, then arrival. The row
+    count is kept in `counters`, so every worker sees the same length.
+    """
+
+    def __init__(self, storage: "SQLiteStorage"):
+        self.storage = storage
+
+    def __len__(self) -> int:
+        return self.storage.counter("sales.rows")
+
+    def extend(self, rows: List[Dict[str, Any]]):
+        rows = list(rows)
+        if rows:
+            self.extend_batches([_rows_as_batch(rows)])
+
+    def extend_batches(self, batches: List[Dict[str, Any]]):
+        """Write parsed CSV batches (see `_sales_batch`) and their rollup cells in a single transaction."""
+        if not batches:
+            return
+        with self.storage.transaction() as db:
+            seq = start = db.execute("SELECT COALESCE(MAX(seq), 0) FROM sales").fetchone()[0] + 1
+            for b in batches:
+                n = len(b["day"])
+                labels = {f: list(b[f][0]) for f in SALES_TEXT_FIELDS}
+                db.executemany("INSERT OR IGNORE INTO product_names (name) VALUES (?)", ((name,) for name in labels["product_name"]))
+                db.executemany(SALES_INSERT_SQL, zip(
+                    range(seq, seq + n), [i.ljust(16, b"\0") for i in b["id"].tolist()], b["day"].tolist(),
+                    *(np.asarray(labels[f], dtype=object)[b[f][1]].tolist() for f in SALES_TEXT_FIELDS), b["quantity"].tolist(),
+                    *(np.rint(b[f] * 100).astype(np.int64).tolist() for f in SALES_MONEY_FIELDS), b["margin_pct"].tolist(),
+                ))
+                cells = [
+                    (day, *(labels[f][code] for f, code in zip(SUMMARY_GROUPS, key)), *vals, (day << 32) + seq + first)
+                    for day, key, vals, first in rollup_cells({**b, **{f: b[f][1] for f in SUMMARY_GROUPS}})
+                ]
+                db.executemany(ROLLUP_UPSERT_SQL.format(cube="daily"), cells)
+                db.executemany(ROLLUP_UPSERT_SQL.format(cube="monthly"), ((_month_of(c[0]), *c[1:]) for c in cells))
+                seq += n
+            db.execute(COUNTER_UPSERT_SQL, ("sales.rows", seq - start))
+
+    def _summarize(self, source: str, params: tuple) -> Optional[Dict[str, Any]]:
+        cells = self.storage.db().execute(SALES_CELLS_SQL.format(source=source), params)
+        return summarize_cells((tuple(r[:3]), r[3:8]) for r in cells)
+
+    def summarize(self, cutoff: datetime) -> Optional[Dict[str, Any]]:
+        """Window totals and group-bys for rows on or after `cutoff`, aggregated in SQL from the rollups."""
+        return self._summarize(ROLLUP_WINDOW_SQL, _rollup_window(_first_day(cutoff)))
+
+    def summarize_recent(self, n: int) -> Optional[Dict[str, Any]]:
+        """Summary of the latest `n` rows (by date, then arrival)."""
+        return self._summarize(RECENT_ROWS_SQL, (n, n))
+
+    def product_names(self, start: int = 0) -> List[str]:
+        """Distinct product names in first-seen order, from the `start`-th on."""
+        return [r[0] for r in self.storage.db().execute("SELECT name FROM product_names WHERE seq > ? ORDER BY seq", (start,))]
+
+
+class SQLiteStorage:
+    """SQLite (WAL mode) storage for sales, research history, uploads, chat sessions and counters.
+
+    The database file is the state shared by every worker process. Each
+    thread gets its own connection; WAL lets readers run alongside the single
+    writer, and `BEGIN IMMEDIATE` plus a busy timeout queue writers from all
+    processes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.local = threading.local()
+        self.write_lock = threading.Lock()
+        self.ready = False
+        self.sales = SQLiteSalesStore(self)
+        self.probe: Optional[sqlite3.Connection] = None
+        self.probe_lock = threading.Lock()
+        self.version: Optional[int] = None
+        self.cursors = {kind: 0 for kind in POLL_SQL}
+
+    def connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute(f"PRAGMA cache_size={-SQLITE_CACHE_KIB}")
+        return conn
+
+    def db(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = self.connect()
+            self.local.depth = 0
+            with self.write_lock:
+                if not self.ready:
+                    conn.executescript(SQLITE_SCHEMA)
+                    if conn.execute("SELECT 1 FROM counters WHERE key = 'sales.rows'").fetchone() is None:
+                        conn.execute("INSERT OR IGNORE INTO counters SELECT 'sales.rows', COUNT(*) FROM sales")
+                    if conn.execute("SELECT 1 FROM product_names LIMIT 1").fetchone() is None:
+                        conn.execute("INSERT OR IGNORE INTO product_names (name) SELECT product_name FROM sales GROUP BY product_name ORDER BY MIN(seq)")
+                    self.ready = True
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Write transaction; nested calls on the same thread join the outer one."""
+        db = self.db()
+        if self.local.depth:
+            self.local.depth += 1
+            try:
+                yield db
+            finally:
+                self.local.depth -= 1
+            return
+        with self.write_lock:
+            db.execute("BEGIN IMMEDIATE")
+            self.local.depth = 1
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            else:
+                db.execute("COMMIT")
+            finally:
+                self.local.depth = 0
+
+    def changed(self) -> bool:
+        """Whether any connection, in any process, committed since the last call.
+
+        Reads PRAGMA data_version on a private connection that never writes,
+        so the value moves on every commit made elsewhere.
+        """
+        with self.probe_lock:
+            if self.probe is None:
+                self.probe = self.connect()
+            version = self.probe.execute("PRAGMA data_version").fetchone()[0]
+            changed, self.version = version != self.version, version
+        return changed
+
+    def poll(self, kind: str) -> List[Dict[str, Any]]:
+        """Records of `kind` ("research" or "uploads") added since the last poll, oldest first."""
+        rows = self.db().execute(POLL_SQL[kind], (self.cursors[kind],)).fetchall()
+        if rows:
+            self.cursors[kind] = rows[-1][0]
+        return [json.loads(r) for _, r in rows]
+
+    def has_research(self) -> bool:
+        return self.db().execute("SELECT 1 FROM research LIMIT 1").fetchone() is not None
+
+    def add_research(self, records: List[Dict[str, Any]]):
+        with self.transaction() as db:
+            db.executemany("INSERT OR IGNORE INTO research VALUES (?, ?, ?, ?, ?)",
+                           ((r["id"], r["date_researched"], r["niche"], r["outcome"], json.dumps(r)) for r in records))
+
+    def add_upload(self, record: Dict[str, Any]):
+        with self.transaction() as db:
+            db.execute("INSERT INTO uploads (record) VALUES (?)", (json.dumps(record),))
+
+    def counter(self, key: str) -> Union[int, float]:
+        row = self.db().execute("SELECT value FROM counters WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def counters(self, prefix: str) -> Dict[str, Union[int, float]]:
+        rows = self.db().execute("SELECT key, value FROM counters WHERE key >= ? AND key < ?", (prefix, prefix + "\uffff"))
+        return {key[len(prefix):]: value for key, value in rows}
+
+    def add_counters(self, deltas: Dict[str, Union[int, float]]):
+        """Atomically add `deltas` to named counters (created at zero)."""
+        with self.transaction() as db:
+            db.executemany(COUNTER_UPSERT_SQL, deltas.items())
+
+    def open_sessions(self, *bounds) -> "SQLiteSessionStore":
+        return SQLiteSessionStore(self, *bounds)
+
+
+class MemoryStorage:
+    """Process-local storage (STORAGE_BACKEND=memory, for tests): nothing survives a
+    restart and nothing is shared between worker processes."""
+
+    def __init__(self):
+        self.sales = ColumnarSalesStore()
+        self.tables: Dict[str, List[Dict[str, Any]]] = {kind: [] for kind in POLL_SQL}
+        self.cursors = {kind: 0 for kind in POLL_SQL}
+        self.counts: Counter = Counter()
+        self.lock = threading.RLock()
+
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            yield None
+
+    def changed(self) -> bool:
+        return True
+
+    def poll(self, kind: str) -> List[Dict[str, Any]]:
+        with self.lock:
+            new = self.tables[kind][self.cursors[kind]:]
+            self.cursors[kind] += len(new)
+        return new
+
+    def has_research(self) -> bool:
+        return bool(self.tables["research"])
+
+    def add_research(self, records: List[Dict[str, Any]]):
+        with self.lock:
+            self.tables["research"].extend(records)
+
+    def add_upload(self, record: Dict[str, Any]):
+        with self.lock:
+            self.tables["uploads"].append(record)
+
+    def counter(self, key: str) -> Union[int, float]:
+        return self.counts[key]
+
+    def counters(self, prefix: str) -> Dict[str, Union[int, float]]:
+        with self.lock:
+            return {key[len(prefix):]: value for key, value in sorted(self.counts.items()) if key.startswith(prefix)}
+
+    def add_counters(self, deltas: Dict[str, Union[int, float]]):
+        with self.lock:
+            for key, value in deltas.items():
+                self.counts[key] += value
+
+    def open_sessions(self, *bounds) -> "SessionStore":
+        return SessionStore(*bounds)
+
+
+def open_storage(backend: str = STORAGE_BACKEND, path: str = DATABASE_PATH):
+    if backend == "memory":
+        return MemoryStorage()
+    if backend == "sqlite":
+        return SQLiteStorage(path)
+    raise ValueError(f"Unknown STORAGE_BACKEND {backend!r} (expected sqlite or memory)")
+
+
+# ─── Chat Session Store ──────────────────────────────────────
+SESSION_MAX_MESSAGES = int(os.environ.get("SESSION_MAX_MESSAGES", 200))
+SESSION_IDLE_TTL = int(os.environ.get("SESSION_IDLE_TTL", 6 * 3600))
+SESSION_MAX_COUNT = int(os.environ.get("SESSION_MAX_COUNT", 10000))
+SESSION_MAX_BYTES = int(os.environ.get("SESSION_MAX_BYTES", 64 * 1024 * 1024))
+SESSION_PAGE_SIZE = 50
+
+
+def _message_bytes(msg: Dict[str, Any]) -> int:
+    """Rough in-memory footprint of a stored message."""
+    return 200 + len(msg["content"]) + 80 * len(msg.get("citations", ()))
+
+
+class SessionStore:
+    """Chat transcripts under a memory bound.
+
+    Each session keeps its last `max_messages` messages (message indices keep
+    counting past dropped ones), sessions idle for `idle_ttl` seconds expire,
+    and past `max_sessions` sessions or `max_bytes` the least recently used
+    ones are evicted. Assistant citations are stored as (chunk id, relevance)
+    references and rebuilt from the knowledge base on read.
+    """
+
+    def __init__(self, max_messages: int, idle_ttl: float, max_sessions: int, max_bytes: int):
+        self.max_messages, self.idle_ttl = max_messages, idle_ttl
+        self.max_sessions, self.max_bytes = max_sessions, max_bytes
+        self.sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # least recently used first
+        self.bytes = self.messages = 0
+        self.lock = threading.Lock()
+        self.counts: Counter = Counter()
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def __contains__(self, session_id: str):
+        return session_id in self.sessions
+
+    def _drop(self, session_id: str, reason: str):
+        s = self.sessions.pop(session_id)
+        self.bytes -= s["bytes"]
+        self.messages -= len(s["messages"])
+        self.counts[reason] += 1
+
+    def _evict(self, now: float):
+        while self.sessions:
+            session_id, s = next(iter(self.sessions.items()))
+            if now - s["seen"] > self.idle_ttl:
+                self._drop(session_id, "expired")
+            elif len(self.sessions) > self.max_sessions:
+                self._drop(session_id, "evicted_lru")
+            elif self.bytes > self.max_bytes and len(self.sessions) > 1:
+                self._drop(session_id, "evicted_memory")
+            else:
+                break
+
+    def append(self, session_id: str, *messages: Dict[str, Any]):
+        now = time.monotonic()
+        with self.lock:
+            self._evict(now)
+            s = self.sessions.get(session_id)
+            if s is None:
+                s = self.sessions[session_id] = {"messages": deque(), "start": 0, "bytes": 0}
+            self.sessions.move_to_end(session_id)
+            s["seen"] = now
+            for msg in messages:
+                size = _message_bytes(msg)
+                s["messages"].append(msg); s["bytes"] += size; self.bytes += size; self.messages += 1
+            while len(s["messages"]) > self.max_messages:
+                size = _message_bytes(s["messages"].popleft())
+                s["start"] += 1; s["bytes"] -= size; self.bytes -= size; self.messages -= 1
+                self.counts["trimmed_messages"] += 1
+            self._evict(now)
+
+    def page(self, session_id: str, cursor: Optional[int] = None, limit: int = SESSION_PAGE_SIZE) -> Optional[Dict[str, Any]]:
+        """Up to `limit` messages from absolute index `cursor` (default: the oldest kept)."""
+        now = time.monotonic()
+        with self.lock:
+            self._evict(now)
+            s = self.sessions.get(session_id)
+            if s is None:
+                return None
+            self.sessions.move_to_end(session_id)
+            s["seen"] = now
+            start, end = s["start"], s["start"] + len(s["messages"])
+            lo = min(max(start, start if cursor is None else cursor), end)
+            hi = min(end, lo + limit)
+            msgs = list(itertools.islice(s["messages"], lo - start, hi - start))
+        return {"messages": [self._hydrate(m) for m in msgs], "first_index": start, "next_cursor": hi if hi < end else None}
+
+    @staticmethod
+    def _hydrate(msg: Dict[str, Any]) -> Dict[str, Any]:
+        if "citations" not in msg:
+            return dict(msg)
+        refs = enumerate(msg["citations"], 1)
+        return {**msg, "citations": [make_citation(n, knowledge_by_id[cid], rel) for n, (cid, rel) in refs if cid in knowledge_by_id]}
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            self._evict(time.monotonic())
+            return {"count": len(self.sessions), "bytes": self.bytes, "messages": self.messages,
+                    **{k: self.counts[k] for k in ("trimmed_messages", "expired", "evicted_lru", "evicted_memory")}}
+
+
+class SQLiteSessionStore:
+    """`SessionStore` bounds over the shared `chat_sessions` / `chat_messages` tables.
+
+    Every worker sees the same transcripts. Eviction follows the same rules,
+    least recently seen first; totals and eviction counts are `sessions.*`
+    counters, and `seen` is wall-clock time because workers share no
+    monotonic clock.
+    """
+
+    def __init__(self, storage: SQLiteStorage, max_messages: int, idle_ttl: float, max_sessions: int, max_bytes: int):
+        self.storage = storage
+        self.max_messages, self.idle_ttl = max_messages, idle_ttl
+        self.max_sessions, self.max_bytes = max_sessions, max_bytes
+
+    def __len__(self):
+        return self.storage.counter("sessions.count")
+
+    def __contains__(self, session_id: str):
+        return self.storage.db().execute("SELECT 1 FROM chat_sessions WHERE session_id = ?", (session_id,)).fetchone() is not None
+
+    def _evict(self, db: sqlite3.Connection, now: float):
+        count, size = self.storage.counter("sessions.count"), self.storage.counter("sessions.bytes")
+        deltas: Counter = Counter()
+        while True:
+            row = db.execute("SELECT session_id, seen, bytes, next - start FROM chat_sessions ORDER BY seen LIMIT 1").fetchone()
+            if row is None:
+                break
+            session_id, seen, s_bytes, s_messages = row
+            if now - seen > self.idle_ttl:
+                reason = "expired"
+            elif count > self.max_sessions:
+                reason = "evicted_lru"
+            elif size > self.max_bytes and count > 1:
+                reason = "evicted_memory"
+            else:
+                break
+            db.execute("DELETE FROM chat_messages WHERE session_id = ?", (session_id,))
+            db.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+            count, size = count - 1, size - s_bytes
+            deltas.update({"sessions.count": -1, "sessions.bytes": -s_bytes, "sessions.messages": -s_messages, f"sessions.{reason}": 1})
+        if deltas:
+            self.storage.add_counters(deltas)
+
+    def append(self, session_id: str, *messages: Dict[str, Any]):
+        now = time.time()
+        with self.storage.transaction() as db:
+            self._evict(db, now)
+            row = db.execute("SELECT start, next, bytes FROM chat_sessions WHERE session_id = ?", (session_id,)).fetchone()
+            start, end, s_bytes = row or (0, 0, 0)
+            deltas: Counter = Counter({"sessions.count": int(row is None)})
+            rows = []
+            for msg in messages:
+                size = _message_bytes(msg)
+                rows.append((session_id, end, size, json.dumps(msg)))
+                end += 1; s_bytes += size
+                deltas.update({"sessions.bytes": size, "sessions.messages": 1})
+            db.executemany("INSERT INTO chat_messages VALUES (?, ?, ?, ?)", rows)
+            if end - start > self.max_messages:
+                start = end - self.max_messages
+                n, size = db.execute("SELECT COUNT(*), TOTAL(bytes) FROM chat_messages WHERE session_id = ? AND idx < ?", (session_id, start)).fetchone()
+                db.execute("DELETE FROM chat_messages WHERE session_id = ? AND idx < ?", (session_id, start))
+                s_bytes -= int(size)
+                deltas.update({"sessions.bytes": -int(size), "sessions.messages": -n, "sessions.trimmed_messages": n})
+            db.execute("INSERT OR REPLACE INTO chat_sessions VALUES (?, ?, ?, ?, ?)", (session_id, start, end, s_bytes, now))
+            self.storage.add_counters(deltas)
+            self._evict(db, now)
+
+    def page(self, session_id: str, cursor: Optional[int] = None, limit: int = SESSION_PAGE_SIZE) -> Optional[Dict[str, Any]]:
+        """Up to `limit` messages from absolute index `cursor` (default: the oldest kept)."""
+        now = time.time()
+        with self.storage.transaction() as db:
+            self._evict(db, now)
+            row = db.execute("SELECT start, next FROM chat_sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE chat_sessions SET seen = ? WHERE session_id = ?", (now, session_id))
+            start, end = row
+            lo = min(max(start, start if cursor is None else cursor), end)
+            hi = min(end, lo + limit)
+            msgs = [json.loads(m) for m, in db.execute(
+                "SELECT message FROM chat_messages WHERE session_id = ? AND idx >= ? AND idx < ? ORDER BY idx", (session_id, lo, hi))]
+        return {"messages": [SessionStore._hydrate(m) for m in msgs], "first_index": start, "next_cursor": hi if hi < end else None}
+
+    def stats(self) -> Dict[str, Any]:
+        with self.storage.transaction() as db:
+            self._evict(db, time.time())
+            counts = self.storage.counters("sessions.")
+        return {k: counts.get(k, 0) for k in ("count", "bytes", "messages", "trimmed_messages", "expired", "evicted_lru", "evicted_memory")}
+
+
+# ─── Research History Index ──────────────────────────────────
+RESEARCH_PAGE_SIZE = 50
+
+
+class ResearchHistory:
+    """Research records newest first, with niche and outcome indexes maintained on insert.
+
+    Every index is a sorted list of (date_researched, -arrival) keys: one for
+    all records, one per niche, per outcome and per (niche, outcome). A
+    filtered page is then a bisect to the cursor plus a slice, with no
+    re-sort. Walking a list backwards gives newest first, and records with the
+    same date keep arrival order, as the old stable sort did. Niche and
+    outcome match case-insensitively.
+    """
+
+    def __init__(self):
+        self.records: List[Dict[str, Any]] = []
+        self.indexes: Dict[tuple, List[tuple]] = defaultdict(list)
+        self.outcomes: Dict[str, str] = {}  # casefolded -> as first seen
+        self.lock = threading.Lock()
+
+    def add(self, records: Iterable[Dict[str, Any]]):
+        with self.lock:
+            for record in records:
+                key = (record["date_researched"], -len(self.records))
+                self.records.append(record)
+                niche, outcome = record["niche"].casefold(), record["outcome"].casefold()
+                self.outcomes.setdefault(outcome, record["outcome"])
+                for index in ((None, None), (niche, None), (None, outcome), (niche, outcome)):
+                    bisect.insort(self.indexes[index], key)
+
+    @staticmethod
+    def cursor(key: tuple) -> str:
+        return f"{key[0]}~{-key[1]}"
+
+    @staticmethod
+    def parse_cursor(cursor: str) -> tuple:
+        date, sep, seq = cursor.rpartition("~")
+        if not sep or not seq.isdigit():
+            raise ValueError(f"Invalid cursor {cursor!r}")
+        return date, -int(seq)
+
+    def page(self, niche: Optional[str] = None, outcome: Optional[str] = None, after: Optional[str] = None, limit: int = RESEARCH_PAGE_SIZE) -> Dict[str, Any]:
+        """Up to `limit` matching records older than the `after` cursor, newest first.
+
+        `total` counts every match and `outcomes` breaks the niche's matches
+        down by outcome. Pass `next_cursor` back as `after` for the next page.
+        """
+        niche_key = niche.casefold() if niche else None
+        with self.lock:
+            keys = self.indexes.get((niche_key, outcome.casefold() if outcome else None), [])
+            end = bisect.bisect_left(keys, self.parse_cursor(after)) if after else len(keys)
+            start = max(0, end - limit)
+            page = keys[start:end][::-1]
+            outcomes = {label: len(self.indexes.get((niche_key, o), ())) for o, label in self.outcomes.items()}
+            return {
+                "total": len(keys), "outcomes": {k: v for k, v in outcomes.items() if v},
+                "records": [self.records[-seq] for _, seq in page],
+                "next_cursor": self.cursor(page[-1]) if start > 0 and page else None,
+            }
+
+
+# ─── Stores ──────────────────────────────────────────────────
+storage = open_storage()
+sales_data = storage.sales
 product_research: List[Dict[str, Any]] = []
+research_history = ResearchHistory()
 competitors_store: List[Dict[str, Any]] = []
-chat_sessions: Dict[str, List[Dict[str, Any]]] = {}
+chat_sessions = storage.open_sessions(SESSION_MAX_MESSAGES, SESSION_IDLE_TTL, SESSION_MAX_COUNT, SESSION_MAX_BYTES)
 uploaded_files: List[Dict[str, Any]] = []
-analytics: Dict[str, Any] = {
-    "total_queries": 0,
-    "queries_by_type": {},
-    "avg_response_time": 0,
-    "total_response_time": 0,
-    "feedback_positive": 0,
-    "feedback_negative": 0,
-    "files_uploaded": 0,
-    "products_researched": 0,
-    "reports_generated": 0,
-}
+_shared_lock = threading.Lock()
+
+# Shared counters (storage "analytics.*"), in the order /api/v1/analytics lists them.
+ANALYTICS_COUNTERS = ("total_queries", "total_response_time", "feedback_positive", "feedback_negative",
+                      "files_uploaded", "products_researched", "reports_generated")
+
+
+def count_analytics(deltas: Dict[str, Union[int, float]]):
+    """Add to the analytics counters; atomic across workers. Blocks on a write, so call it off the event loop."""
+    storage.add_counters({f"analytics.{k}": v for k, v in deltas.items() if v})
+
+
+def analytics_snapshot() -> Dict[str, Any]:
+    counts = storage.counters("analytics.")
+    out = {k: counts.get(k, 0) for k in ANALYTICS_COUNTERS}
+    return {
+        "total_queries": out["total_queries"],
+        "queries_by_type": {k.split(".", 1)[1]: v for k, v in counts.items() if k.startswith("queries_by_type.")},
+        "avg_response_time": round(out["total_response_time"] / out["total_queries"], 3) if out["total_queries"] else 0,
+        **out,
+    }
+
+
+def sync_shared_state():
+    """Pull research and upload records committed by any worker since the last sync.
+
+    `product_research` and `uploaded_files` are per-process views of the
+    storage tables; they only grow, so the retrieval and history indexes
+    keep syncing incrementally.
+    """
+    with _shared_lock:
+        if storage.changed():
+            research = storage.poll("research")
+            product_research.extend(research)
+            research_history.add(research)
+            uploaded_files.extend(storage.poll("uploads"))
+
 
 PRODUCT_NICHES = [
     "Home & Kitchen", "Beauty & Personal Care", "Health & Wellness",
@@ -58,6 +1057,404 @@ PRODUCT_NICHES = [
     "Office & Productivity", "Fashion & Accessories", "Toys & Games",
 ]
 
+# ─── Response Encoding ───────────────────────────────────────
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", 5))
+# Bulky per-item detail dropped by `?slim=true`: trend series, competitor pros/cons, score breakdowns.
+SLIM_DROP_KEYS = frozenset({"interest_over_time", "strengths", "weaknesses", "dimensions"})
+
+
+def _field_tree(fields: str) -> Dict[str, Any]:
+    """Parse "a,b.c,b.d" into {"a": None, "b": {"c": None, "d": None}}; None keeps the whole value."""
+    tree: Dict[str, Any] = {}
+    for path in fields.split(","):
+        node, parts = tree, [p for p in path.strip().split(".") if p]
+        for i, part in enumerate(parts):
+            if i == len(parts) - 1:
+                node[part] = None
+                break
+            child = node.setdefault(part, {})
+            if child is None:
+                break  # the whole of `part` is already selected
+            node = child
+    return tree
+
+
+def select_fields(data: Any, tree: Optional[Dict[str, Any]]) -> Any:
+    """Keep only the selected keys of `data`; lists apply the selection to each item."""
+    if tree is None:
+        return data
+    if isinstance(data, list):
+        return [select_fields(item, tree) for item in data]
+    if isinstance(data, dict):
+        return {k: select_fields(v, tree[k]) for k, v in data.items() if k in tree}
+    return data
+
+
+def slim_payload(data: Any) -> Any:
+    if isinstance(data, dict):
+        return {k: slim_payload(v) for k, v in data.items() if k not in SLIM_DROP_KEYS}
+    if isinstance(data, list):
+        return [slim_payload(item) for item in data]
+    return data
+
+
+class ResponseShape:
+    """`?fields=` and `?slim=` options for endpoints that return large tool payloads.
+
+    Calling it renders the payload straight to a FastJSONResponse, skipping
+    FastAPI's jsonable_encoder pass over data that is already plain JSON
+    types. Tool results may be shared cache entries, so they are copied
+    rather than edited.
+    """
+
+    def __init__(self, fields: Optional[str] = Query(None, description="Comma-separated keys to keep; dots select nested keys (e.g. top_products.title)"),
+                 slim: bool = Query(False, description="Drop bulky detail: " + ", ".join(sorted(SLIM_DROP_KEYS)))):
+        self.tree = _field_tree(fields) if fields else None
+        self.slim = slim
+
+    def __call__(self, data: Any, status_code: int = 200) -> FastJSONResponse:
+        if self.slim:
+            data = slim_payload(data)
+        return FastJSONResponse(select_fields(data, self.tree), status_code=status_code)
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app, minimum_size: int, quality: int):
+        super().__init__(app, minimum_size)
+        self.quality = quality
+        self.compressor = None
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if len(body) >= 128 * 1024:
+            return await run_in_threadpool(self._compress_body, body, more_body)  # keep big bodies off the event loop
+        return self._compress_body(body, more_body)
+
+    def _compress_body(self, body: bytes, more_body: bool) -> bytes:
+        if self.compressor is None:
+            self.compressor = brotli.Compressor(quality=self.quality)
+        return self.compressor.process(body) + (self.compressor.flush() if more_body else self.compressor.finish())
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """Brotli for clients that accept it (when the brotli package is installed), gzip otherwise.
+
+    Bodies under COMPRESS_MIN_BYTES and event streams are sent as is.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES, compresslevel: int = GZIP_LEVEL, quality: int = BROTLI_QUALITY):
+        super().__init__(app, minimum_size=minimum_size, compresslevel=compresslevel)
+        self.quality = quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and brotli is not None and "br" in Headers(scope=scope).get("Accept-Encoding", ""):
+            return await BrotliResponder(self.app, self.minimum_size, self.quality)(scope, receive, send)
+        await super().__call__(scope, receive, send)
+
+
+app.add_middleware(CompressionMiddleware)
+
+
+# ─── Latency Metrics ─────────────────────────────────────────
+METRICS_FLUSH_SECONDS = float(os.environ.get("METRICS_FLUSH_SECONDS", 1))
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+HISTOGRAMS = {  # family: (label name, bucket upper bounds, help)
+    "stage_seconds": ("stage", LATENCY_BUCKETS, "Time spent in one stage of request handling."),
+    "tool_seconds": ("tool", LATENCY_BUCKETS, "Agent tool call latency."),
+    "request_seconds": ("route", LATENCY_BUCKETS, "HTTP request latency, up to the end of the response."),
+    "sales_summary_scan": ("unit", (10, 100, 1000, 10_000, 100_000, 1_000_000, 10_000_000), "Rollup cells or raw rows folded per sales summary."),
+}
+METRIC_COUNTERS = {
+    "csv_parse_rows_total": "Sales rows parsed from uploaded CSV files.",
+    "csv_parse_bytes_total": "Bytes of uploaded CSV files parsed.",
+    "csv_parse_seconds_total": "Time spent parsing uploaded CSV files.",
+}
+_stage_timings: ContextVar[Optional[List[tuple]]] = ContextVar("stage_timings", default=None)
+
+
+class Metrics:
+    """Fixed-bucket histograms and counters, recorded per process and merged in storage.
+
+    `observe` only bumps a pending bucket under a lock, about a microsecond.
+    `flush` adds the pending deltas to the shared "metrics.*" counters, so
+    percentiles and /metrics cover every worker whichever one serves them.
+    Buckets are stored per bucket (not cumulative) under
+    "metrics.<family>|<label>|<index>", plus "|sum".
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending: Dict[tuple, List[float]] = {}
+        self.counts: Counter = Counter()
+        self.flushed_at = time.monotonic()
+
+    def observe(self, family: str, label: str, value: float):
+        bounds = HISTOGRAMS[family][1]
+        with self.lock:
+            acc = self.pending.get((family, label))
+            if acc is None:
+                acc = self.pending[family, label] = [0] * (len(bounds) + 2)  # buckets, +Inf, sum
+            acc[bisect.bisect_left(bounds, value)] += 1
+            acc[-1] += value
+
+    def count(self, deltas: Dict[str, Union[int, float]]):
+        with self.lock:
+            self.counts.update(deltas)
+
+    def due(self) -> bool:
+        return bool(self.pending or self.counts) and time.monotonic() - self.flushed_at >= METRICS_FLUSH_SECONDS
+
+    def flush(self):
+        """Move pending samples into storage. Blocks on a write, so call it off the event loop."""
+        with self.lock:
+            pending, counts = self.pending, self.counts
+            self.pending, self.counts, self.flushed_at = {}, Counter(), time.monotonic()
+        deltas = {f"metrics.{name}": v for name, v in counts.items() if v}
+        for (family, label), acc in pending.items():
+            prefix = f"metrics.{family}|{label}|"
+            deltas.update((f"{prefix}{i}", n) for i, n in enumerate(acc[:-1]) if n)
+            deltas[prefix + "sum"] = acc[-1]
+        if deltas:
+            storage.add_counters(deltas)
+
+    def snapshot(self) -> tuple:
+        """Flush, then read back ({family: {label: {"buckets", "sum"}}}, {counter: value}) across workers."""
+        self.flush()
+        hists: Dict[str, Dict[str, Dict[str, Any]]] = {family: {} for family in HISTOGRAMS}
+        counters = {name: 0 for name in METRIC_COUNTERS}
+        for key, value in storage.counters("metrics.").items():
+            if "|" not in key:
+                counters[key] = value
+                continue
+            family, label, slot = key.split("|")
+            if family not in HISTOGRAMS:
+                continue
+            hist = hists[family].setdefault(label, {"buckets": [0] * (len(HISTOGRAMS[family][1]) + 1), "sum": 0})
+            if slot == "sum":
+                hist["sum"] = value
+            else:
+                hist["buckets"][int(slot)] = value
+        return hists, counters
+
+
+metrics = Metrics()
+
+
+def record_timing(family: str, label: str, elapsed: float):
+    """Record a duration in histogram `family` and in the current request's Server-Timing header."""
+    metrics.observe(family, label, elapsed)
+    timings = _stage_timings.get()
+    if timings is not None:
+        timings.append((label, elapsed))
+
+
+class timed:
+    """Time a block (`with timed(...)`) or every call of a decorated function with `record_timing`.
+
+    A plain class rather than @contextmanager: it is entered on every chat
+    request several times, and this keeps it to a couple of microseconds.
+    """
+
+    __slots__ = ("family", "label", "start")
+
+    def __init__(self, family: str, label: str):
+        self.family, self.label = family, label
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        record_timing(self.family, self.label, time.perf_counter() - self.start)
+
+    def __call__(self, fn):
+        family, label = self.family, self.label
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record_timing(family, label, time.perf_counter() - start)
+        return wrapper
+
+
+def histogram_quantile(q: float, bounds: tuple, buckets: List[int]) -> Optional[float]:
+    """Estimate the q-quantile by linear interpolation inside its bucket, as Prometheus does."""
+    rank, seen = q * sum(buckets), 0
+    for i, n in enumerate(buckets):
+        if n and seen + n >= rank:
+            if i == len(bounds):
+                return bounds[-1]  # +Inf bucket: the highest finite bound is the best estimate
+            lo = bounds[i - 1] if i else 0
+            return lo + (bounds[i] - lo) * (rank - seen) / n
+        seen += n
+    return None
+
+
+def histogram_summary(family: str, hist: Dict[str, Any], scale: float = 1) -> Dict[str, Any]:
+    bounds, count = HISTOGRAMS[family][1], sum(hist["buckets"])
+    out = {"count": count, "mean": round(hist["sum"] / count * scale, 3) if count else None}
+    for q in (0.5, 0.95, 0.99):
+        value = histogram_quantile(q, bounds, hist["buckets"])
+        out[f"p{round(q * 100)}"] = round(value * scale, 3) if value is not None else None
+    return out
+
+
+def metrics_report() -> Dict[str, Any]:
+    """Percentiles for /api/v1/analytics: latencies in milliseconds, scan sizes in cells/rows, parse throughput."""
+    hists, counters = metrics.snapshot()
+    seconds = counters["csv_parse_seconds_total"]
+    return {
+        "latency_ms": {HISTOGRAMS[family][0]: {label: histogram_summary(family, h, 1000) for label, h in sorted(hists[family].items())}
+                       for family in ("stage_seconds", "tool_seconds", "request_seconds")},
+        "sales_summary_scan": {label: histogram_summary("sales_summary_scan", h) for label, h in sorted(hists["sales_summary_scan"].items())},
+        "csv_parse": {
+            "rows": counters["csv_parse_rows_total"], "bytes": counters["csv_parse_bytes_total"], "seconds": round(seconds, 3),
+            "rows_per_second": round(counters["csv_parse_rows_total"] / seconds) if seconds else None,
+            "mb_per_second": round(counters["csv_parse_bytes_total"] / seconds / 1e6, 2) if seconds else None,
+        },
+    }
+
+
+def _prom_value(v: float) -> str:
+    return "+Inf" if v == math.inf else repr(float(v)) if isinstance(v, float) else str(v)
+
+
+def prometheus_text(prefix: str = "researcher_") -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    hists, counters = metrics.snapshot()
+    lines = []
+    for family, (label_name, bounds, help_text) in HISTOGRAMS.items():
+        name = prefix + family
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for label, hist in sorted(hists[family].items()):
+            tag = label_name + '="' + label.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+            for le, cum in zip((*bounds, math.inf), itertools.accumulate(hist["buckets"])):
+                lines.append(f'{name}_bucket{{{tag},le="{_prom_value(le)}"}} {cum}')
+            lines.append(f"{name}_sum{{{tag}}} {_prom_value(hist['sum'])}")
+            lines.append(f"{name}_count{{{tag}}} {sum(hist['buckets'])}")
+    for counter, help_text in METRIC_COUNTERS.items():
+        lines += [f"# HELP {prefix}{counter} {help_text}", f"# TYPE {prefix}{counter} counter", f"{prefix}{counter} {_prom_value(counters[counter])}"]
+    return "\n".join(lines) + "\n"
+
+
+class ServerTimingMiddleware:
+    """Adds a Server-Timing header listing the stages timed during the request, plus `total`.
+
+    Streamed responses list only the stages finished before their headers go
+    out. Each request is also recorded in `request_seconds` under its route
+    template, and pending samples are flushed at most every
+    METRICS_FLUSH_SECONDS, after the response has been sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        timings: List[tuple] = []
+        token = _stage_timings.set(timings)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                entries = [*timings, ("total", time.perf_counter() - start)]
+                header = ", ".join(f"{name};dur={elapsed * 1000:.3f}" for name, elapsed in entries)
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _stage_timings.reset(token)
+            route = scope.get("route")
+            metrics.observe("request_seconds", getattr(route, "path", "unmatched"), time.perf_counter() - start)
+            if metrics.due():
+                await run_in_threadpool(metrics.flush)
+
+
+app.add_middleware(ServerTimingMiddleware)
+
+
+# ─── Sampling Profiler ───────────────────────────────────────
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+PROFILE_MAX_SECONDS = float(os.environ.get("PROFILE_MAX_SECONDS", 60))
+# Leaf frames of threads parked waiting for work (event loop, thread pools); left out unless idle=true.
+PROFILE_IDLE_LEAVES = {"threading.py:Condition.wait", "selectors.py:EpollSelector.select", "selectors.py:_PollLikeSelector.select",
+                       "selectors.py:KqueueSelector.select", "selectors.py:SelectSelector.select", "thread.py:_worker"}
+_profile_lock = threading.Lock()
+
+
+def require_admin(token: Optional[str]):
+    """Admin endpoints exist only when ADMIN_TOKEN is set, and need it in the X-Admin-Token header."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not token or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+def sample_stacks(seconds: float, interval: float) -> Counter:
+    """Sample the Python stack of every other thread in this process each `interval` seconds.
+
+    Returns sample counts keyed by stacks of code objects, innermost first.
+    Nothing runs between profiles; while sampling, each tick costs one
+    `sys._current_frames()` call and a walk up each stack.
+    """
+    me = threading.get_ident()
+    stacks: Counter = Counter()
+    deadline = time.monotonic() + seconds
+    while True:
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            codes = []
+            while frame is not None:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            stacks[tuple(codes)] += 1
+        frame = None  # drop the last frame reference before sleeping
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return stacks
+        time.sleep(min(interval, remaining))
+
+
+def _frame_label(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_qualname}"
+
+
+def profile_report(stacks: Counter, include_idle: bool = False, top_n: int = 30) -> Dict[str, Any]:
+    """Collapsed stacks (root first, flamegraph.pl / speedscope input) and a top-functions table.
+
+    `self` counts samples where the function was running, `total` samples
+    where it was anywhere on the stack.
+    """
+    collapsed: Counter = Counter()
+    for codes, n in stacks.items():
+        labels = [_frame_label(code) for code in reversed(codes)]
+        if labels and (include_idle or labels[-1] not in PROFILE_IDLE_LEAVES):
+            collapsed[";".join(labels)] += n
+    self_counts, total_counts = Counter(), Counter()
+    for stack, n in collapsed.items():
+        frames = stack.split(";")
+        self_counts[frames[-1]] += n
+        for label in set(frames):
+            total_counts[label] += n
+    samples = sum(collapsed.values())
+    pct = lambda n: round(n / samples * 100, 1) if samples else 0
+    ranked = sorted(total_counts, key=lambda f: (-self_counts[f], -total_counts[f], f))[:top_n]
+    return {
+        "samples": samples,
+        "top_functions": [{"function": f, "self": self_counts[f], "self_pct": pct(self_counts[f]), "total": total_counts[f], "total_pct": pct(total_counts[f])} for f in ranked],
+        "collapsed": [f"{stack} {n}" for stack, n in collapsed.most_common()],
+    }
+
+
 # ─── E-Commerce Knowledge Base (RAG corpus) ──────────────────
 ECOMMERCE_KNOWLEDGE = [
     {
@@ -110,16 +1507,50 @@ ECOMMERCE_KNOWLEDGE = [
 ]
 
 # ─── Mock Google Trends Data (simulates MCP) ─────────────────
-def generate_mock_trends(niche: str, days: int = 30) -> Dict:
-    random.seed(hash(niche) % 10000)
-    base_interest = random.randint(30, 70)
-    trend_data = []
+def _stable_seed(key: Union[str, bytes]) -> int:
+    """Seed for `key` that is the same in every process (builtin hash() is salted per process).
+
+    Each generator draws from its own `random.Random(_stable_seed(...))`, so
+    calls are reproducible across workers and safe to run on parallel threads.
+    """
+    data = key.encode() if isinstance(key, str) else key
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+class TrendSeries(NamedTuple):
+    """Daily search interest: a start-day ordinal plus one int16 per day.
+
+    Two bytes a day instead of a dict with a formatted date per point, and
+    whole windows stack into a matrix for vectorized comparisons.
+    """
+    start: int
+    values: np.ndarray
+
+    def points(self) -> List[Dict]:
+        return [{"date": _day_string(self.start + i), "interest": v} for i, v in enumerate(self.values.tolist())]
+
+
+def _mock_interest(rng: random.Random, days: int) -> np.ndarray:
+    randint, uniform = rng.randint, rng.uniform
+    base_interest = randint(30, 70)
+    raw = []
     for i in range(days):
-        date = (datetime.now() - timedelta(days=days - i)).strftime("%Y-%m-%d")
-        noise = random.randint(-8, 12)
-        growth = int(i * random.uniform(0.3, 1.5))
-        value = min(100, max(0, base_interest + growth + noise))
-        trend_data.append({"date": date, "interest": value})
+        noise = randint(-8, 12)  # draw order matters: the same rng then picks rising queries
+        raw.append(base_interest + int(i * uniform(0.3, 1.5)) + noise)
+    values = np.clip(np.array(raw, dtype=np.int64), 0, 100).astype(np.int16)
+    values.flags.writeable = False  # shared through tool_cache
+    return values
+
+
+def mock_trend_series(niche: str, days: int = 30, today: Optional[int] = None) -> TrendSeries:
+    """The last `days` days of interest for `niche`, ending the day before `today` (an ordinal; default now)."""
+    start = (today or datetime.now().toordinal()) - days
+    return TrendSeries(start, _mock_interest(random.Random(_stable_seed(niche)), days))
+
+
+def generate_mock_trends(niche: str, days: int = 30) -> Dict:
+    rng = random.Random(_stable_seed(niche))
+    series = TrendSeries(datetime.now().toordinal() - days, _mock_interest(rng, days))
 
     query_pool = {
         "Home & Kitchen": ["portable ice maker", "self watering planter", "led closet light", "collapsible colander", "smart soap dispenser", "bamboo desk organizer", "magnetic spice rack", "electric kettle gooseneck"],
@@ -132,25 +1563,25 @@ def generate_mock_trends(niche: str, days: int = 30) -> Dict:
     queries = query_pool.get(niche, [f"trending product {i}" for i in range(1, 9)])
     rising_queries = []
     for q in queries[:6]:
-        rising_queries.append({"query": q, "search_volume": random.randint(5000, 80000), "growth_pct": random.randint(15, 350), "trend": random.choice(["rising", "rising", "rising", "breakout"])})
+        rising_queries.append({"query": q, "search_volume": rng.randint(5000, 80000), "growth_pct": rng.randint(15, 350), "trend": rng.choice(["rising", "rising", "rising", "breakout"])})
     rising_queries.sort(key=lambda x: x["growth_pct"], reverse=True)
 
-    current = trend_data[-1]["interest"] if trend_data else 50
-    previous = trend_data[0]["interest"] if trend_data else 50
+    current = int(series.values[-1]) if days else 50
+    previous = int(series.values[0]) if days else 50
     velocity = round((current - previous) / max(previous, 1) * 100, 1)
 
     return {
         "niche": niche, "period": f"Last {days} days", "current_interest": current,
         "trend_velocity": velocity,
         "trend_direction": "rising" if velocity > 10 else "stable" if velocity > -10 else "declining",
-        "interest_over_time": trend_data, "rising_queries": rising_queries,
+        "interest_over_time": series.points(), "rising_queries": rising_queries,
         "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "source": "Google Trends API (demo)",
     }
 
 
 # ─── Mock Amazon Product Data (simulates MCP) ────────────────
 def generate_mock_amazon_products(niche: str, count: int = 10) -> List[Dict]:
-    random.seed(hash(niche + "amazon") % 10000)
+    rng = random.Random(_stable_seed(niche + "amazon"))
     templates = {
         "Home & Kitchen": [
             ("Portable Countertop Ice Maker", 79.99, 129.99), ("Self-Watering Planter System (3-Pack)", 24.99, 44.99),
@@ -198,17 +1629,17 @@ def generate_mock_amazon_products(niche: str, count: int = 10) -> List[Dict]:
     product_list = templates.get(niche, [(f"{niche} Product {i}", 14.99 + i * 5, 29.99 + i * 8) for i in range(1, 11)])
     products = []
     for name, low, high in product_list[:count]:
-        price = round(random.uniform(low, high), 2)
-        bsr = random.randint(800, 85000)
+        price = round(rng.uniform(low, high), 2)
+        bsr = rng.randint(800, 85000)
         products.append({
-            "asin": f"B0{random.randint(10000000, 99999999)}", "title": name, "price": price,
-            "rating": round(random.uniform(3.2, 4.9), 1), "review_count": random.randint(12, 4500),
+            "asin": f"B0{rng.randint(10000000, 99999999)}", "title": name, "price": price,
+            "rating": round(rng.uniform(3.2, 4.9), 1), "review_count": rng.randint(12, 4500),
             "bsr": bsr, "bsr_category": niche,
-            "estimated_monthly_sales": max(50, int(200000 / bsr * random.uniform(0.6, 1.4))),
-            "estimated_monthly_revenue": round(max(50, int(200000 / bsr * random.uniform(0.6, 1.4))) * price, 2),
-            "seller_count": random.randint(3, 45),
-            "fba_available": random.choice([True, True, True, False]),
-            "prime_eligible": random.choice([True, True, False]),
+            "estimated_monthly_sales": max(50, int(200000 / bsr * rng.uniform(0.6, 1.4))),
+            "estimated_monthly_revenue": round(max(50, int(200000 / bsr * rng.uniform(0.6, 1.4))) * price, 2),
+            "seller_count": rng.randint(3, 45),
+            "fba_available": rng.choice([True, True, True, False]),
+            "prime_eligible": rng.choice([True, True, False]),
         })
     products.sort(key=lambda x: x["bsr"])
     return products
@@ -216,65 +1647,385 @@ def generate_mock_amazon_products(niche: str, count: int = 10) -> List[Dict]:
 
 # ─── Mock Competitor Data ─────────────────────────────────────
 def generate_mock_competitors(product_name: str) -> List[Dict]:
-    random.seed(hash(product_name + "comp") % 10000)
+    rng = random.Random(_stable_seed(product_name + "comp"))
     store_names = ["ArcticCool Co.", "PrimeLiving Store", "HomeEssentials Pro", "SmartHome Direct",
                    "EverydayDeals Shop", "QualityFirst Goods", "TrendyFinds", "ValueMax Store", "PremiumPicks", "BudgetSmart"]
     comps = []
-    for i in range(random.randint(5, 10)):
+    for i in range(rng.randint(5, 10)):
         comps.append({
-            "id": str(uuid.uuid4()), "store_name": store_names[i % len(store_names)],
-            "platform": random.choice(["Amazon", "Amazon", "Amazon", "Shopify", "Shopify", "Walmart"]),
-            "price": round(random.uniform(19.99, 129.99), 2),
-            "rating": round(random.uniform(3.0, 4.9), 1), "review_count": random.randint(15, 5000),
-            "estimated_monthly_sales": random.randint(100, 5000),
-            "shipping_speed": random.choice(["2-day (Prime)", "3-5 days", "5-7 days", "7-14 days"]),
-            "estimated_ad_spend": round(random.uniform(1000, 15000), 0) if random.random() > 0.3 else None,
-            "strengths": random.sample(["Strong brand", "Fast shipping", "High reviews", "Competitive pricing", "Premium packaging", "Active social media"], k=random.randint(1, 3)),
-            "weaknesses": random.sample(["Slow shipping", "Low reviews", "Poor photos", "High price", "No social media", "Bad sentiment"], k=random.randint(1, 3)),
+            "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)), "store_name": store_names[i % len(store_names)],
+            "platform": rng.choice(["Amazon", "Amazon", "Amazon", "Shopify", "Shopify", "Walmart"]),
+            "price": round(rng.uniform(19.99, 129.99), 2),
+            "rating": round(rng.uniform(3.0, 4.9), 1), "review_count": rng.randint(15, 5000),
+            "estimated_monthly_sales": rng.randint(100, 5000),
+            "shipping_speed": rng.choice(["2-day (Prime)", "3-5 days", "5-7 days", "7-14 days"]),
+            "estimated_ad_spend": round(rng.uniform(1000, 15000), 0) if rng.random() > 0.3 else None,
+            "strengths": rng.sample(["Strong brand", "Fast shipping", "High reviews", "Competitive pricing", "Premium packaging", "Active social media"], k=rng.randint(1, 3)),
+            "weaknesses": rng.sample(["Slow shipping", "Low reviews", "Poor photos", "High price", "No social media", "Bad sentiment"], k=rng.randint(1, 3)),
         })
     comps.sort(key=lambda x: x["estimated_monthly_sales"], reverse=True)
     return comps
 
 
+# ─── Product Title Index ─────────────────────────────────────
+TITLE_MATCH_MIN_SIMILARITY = 0.35
+CATALOG_PRODUCTS_PER_NICHE = 10
+
+
+class TitleMatch(NamedTuple):
+    similarity: float
+    title: str
+    product: Dict
+
+
+class TitleIndex:
+    """Character-trigram inverted index for fuzzy product-title lookup.
+
+    Titles are casefolded and split into words, and each word is padded as
+    "  word " before cutting trigrams, so typos cost a few trigrams and word
+    order does not matter. Postings are per-trigram arrays of title ids;
+    similarity is shared / (query + title - shared) trigrams, as in pg_trgm.
+    Titles that normalize to one already indexed keep the first product.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.titles: List[str] = []
+        self.products: List[Dict] = []
+        self.sizes: List[int] = []
+        self.by_norm: Dict[str, int] = {}
+        self.postings: Dict[str, List[int]] = defaultdict(list)
+        self.arrays: Dict[str, np.ndarray] = {}  # frozen postings, dropped when a title adds to them
+        self.size_array = np.zeros(0, dtype=np.int32)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(re.findall(r"[^\W_]+", text.casefold()))
+
+    @staticmethod
+    def trigrams(norm: str) -> set:
+        grams = set()
+        for word in norm.split():
+            padded = f"  {word} "
+            grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+        return grams
+
+    def add(self, title: str, product: Dict) -> int:
+        norm = self.normalize(title)
+        grams = self.trigrams(norm)
+        with self.lock:
+            if norm in self.by_norm:
+                return self.by_norm[norm]
+            doc = self.by_norm[norm] = len(self.titles)
+            self.titles.append(title)
+            self.products.append(product)
+            self.sizes.append(len(grams))
+            for gram in grams:
+                self.postings[gram].append(doc)
+                self.arrays.pop(gram, None)
+            return doc
+
+    def compact(self):
+        """Freeze every posting list now rather than on first lookup (after a bulk load)."""
+        with self.lock:
+            for gram, postings in self.postings.items():
+                if gram not in self.arrays:
+                    self.arrays[gram] = np.array(postings, dtype=np.int32)
+            self.size_array = np.array(self.sizes, dtype=np.int32)
+
+    def search(self, query: str, k: int = 5, min_similarity: float = TITLE_MATCH_MIN_SIMILARITY,
+               where: Optional[Callable[[Dict], bool]] = None) -> List[TitleMatch]:
+        """Up to `k` titles at least `min_similarity` alike, most similar first (ties: first indexed).
+
+        A title that alike shares at least `need` of the query's trigrams, so
+        it appears in one of the query's `len(grams) - need + 1` rarest posting
+        lists. Candidates come from those, and only the ones that could still
+        reach `min_similarity` probe the long common lists (sorted by doc id)
+        to finish their counts. `where`, if given, keeps only the titles whose
+        product it accepts; it sees just the titles alike enough to match.
+        """
+        grams = self.trigrams(self.normalize(query))
+        with self.lock:
+            lists = []
+            for gram in grams:
+                if gram in self.postings:
+                    if gram not in self.arrays:
+                        self.arrays[gram] = np.array(self.postings[gram], dtype=np.int32)
+                    lists.append(self.arrays[gram])
+            if len(self.size_array) != len(self.sizes):
+                self.size_array = np.array(self.sizes, dtype=np.int32)
+            sizes, titles, products = self.size_array, self.titles, self.products
+        need = max(1, math.ceil(min_similarity * len(grams) - 1e-9))
+        rare = len(grams) - need + 1 - (len(grams) - len(lists))  # unindexed query trigrams are the rarest of all
+        if rare <= 0:
+            return []
+        lists.sort(key=len)
+        docs, shared = np.unique(np.concatenate(lists[:rare]), return_counts=True)
+        best_case = np.minimum(shared + (len(lists) - rare), sizes[docs])  # every common trigram shared too
+        reachable = best_case >= min_similarity * (len(grams) + sizes[docs] - best_case)
+        docs, shared = docs[reachable], shared[reachable]
+        for postings in lists[rare:]:
+            at = np.searchsorted(postings, docs)
+            shared += postings[np.minimum(at, len(postings) - 1)] == docs
+        similarity = shared / (len(grams) + sizes[docs] - shared)
+        keep = similarity >= min_similarity
+        if where is not None:
+            keep[keep] = [where(products[doc]) for doc in docs[keep]]
+        docs, similarity = docs[keep], similarity[keep]
+        if len(docs) > k:
+            top = similarity >= -np.partition(-similarity, k - 1)[k - 1]  # ties at the k-th place included, cut below
+            docs, similarity = docs[top], similarity[top]
+        order = np.lexsort((docs, -similarity))[:k]
+        return [TitleMatch(round(float(similarity[i]), 3), titles[docs[i]], products[docs[i]]) for i in order]
+
+    def best(self, query: str, min_similarity: float = TITLE_MATCH_MIN_SIMILARITY) -> Optional[TitleMatch]:
+        """The closest title, or None. A title that is indexed as given always matches itself."""
+        with self.lock:
+            doc = self.by_norm.get(self.normalize(query))
+        if doc is not None:
+            return TitleMatch(1.0, self.titles[doc], self.products[doc])
+        matches = self.search(query, 1, min_similarity)
+        return matches[0] if matches else None
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+
+product_titles = TitleIndex()
+
+
+def index_catalog(niche: str):
+    """Index a niche's full catalog listing (the products `search_amazon` draws its top-N from)."""
+    for product in generate_mock_amazon_products(niche, CATALOG_PRODUCTS_PER_NICHE):
+        product_titles.add(product["title"], {**product, "niche": niche})
+
+
+for _niche in PRODUCT_NICHES:
+    index_catalog(_niche)
+product_titles.compact()
+
+
+# ─── Product Name Clusters ───────────────────────────────────
+PRODUCT_CLUSTER_SIMILARITY = 0.75
+MINHASH_BANDS, MINHASH_ROWS = 20, 6  # pairs from ~0.6 trigram Jaccard up collide; ~98% of pairs at 0.75 do
+MINHASH_CHUNK = 512  # names hashed per vectorized step
+_minhash_rng = np.random.default_rng(61)
+MINHASH_A = _minhash_rng.integers(0, 1 << 63, MINHASH_BANDS * MINHASH_ROWS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)  # odd
+MINHASH_B = _minhash_rng.integers(0, 1 << 63, MINHASH_BANDS * MINHASH_ROWS, dtype=np.uint64) * np.uint64(2)
+
+
+def minhash_signatures(shingle_sets: List[frozenset]) -> np.ndarray:
+    """One row of MINHASH_BANDS * MINHASH_ROWS uint32 minima per shingle set.
+
+    Shingles hash with crc32, so signatures agree across processes, and each
+    permutation is multiply-add-shift hashing: the top 32 bits of a*x + b in
+    wrapping uint64 arithmetic, for a random odd a. Empty sets get all-ones rows.
+    """
+    out = np.full((len(shingle_sets), len(MINHASH_A)), 0xFFFFFFFF, dtype=np.uint32)
+    for lo in range(0, len(shingle_sets), MINHASH_CHUNK):
+        chunk = shingle_sets[lo:lo + MINHASH_CHUNK]
+        filled = [i for i, grams in enumerate(chunk) if grams]
+        if not filled:
+            continue
+        hashes = np.fromiter((zlib.crc32(g.encode()) for i in filled for g in chunk[i]), np.uint64)
+        starts = np.cumsum([0] + [len(chunk[i]) for i in filled[:-1]])
+        permuted = (hashes[:, None] * MINHASH_A + MINHASH_B) >> np.uint64(32)
+        out[lo + np.array(filled)] = np.minimum.reduceat(permuted, starts, axis=0)
+    return out
+
+
+class ProductClusters:
+    """Near-duplicate product names ("Bamboo Cutting Board Set", "Bamboo Cutting
+    Board (Set of 3)") grouped into clusters.
+
+    Names are shingled into the same word trigrams as `TitleIndex`. A MinHash
+    signature cut into LSH bands puts likely look-alikes in a shared bucket,
+    so each new name is only compared with the few names it collides with
+    rather than every name seen. Colliding pairs whose exact trigram Jaccard
+    reaches `similarity` are joined (union-find, so clusters are transitive).
+    A cluster is named by its shortest member (ties alphabetical), which
+    keeps clusters and their names independent of arrival order.
+    """
+
+    def __init__(self, similarity: float = PRODUCT_CLUSTER_SIMILARITY):
+        self.similarity = similarity
+        self.lock = threading.RLock()
+        self.names: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self.shingles: List[frozenset] = []
+        self.parent: List[int] = []
+        self.canonical: Dict[int, str] = {}  # root -> cluster name
+        self.buckets: List[Dict[bytes, List[int]]] = [defaultdict(list) for _ in range(MINHASH_BANDS)]
+        self.synced = 0  # store names already added, see `sync`
+
+    def _root(self, i: int) -> int:
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = i = parent[parent[i]]
+        return i
+
+    def _union(self, i: int, j: int):
+        ri, rj = self._root(i), self._root(j)
+        if ri != rj:
+            ri, rj = min(ri, rj), max(ri, rj)
+            self.parent[rj] = ri
+            self.canonical[ri] = min(self.canonical[ri], self.canonical.pop(rj), key=lambda n: (len(n), n))
+
+    def add(self, names: Iterable[str]) -> int:
+        """Index names not seen before; returns how many were new."""
+        with self.lock:
+            fresh = [n for n in dict.fromkeys(names) if n not in self.ids]
+            shingles = [frozenset(TitleIndex.trigrams(TitleIndex.normalize(n))) for n in fresh]
+            for name, grams, sig in zip(fresh, shingles, minhash_signatures(shingles)):
+                i = self.ids[name] = len(self.names)
+                self.names.append(name)
+                self.shingles.append(grams)
+                self.parent.append(i)
+                self.canonical[i] = name
+                collisions = set()
+                for band, rows in enumerate(sig.reshape(MINHASH_BANDS, MINHASH_ROWS)):
+                    bucket = self.buckets[band][rows.tobytes()]
+                    collisions.update(bucket)
+                    bucket.append(i)
+                for j in collisions:
+                    shared = len(grams & self.shingles[j])
+                    if shared and shared >= self.similarity * (len(grams) + len(self.shingles[j]) - shared):
+                        self._union(i, j)
+            return len(fresh)
+
+    def sync(self, store) -> int:
+        """Add the store's product names that arrived since the last sync (from any worker)."""
+        with self.lock:
+            names = store.product_names(self.synced)
+            self.synced += len(names)
+            return self.add(names)
+
+    def cluster_of(self, name: str) -> str:
+        with self.lock:
+            i = self.ids.get(name)
+            return name if i is None else self.canonical[self._root(i)]
+
+    def merge(self, groups: List[tuple]) -> List[tuple]:
+        """Fold (name, {metric: value}) groups into (cluster name, summed metrics, member names), in first-seen order."""
+        merged: Dict[str, tuple] = {}
+        for name, vals in groups:
+            key = self.cluster_of(name)
+            acc = merged.get(key)
+            if acc is None:
+                merged[key] = (key, dict(vals), [name])
+            else:
+                for m, v in vals.items():
+                    acc[1][m] += v
+                acc[2].append(name)
+        return list(merged.values())
+
+    def clusters(self, min_size: int = 2) -> List[Dict[str, Any]]:
+        """Clusters of at least `min_size` names, largest first."""
+        with self.lock:
+            members: Dict[int, List[str]] = defaultdict(list)
+            for i, name in enumerate(self.names):
+                members[self._root(i)].append(name)
+            found = [{"cluster": self.canonical[root], "names": names} for root, names in members.items() if len(names) >= min_size]
+        return sorted(found, key=lambda c: -len(c["names"]))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+product_clusters = ProductClusters()
+
+
 # ─── Product Scoring Engine ──────────────────────────────────
+@lru_cache(maxsize=65536)
+def _score_draws(seed: int, fba: bool) -> tuple:
+    """The random inputs of a score: cost rate, ad rate, shipping, sentiment jitter, seasonality, creative."""
+    rng = random.Random(seed)
+    cost_rate, ad_rate = rng.uniform(0.2, 0.4), rng.uniform(0.15, 0.3)
+    shipping = 85 if fba else rng.randint(40, 70)
+    return cost_rate, ad_rate, shipping, rng.randint(10, 30), rng.randint(50, 90), rng.randint(55, 95)
+
+
+def _score_result(composite, confidence, dims, margin_pct, est_cost, est_ad) -> Dict:
+    return {
+        "composite_score": composite, "confidence": confidence,
+        "dimensions": {
+            "trend_velocity": {"score": dims[0], "weight": "20%"},
+            "competition_density": {"score": dims[1], "weight": "18%"},
+            "margin_potential": {"score": dims[2], "weight": "20%"},
+            "shipping_feasibility": {"score": dims[3], "weight": "12%"},
+            "review_sentiment_gap": {"score": dims[4], "weight": "10%"},
+            "seasonality_risk": {"score": dims[5], "weight": "10%"},
+            "ad_creative_potential": {"score": dims[6], "weight": "10%"},
+        },
+        "estimated_margin_pct": margin_pct, "estimated_landed_cost": est_cost, "estimated_ad_cost_per_unit": est_ad,
+    }
+
+
 def score_product(product: Dict, trends: Dict, comp_list: List[Dict]) -> Dict:
-    random.seed(hash(product.get("title", "")) % 10000)
+    cost_rate, ad_rate, shipping_score, sentiment_jitter, seasonality_score, creative_score = _score_draws(_stable_seed(product.get("title", "")), bool(product.get("fba_available", False)))
     velocity = trends.get("trend_velocity", 0)
     trend_score = min(100, max(0, int(50 + velocity * 1.5)))
     seller_count = product.get("seller_count", 20)
     avg_reviews = sum(c.get("review_count", 0) for c in comp_list) / max(len(comp_list), 1)
     competition_score = max(0, int(100 - min(100, seller_count * 2 + avg_reviews / 50)))
     price = product.get("price", 50)
-    est_cost = price * random.uniform(0.2, 0.4)
-    est_ad = price * random.uniform(0.15, 0.3)
+    est_cost = price * cost_rate
+    est_ad = price * ad_rate
     margin_pct = (price - est_cost - est_ad) / price * 100
     margin_score = min(100, max(0, int(margin_pct * 1.5)))
-    shipping_score = 85 if product.get("fba_available", False) else random.randint(40, 70)
-    sentiment_gap_score = min(100, max(0, int((5.0 - product.get("rating", 4.0)) * 40 + random.randint(10, 30))))
-    seasonality_score = random.randint(50, 90)
-    creative_score = random.randint(55, 95)
+    sentiment_gap_score = min(100, max(0, int((5.0 - product.get("rating", 4.0)) * 40 + sentiment_jitter)))
     composite = round(trend_score * 0.20 + competition_score * 0.18 + margin_score * 0.20 + shipping_score * 0.12 + sentiment_gap_score * 0.10 + seasonality_score * 0.10 + creative_score * 0.10, 1)
     confidence = 5 if composite >= 80 else 4 if composite >= 65 else 3 if composite >= 50 else 2
+    dims = (trend_score, competition_score, margin_score, shipping_score, sentiment_gap_score, seasonality_score, creative_score)
+    return _score_result(composite, confidence, dims, round(margin_pct, 1), round(est_cost, 2), round(est_ad, 2))
+
+
+def score_arrays(products: List[Dict], velocity, avg_reviews) -> Dict[str, np.ndarray]:
+    """`score_product` for a whole table of products in NumPy array math.
+
+    `velocity` (trend velocity) and `avg_reviews` (mean competitor review
+    count) are per-product sequences or scalars. Each float expression keeps
+    score_product's operation order and rounding is Python-exact, so every
+    value is identical to scoring the products one by one. Returns columns;
+    `score_rows` turns (some of) them into score_product dicts.
+    """
+    n = len(products)
+    draws = np.array([_score_draws(_stable_seed(p.get("title", "")), bool(p.get("fba_available", False))) for p in products], np.float64).reshape(n, 6)
+    cost_rate, ad_rate, shipping, jitter, seasonality, creative = draws.T
+    price = np.fromiter((p.get("price", 50) for p in products), np.float64, n)
+    sellers = np.fromiter((p.get("seller_count", 20) for p in products), np.float64, n)
+    rating = np.fromiter((p.get("rating", 4.0) for p in products), np.float64, n)
+    velocity = np.broadcast_to(np.asarray(velocity, np.float64), (n,))
+    avg_reviews = np.broadcast_to(np.asarray(avg_reviews, np.float64), (n,))
+
+    trend = np.clip(np.trunc(50 + velocity * 1.5), 0, 100)
+    competition = np.maximum(0, np.trunc(100 - np.minimum(100, sellers * 2 + avg_reviews / 50)))
+    est_cost, est_ad = price * cost_rate, price * ad_rate
+    margin_pct = (price - est_cost - est_ad) / price * 100
+    margin = np.clip(np.trunc(margin_pct * 1.5), 0, 100)
+    sentiment = np.clip(np.trunc((5.0 - rating) * 40 + jitter), 0, 100)
+    composite = _round_exact(trend * 0.20 + competition * 0.18 + margin * 0.20 + shipping * 0.12 + sentiment * 0.10 + seasonality * 0.10 + creative * 0.10, 1)
+    confidence = np.select([composite >= 80, composite >= 65, composite >= 50], [5, 4, 3], 2)
     return {
-        "composite_score": composite, "confidence": confidence,
-        "dimensions": {
-            "trend_velocity": {"score": trend_score, "weight": "20%"},
-            "competition_density": {"score": competition_score, "weight": "18%"},
-            "margin_potential": {"score": margin_score, "weight": "20%"},
-            "shipping_feasibility": {"score": shipping_score, "weight": "12%"},
-            "review_sentiment_gap": {"score": sentiment_gap_score, "weight": "10%"},
-            "seasonality_risk": {"score": seasonality_score, "weight": "10%"},
-            "ad_creative_potential": {"score": creative_score, "weight": "10%"},
-        },
-        "estimated_margin_pct": round(margin_pct, 1), "estimated_landed_cost": round(est_cost, 2),
-        "estimated_ad_cost_per_unit": round(est_ad, 2),
+        "composite": composite, "confidence": confidence,
+        "dims": np.column_stack((trend, competition, margin, shipping, sentiment, seasonality, creative)).astype(np.int64),
+        "margin_pct": _round_exact(margin_pct, 1), "est_cost": _round_exact(est_cost, 2), "est_ad": _round_exact(est_ad, 2),
     }
 
 
+def score_rows(scores: Dict[str, np.ndarray], idx=slice(None)) -> List[Dict]:
+    cols = [scores[k][idx].tolist() for k in ("composite", "confidence", "dims", "margin_pct", "est_cost", "est_ad")]
+    return [_score_result(*row) for row in zip(*cols)]
+
+
+def score_products_batch(products: List[Dict], velocity, avg_reviews) -> List[Dict]:
+    return score_rows(score_arrays(products, velocity, avg_reviews))
+
+
 # ─── Sample Data Generators ──────────────────────────────────
 def generate_sample_sales():
     samples = []
-    random.seed(42)
+    rng = random.Random(42)
     base_date = datetime(2024, 1, 1)
     catalog = [
         {"name": "Bamboo Cutting Board Set", "cat": "Home & Kitchen", "price": 34.99, "cost": 9.50},
@@ -297,18 +2048,18 @@ def generate_sample_sales():
         seasonal = 1.8 if mn in [11, 12] else 1.2 if mn in [6, 7, 8] else 0.8 if mn in [1, 2] else 1.0
         for prod in catalog:
             for day in range(30):
-                if random.random() > 0.3:
+                if rng.random() > 0.3:
                     date = ms + timedelta(days=day)
-                    qty = random.randint(1, max(1, int(random.uniform(3, 25) * seasonal) // 5))
+                    qty = rng.randint(1, max(1, int(rng.uniform(3, 25) * seasonal) // 5))
                     rev = round(prod["price"] * qty, 2)
                     cost = round(prod["cost"] * qty, 2)
-                    ad = round(rev * random.uniform(0.10, 0.30), 2)
-                    fee = round(rev * random.uniform(0.03, 0.15), 2)
+                    ad = round(rev * rng.uniform(0.10, 0.30), 2)
+                    fee = round(rev * rng.uniform(0.03, 0.15), 2)
                     profit = round(rev - cost - ad - fee, 2)
                     samples.append({
                         "id": str(uuid.uuid4()), "date": date.strftime("%Y-%m-%d"),
                         "product_name": prod["name"], "category": prod["cat"],
-                        "store": random.choice(stores), "quantity": qty,
+                        "store": rng.choice(stores), "quantity": qty,
                         "revenue": rev, "cost": cost, "ad_spend": ad, "platform_fee": fee,
                         "profit": profit, "margin_pct": round(profit / rev * 100, 1) if rev > 0 else 0,
                         "source": "sample",
@@ -318,7 +2069,7 @@ def generate_sample_sales():
 
 
 def generate_sample_research():
-    random.seed(99)
+    rng = random.Random(99)
     past = [
         {"name": "Portable Smoothie Maker", "niche": "Home & Kitchen", "outcome": "failed", "reason": "8.4% return rate due to battery issues.", "margin": 18.5, "months": 2},
         {"name": "Bamboo Cutting Board Set", "niche": "Home & Kitchen", "outcome": "winner", "reason": "Consistent demand, low returns, great reviews.", "margin": 42.3, "months": 14},
@@ -335,26 +2086,31 @@ def generate_sample_research():
     for p in past:
         records.append({
             "id": str(uuid.uuid4()),
-            "date_researched": (datetime.now() - timedelta(days=random.randint(30, 500))).strftime("%Y-%m-%d"),
+            "date_researched": (datetime.now() - timedelta(days=rng.randint(30, 500))).strftime("%Y-%m-%d"),
             "product_name": p["name"], "niche": p["niche"], "outcome": p["outcome"],
             "reason": p["reason"], "margin_pct": p["margin"], "months_active": p["months"],
-            "revenue_total": round(random.uniform(2000, 180000), 2) if p["outcome"] == "winner" else round(random.uniform(500, 15000), 2),
+            "revenue_total": round(rng.uniform(2000, 180000), 2) if p["outcome"] == "winner" else round(rng.uniform(500, 15000), 2),
         })
     return records
 
 
 # ─── RAG Retrieval ────────────────────────────────────────────
 knowledge_chunks: List[Dict[str, Any]] = []
+knowledge_by_id: Dict[str, Dict[str, Any]] = {}
 
 
 def initialize_knowledge_base():
     for doc in ECOMMERCE_KNOWLEDGE:
         for i, section in enumerate(doc["sections"]):
-            knowledge_chunks.append({
-                "id": str(uuid.uuid4()), "document_id": doc["id"], "chunk_index": i,
+            # Stable ids, so citation references in stored sessions survive restarts.
+            chunk = {
+                "id": str(uuid.uuid5(uuid.NAMESPACE_URL, f"{doc['id']}/{i}")), "document_id": doc["id"], "chunk_index": i,
                 "text": section["content"], "section": section["section"],
                 "page": section.get("page"), "category": doc["category"], "title": doc["title"],
-            })
+            }
+            knowledge_chunks.append(chunk)
+            knowledge_by_id[chunk["id"]] = chunk
+    chunk_index.sync(knowledge_chunks)
 
 
 def text_to_vector(text: str) -> Counter:
@@ -369,31 +2125,349 @@ def cosine_sim(v1: Counter, v2: Counter) -> float:
     return num / (d1 * d2) if d1 * d2 else 0.0
 
 
+class InvertedIndex:
+    """Term → posting-list index over pre-tokenized documents.
+
+    Each document is tokenized once with `text_to_vector`; postings keep the raw
+    term counts and the document's L2 norm is stored alongside, so a query only
+    touches documents sharing a term with it. Dot products are accumulated as
+    integers and divided by the two norms last, which reproduces `cosine_sim`
+    bit-for-bit and therefore the exact ranking of the original linear scan.
+    Only `sync` takes the lock: searches read append-only lists and can run
+    alongside it.
+    """
+
+    def __init__(self, text_fn):
+        self.text_fn = text_fn
+        self.lock = threading.Lock()
+        self.docs: List[Dict[str, Any]] = []
+        self.norms: List[float] = []
+        self.postings: Dict[str, List[tuple]] = defaultdict(list)
+
+    def add(self, doc: Dict[str, Any]):
+        vec = text_to_vector(self.text_fn(doc))
+        pos = len(self.docs)
+        self.docs.append(doc)
+        self.norms.append(math.sqrt(sum(c ** 2 for c in vec.values())))
+        for term, count in vec.items():
+            self.postings[term].append((pos, count))
+
+    def sync(self, source: List[Dict[str, Any]]):
+        # Stores are append-only lists, so anything past the indexed prefix is new.
+        with self.lock:
+            for doc in source[len(self.docs):]:
+                self.add(doc)
+
+    def search(self, query: str, top_k: int) -> List[tuple]:
+        qv = text_to_vector(query)
+        qnorm = math.sqrt(sum(c ** 2 for c in qv.values()))
+        dots: Dict[int, int] = defaultdict(int)
+        for term, qc in qv.items():
+            for pos, count in self.postings.get(term, ()):
+                dots[pos] += qc * count
+        scored = ((num / (qnorm * self.norms[pos]), pos) for pos, num in dots.items() if num and qnorm * self.norms[pos])
+        # Ties keep corpus order, matching the stable sort of the linear scan.
+        top = heapq.nsmallest(top_k, scored, key=lambda x: (-x[0], x[1]))
+        return [(s, self.docs[pos]) for s, pos in top]
+
+
+VECTOR_DELTA_MIN_DOCS = 1024  # appended documents are folded into the base block past this many,
+VECTOR_DELTA_FRACTION = 0.125  # or past this share of the base block, whichever is larger
+
+
+class VectorIndex:
+    """Vectorized TF-IDF / BM25 engine (needs numpy + scipy).
+
+    Term counts are kept term-major, so one sparse mat-vec scores a query
+    against every document while only reading the rows of its own terms;
+    `search_batch` scores many queries with a single mat-mat. Documents the
+    source gains are tokenized on their own into a small delta block, folded
+    into the base block once it outgrows VECTOR_DELTA_MIN_DOCS and
+    VECTOR_DELTA_FRACTION of it. Ranking weights depend on corpus statistics
+    (idf, mean length), so they are recomputed from the stored counts after
+    every append, with array arithmetic only. A sync replaces several
+    attributes, so searches and syncs share a lock.
+    """
+
+    def __init__(self, text_fn, mode: str = "tfidf", k1: float = 1.5, b: float = 0.75):
+        self.text_fn = text_fn
+        self.lock = threading.Lock()
+        self.mode, self.k1, self.b = mode, k1, b
+        self._reset()
+
+    def _reset(self):
+        self.docs: List[Dict[str, Any]] = []
+        self.vocab: Dict[str, int] = {}
+        self.df = np.zeros(0, dtype=np.int64)  # documents per term
+        self.dl = np.zeros(0, dtype=np.float64)  # terms per document
+        self.base = sparse.csr_matrix((0, 0))  # raw counts, terms x base documents
+        self.delta = sparse.csr_matrix((0, 0))  # raw counts of documents appended since, documents x terms
+        self.idf = None
+        self.by_term = self.delta_by_term = None  # ranking weights, terms x base / appended documents
+
+    def sync(self, source: List[Dict[str, Any]]):
+        with self.lock:
+            n = len(self.docs)
+            if n and (len(source) < n or source[n - 1] is not self.docs[-1]):
+                self._reset()  # replaced rather than appended to
+                n = 0
+            if len(source) > n or self.by_term is None:
+                self._append(source[n:])
+
+    def _append(self, docs: List[Dict[str, Any]]):
+        rows, cols, counts = [], [], []
+        for i, doc in enumerate(docs):
+            for term, count in text_to_vector(self.text_fn(doc)).items():
+                rows.append(i); cols.append(self.vocab.setdefault(term, len(self.vocab))); counts.append(count)
+        v = len(self.vocab)
+        block = sparse.csr_matrix((np.asarray(counts, dtype=np.float64), (rows, cols)), shape=(len(docs), v))
+        self.docs.extend(docs)
+        self.df = np.bincount(np.asarray(cols, dtype=np.int64), minlength=v) + np.pad(self.df, (0, v - len(self.df)))
+        self.dl = np.concatenate((self.dl, np.asarray(block.sum(axis=1)).ravel()))
+        self.delta.resize((self.delta.shape[0], v))
+        self.delta = sparse.vstack((self.delta, block), format="csr")
+        self.base.resize((v, self.base.shape[1]))
+        if self.delta.shape[0] > max(VECTOR_DELTA_MIN_DOCS, VECTOR_DELTA_FRACTION * self.base.shape[1]):
+            self.base = sparse.hstack((self.base, self.delta.T), format="csr")
+            self.delta = sparse.csr_matrix((0, v))
+        self._weigh()
+
+    def _weigh(self):
+        """Ranking weights of the base and delta blocks, from their counts and the current statistics."""
+        n, offset = len(self.docs), self.base.shape[1]
+        blocks = [self.base, self.delta.T.tocsr()]
+        # Per stored count: its term's idf and its document's position in the corpus.
+        entries = [(b.data, np.repeat(np.arange(b.shape[0]), np.diff(b.indptr)), b.indices + o) for b, o in zip(blocks, (0, offset))]
+        if self.mode == "bm25":
+            self.idf = np.log1p((n - self.df + 0.5) / (self.df + 0.5))
+            norm_dl = self.dl / max(self.dl.mean(), 1e-9) if n else self.dl
+            data = [self.idf[t] * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * norm_dl[d])) for tf, t, d in entries]
+        else:
+            self.idf = np.log((1 + n) / (1 + self.df)) + 1
+            data = [tf * self.idf[t] for tf, t, _ in entries]
+            norms = np.sqrt(sum(np.bincount(d, w * w, minlength=n) for w, (_, _, d) in zip(data, entries)))
+            norms = np.where(norms > 0, norms, 1)
+            data = [w / norms[d] for w, (_, _, d) in zip(data, entries)]
+        self.by_term, self.delta_by_term = (sparse.csr_matrix((w, b.indices, b.indptr), shape=b.shape) for w, b in zip(data, blocks))
+
+    def _query_matrix(self, queries: List[str]):
+        rows, cols, vals = [], [], []
+        for i, q in enumerate(queries):
+            for term, count in text_to_vector(q).items():
+                j = self.vocab.get(term)
+                if j is not None:
+                    rows.append(i); cols.append(j); vals.append(count)
+        qm = sparse.csr_matrix((np.asarray(vals, dtype=np.float64), (rows, cols)), shape=(len(queries), len(self.vocab)))
+        if self.mode != "bm25" and qm.nnz:
+            qm.data *= self.idf[qm.indices]
+            qnorms = np.sqrt(np.asarray(qm.multiply(qm).sum(axis=1)).ravel())
+            qm.data /= np.repeat(np.where(qnorms > 0, qnorms, 1), np.diff(qm.indptr))
+        return qm
+
+    def search_batch(self, queries: List[str], top_k: int) -> List[List[tuple]]:
+        with self.lock:
+            if not self.docs or not self.vocab:
+                return [[] for _ in queries]
+            qm = self._query_matrix(queries)
+            scores = (qm @ self.by_term).tocsr()
+            appended = (qm @ self.delta_by_term).tocsr() if self.delta_by_term.shape[1] else None
+            offset, docs = self.by_term.shape[1], self.docs
+        results = []
+        for i in range(len(queries)):
+            lo, hi = scores.indptr[i], scores.indptr[i + 1]
+            idx, val = scores.indices[lo:hi], scores.data[lo:hi]
+            if appended is not None:
+                lo, hi = appended.indptr[i], appended.indptr[i + 1]
+                idx, val = np.concatenate((idx, appended.indices[lo:hi] + offset)), np.concatenate((val, appended.data[lo:hi]))
+            keep = val > 0
+            idx, val = idx[keep], val[keep]
+            if len(idx) > top_k:
+                part = np.argpartition(-val, top_k - 1)[:top_k]
+                idx, val = idx[part], val[part]
+            order = np.lexsort((idx, -val))
+            results.append([(float(val[o]), docs[idx[o]]) for o in order])
+        return results
+
+    def search(self, query: str, top_k: int) -> List[tuple]:
+        return self.search_batch([query], top_k)[0]
+
+
+def _make_index(text_fn):
+    if RAG_ENGINE in ("tfidf", "bm25") and sparse is not None:
+        return VectorIndex(text_fn, RAG_ENGINE)
+    return InvertedIndex(text_fn)
+
+
+chunk_index = _make_index(lambda c: c["text"])
+research_index = _make_index(lambda r: f"{r['product_name']} {r['niche']} {r['outcome']} {r['reason']}")
+
+
+@timed("stage_seconds", "retrieve_chunks")
 def retrieve_chunks(query: str, top_k: int = 3) -> List[Dict]:
-    qv = text_to_vector(query)
-    scored = [(cosine_sim(qv, text_to_vector(c["text"])), c) for c in knowledge_chunks]
-    scored.sort(key=lambda x: x[0], reverse=True)
-    return [{**c, "relevance_score": round(s, 4)} for s, c in scored[:top_k] if s > 0.05]
+    chunk_index.sync(knowledge_chunks)
+    scored = chunk_index.search(query, top_k)
+    return [{**c, "relevance_score": round(s, 4)} for s, c in scored if s > 0.05]
 
 
+def retrieve_chunks_batch(queries: List[str], top_k: int = 3) -> List[List[Dict]]:
+    chunk_index.sync(knowledge_chunks)
+    if isinstance(chunk_index, VectorIndex):
+        batches = chunk_index.search_batch(queries, top_k)
+    else:
+        batches = [chunk_index.search(q, top_k) for q in queries]
+    return [[{**c, "relevance_score": round(s, 4)} for s, c in scored if s > 0.05] for scored in batches]
+
+
+@timed("stage_seconds", "retrieve_research")
 def retrieve_research(query: str, top_k: int = 3) -> List[Dict]:
-    qv = text_to_vector(query)
-    scored = [(cosine_sim(qv, text_to_vector(f"{r['product_name']} {r['niche']} {r['outcome']} {r['reason']}")), r) for r in product_research]
-    scored.sort(key=lambda x: x[0], reverse=True)
-    return [r for s, r in scored[:top_k] if s > 0.05]
+    sync_shared_state()
+    research_index.sync(product_research)
+    scored = research_index.search(query, top_k)
+    return [r for s, r in scored if s > 0.05]
+
+
+# ─── Tool Result Cache ───────────────────────────────────────
+TOOL_CACHE_MAX_ENTRIES = int(os.environ.get("TOOL_CACHE_MAX_ENTRIES", 2048))
+TOOL_CACHE_TTLS = {"search_trends": 3600, "trend_series": 3600, "search_amazon": 1800, "analyze_competitors": 1800, "score_opportunity": 1800, "product_score": 1800}
+TOOL_WORKERS = int(os.environ.get("TOOL_WORKERS", 16))
+
+
+class ToolCache:
+    """Thread-safe LRU cache with per-entry expiry and single-flight loading.
+
+    Concurrent misses on one key run the loader once; the other callers wait
+    for it and share the result (or retry the load if it raised). Values are
+    shared between callers, so treat them as read-only.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[tuple, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self.inflight: Dict[tuple, threading.Event] = {}
+        self.lock = threading.Lock()
+        self.counts: Counter = Counter()
+
+    def get_or_load(self, key: tuple, ttl: float, load):
+        while True:
+            with self.lock:
+                hit = self.entries.get(key)
+                if hit is not None:
+                    if hit[0] > time.monotonic():
+                        self.entries.move_to_end(key)
+                        self.counts["hits"] += 1; self.counts[key[0], "hits"] += 1
+                        return hit[1]
+                    del self.entries[key]
+                    self.counts["expirations"] += 1
+                waiter = self.inflight.get(key)
+                if waiter is None:
+                    waiter = self.inflight[key] = threading.Event()
+                    self.counts["misses"] += 1; self.counts[key[0], "misses"] += 1
+                    break
+                self.counts["coalesced"] += 1
+            waiter.wait()
+        try:
+            value = load()
+            with self.lock:
+                self.entries[key] = (time.monotonic() + ttl, value)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+                    self.counts["evictions"] += 1
+            return value
+        finally:
+            with self.lock:
+                del self.inflight[key]
+            waiter.set()
+
+    def __contains__(self, key: tuple) -> bool:
+        with self.lock:
+            hit = self.entries.get(key)
+            return hit is not None and hit[0] > time.monotonic()
+
+    def export(self, keys: Iterable[tuple]) -> List[tuple]:
+        """(key, seconds left, value) for each live entry among `keys`, to hand to another process."""
+        now = time.monotonic()
+        out = []
+        with self.lock:
+            for key in keys:
+                hit = self.entries.get(key)
+                if hit is not None and hit[0] > now:
+                    out.append((key, hit[0] - now, hit[1]))
+        return out
+
+    def adopt(self, exported: List[tuple]):
+        """Keep entries exported by another process, unless a live one is already here."""
+        now = time.monotonic()
+        with self.lock:
+            for key, ttl, value in exported:
+                hit = self.entries.get(key)
+                if hit is None or hit[0] <= now:
+                    self.entries[key] = (now + ttl, value)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.counts["evictions"] += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            c = self.counts
+            lookups = c["hits"] + c["misses"]
+            return {
+                "entries": len(self.entries), "max_entries": self.max_entries,
+                **{k: c[k] for k in ("hits", "misses", "coalesced", "evictions", "expirations")},
+                "hit_rate": round(c["hits"] / lookups * 100, 1) if lookups else 0,
+                "by_tool": {t: {"hits": c[t, "hits"], "misses": c[t, "misses"]} for t in TOOL_CACHE_TTLS},
+            }
+
+
+tool_cache = ToolCache(TOOL_CACHE_MAX_ENTRIES)
+_tool_pool = ThreadPoolExecutor(TOOL_WORKERS, thread_name_prefix="tool")
+
+
+def cached_tool(name: str):
+    """Memoize a tool in `tool_cache` for TOOL_CACHE_TTLS[name] seconds.
+
+    Arguments are normalized by binding them to the tool's signature with
+    defaults applied, so `tool("Pet Supplies")` and `tool(niche="Pet Supplies")`
+    share an entry. The uncached function stays available as `.uncached`, and
+    `.key(...)` gives the cache key a call would use.
+    """
+    def wrap(fn):
+        sig = inspect.signature(fn)
+
+        def key(*args, **kwargs) -> tuple:
+            bound = sig.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return (name, *bound.arguments.values())
+
+        @wraps(fn)
+        def cached(*args, **kwargs):
+            return tool_cache.get_or_load(key(*args, **kwargs), TOOL_CACHE_TTLS[name], lambda: fn(*args, **kwargs))
+        cached.uncached = fn
+        cached.key = key
+        return cached
+    return wrap
 
 
 # ─── Agent Tools ─────────────────────────────────────────────
+@cached_tool("search_trends")
 def tool_search_trends(niche: str = "Home & Kitchen") -> Dict:
     return generate_mock_trends(niche)
 
 
+@cached_tool("search_amazon")
 def tool_search_amazon(niche: str = "Home & Kitchen", count: int = 10) -> Dict:
     products = generate_mock_amazon_products(niche, count)
     return {"niche": niche, "total_products": len(products), "products": products, "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "source": "Amazon Product API (demo)"}
 
 
+@cached_tool("analyze_competitors")
 def tool_analyze_competitors(product_name: str) -> Dict:
+    match = product_titles.best(product_name)
+    if match:
+        product_name = match.title  # misspellings and reorderings of one product share its competitors
     comps = generate_mock_competitors(product_name)
     return {
         "product": product_name, "total_competitors": len(comps),
@@ -405,38 +2479,92 @@ def tool_analyze_competitors(product_name: str) -> Dict:
     }
 
 
+def product_score(niche: str, product: Dict) -> Dict:
+    """Score one catalog product against its niche's trends and its competitors.
+
+    A shared sub-result of reports and opportunity scores: it is cached per
+    (niche, asin, title), which pins down every input to `score_product`, and
+    pulls trends and competitors through their own cached tools.
+    """
+    def load():
+        return score_product(product, tool_search_trends(niche), tool_analyze_competitors(product["title"])["competitors"])
+    return tool_cache.get_or_load(product_score_key(niche, product), TOOL_CACHE_TTLS["product_score"], load)
+
+
+def product_score_key(niche: str, product: Dict) -> tuple:
+    return ("product_score", niche, product.get("asin"), product["title"])
+
+
+@cached_tool("score_opportunity")
 def tool_score_opportunity(product_name: str, niche: str = "Home & Kitchen") -> Dict:
-    trends = generate_mock_trends(niche)
-    products = generate_mock_amazon_products(niche, 5)
-    comps = generate_mock_competitors(product_name)
-    product = next((p for p in products if product_name.lower() in p["title"].lower()), products[0] if products else {"title": product_name, "price": 39.99, "seller_count": 15, "rating": 4.0, "fba_available": True})
-    product["title"] = product_name
-    scores = score_product(product, trends, comps)
+    trends = tool_search_trends(niche)
+    products = tool_search_amazon(niche, 5)["products"]
+    comps = tool_analyze_competitors(product_name)["competitors"]
+    # Only this niche's listings stand in for the product; a title that only matches elsewhere is reported, not scored.
+    matches = product_titles.search(product_name, 5, where=lambda p: p["niche"] == niche)
+    elsewhere = [] if matches else product_titles.search(product_name, 5)
+    product = matches[0].product if matches else products[0] if products else {"title": product_name, "price": 39.99, "seller_count": 15, "rating": 4.0, "fba_available": True}
+    scores = product_score(niche, {**product, "title": product_name})
+    as_match = lambda m: {"title": m.title, "asin": m.product["asin"], "niche": m.product["niche"], "similarity": m.similarity}
     return {
         "product": product_name, "niche": niche, **scores,
+        "matched_product": as_match(matches[0]) if matches else None,
+        "candidates": [as_match(m) for m in matches[1:]],
+        "other_niche_matches": [as_match(m) for m in elsewhere],
         "trend_data": {"velocity": trends["trend_velocity"], "direction": trends["trend_direction"], "current_interest": trends["current_interest"]},
         "competition_summary": {"total_sellers": len(comps), "avg_price": round(sum(c["price"] for c in comps) / max(len(comps), 1), 2)},
     }
 
 
-def tool_generate_report(niche: str = "Home & Kitchen") -> Dict:
-    trends = generate_mock_trends(niche)
-    products = generate_mock_amazon_products(niche, 10)
-    scored = []
-    for p in products[:8]:
-        comps = generate_mock_competitors(p["title"])
-        s = score_product(p, trends, comps)
-        scored.append({**p, **s})
+def tool_score_batch(products: List[Dict], niche: str = "Home & Kitchen", top_k: Optional[int] = None) -> Dict:
+    """Score many products at once and rank them by composite score.
+
+    Products without their own `trend_velocity` use the niche's trends, and
+    those without `avg_competitor_reviews` are looked up through the cached
+    competitor tool, exactly the inputs `score_opportunity` would use.
+    """
+    trends = tool_search_trends(niche)
+    velocity = [trends["trend_velocity"] if p.get("trend_velocity") is None else p["trend_velocity"] for p in products]
+    avg_reviews = []
+    for p in products:
+        if p.get("avg_competitor_reviews") is None:
+            comps = tool_analyze_competitors(p["title"])["competitors"]
+            avg_reviews.append(sum(c.get("review_count", 0) for c in comps) / max(len(comps), 1))
+        else:
+            avg_reviews.append(p["avg_competitor_reviews"])
+    scores = score_arrays(products, velocity, avg_reviews)
+    # A stable sort on the negated score keeps input order among ties, like sorted(..., reverse=True).
+    top = np.argsort(-scores["composite"], kind="stable")[:top_k]
+    ranked = [{"rank": i, "title": products[j]["title"], **s} for i, (j, s) in enumerate(zip(top.tolist(), score_rows(scores, top)), 1)]
+    return {"niche": niche, "total_products": len(products), "results": ranked, "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+
+
+def report_events(niche: str = "Home & Kitchen") -> Iterator[tuple]:
+    """Build a niche report from shared sub-results, yielding progress as it goes.
+
+    Trends, the product list and each product's competitors and score come
+    from the tool cache, so they are computed once across concurrent report,
+    score and trend requests. Products are scored concurrently on the tool
+    pool; each is yielded as ("product", scored) the moment it finishes, and
+    the finished report comes last as ("report", report).
+    """
+    trends_job = _tool_pool.submit(tool_search_trends, niche)
+    products = tool_search_amazon(niche, 10)["products"]
+    jobs = [_tool_pool.submit(lambda p=p: {**p, **product_score(niche, p)}) for p in products[:8]]
+    for job in as_completed(jobs):
+        yield "product", job.result()
+    scored = [job.result() for job in jobs]
+    trends = trends_job.result()
     scored.sort(key=lambda x: x["composite_score"], reverse=True)
     past = retrieve_research(niche)
-    analytics["reports_generated"] += 1
+    count_analytics({"reports_generated": 1})
     recs = _build_recommendations(scored[:3], trends, past)
     es = {
         "total_products_analyzed": len(products), "top_opportunities": len([p for p in scored if p["composite_score"] >= 65]),
         "avg_composite_score": round(sum(p["composite_score"] for p in scored) / max(len(scored), 1), 1),
         "trend_direction": trends["trend_direction"], "trend_velocity": trends["trend_velocity"],
     }
-    return {
+    yield "report", {
         "report_id": f"RPT-{uuid.uuid4().hex[:8].upper()}", "title": f"Product Research Report: {niche}",
         "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "niche": niche,
         "executive_summary": es, "top_products": scored[:5],
@@ -445,6 +2573,12 @@ def tool_generate_report(niche: str = "Home & Kitchen") -> Dict:
     }
 
 
+def tool_generate_report(niche: str = "Home & Kitchen") -> Dict:
+    for _, data in report_events(niche):
+        pass
+    return data
+
+
 def _build_recommendations(top: List[Dict], trends: Dict, past: List[Dict]) -> List[str]:
     recs = []
     if top:
@@ -464,35 +2598,31 @@ def _build_recommendations(top: List[Dict], trends: Dict, past: List[Dict]) -> L
     return recs
 
 
-def tool_get_sales_summary(months: int = 3) -> Dict:
+def tool_get_sales_summary(months: int = 3, group_by: str = "product") -> Dict:
+    """Sales totals and top products, categories and stores for the last `months`.
+
+    With `group_by="cluster"`, products whose names are near-duplicates
+    (see `ProductClusters`) are summed under one cluster name, listing the
+    names merged into it as `variants`.
+    """
     if not sales_data:
         return {"error": "No sales data loaded."}
     cutoff = datetime.now() - timedelta(days=months * 30)
-    recent = [s for s in sales_data if datetime.strptime(s["date"], "%Y-%m-%d") >= cutoff]
-    if not recent:
-        recent = sales_data[-500:]
-    by_product = defaultdict(lambda: {"revenue": 0, "profit": 0, "quantity": 0, "orders": 0})
-    by_category = defaultdict(lambda: {"revenue": 0, "profit": 0, "quantity": 0})
-    by_store = defaultdict(lambda: {"revenue": 0, "profit": 0})
-    total_rev = total_profit = total_ad = 0
-    for s in recent:
-        by_product[s["product_name"]]["revenue"] += s["revenue"]
-        by_product[s["product_name"]]["profit"] += s["profit"]
-        by_product[s["product_name"]]["quantity"] += s["quantity"]
-        by_product[s["product_name"]]["orders"] += 1
-        by_category[s["category"]]["revenue"] += s["revenue"]
-        by_category[s["category"]]["profit"] += s["profit"]
-        by_category[s["category"]]["quantity"] += s["quantity"]
-        by_store[s["store"]]["revenue"] += s["revenue"]
-        by_store[s["store"]]["profit"] += s["profit"]
-        total_rev += s["revenue"]; total_profit += s["profit"]; total_ad += s["ad_spend"]
-    top_products = sorted([{"name": k, **{kk: round(vv, 2) for kk, vv in v.items()}} for k, v in by_product.items()], key=lambda x: x["revenue"], reverse=True)[:10]
-    categories = sorted([{"category": k, **{kk: round(vv, 2) for kk, vv in v.items()}} for k, v in by_category.items()], key=lambda x: x["revenue"], reverse=True)
-    stores_list = sorted([{"store": k, **{kk: round(vv, 2) for kk, vv in v.items()}} for k, v in by_store.items()], key=lambda x: x["revenue"], reverse=True)
+    agg = sales_data.summarize(cutoff) or sales_data.summarize_recent(500)
+    totals = agg["totals"]
+    total_rev, total_profit, total_ad = totals["revenue"], totals["profit"], totals["ad_spend"]
+    if group_by == "cluster":
+        product_clusters.sync(sales_data)
+        products = [{"name": k, "variants": names, **{kk: round(vv, 2) for kk, vv in v.items()}} for k, v, names in product_clusters.merge(agg["product_name"])]
+    else:
+        products = [{"name": k, **{kk: round(vv, 2) for kk, vv in v.items()}} for k, v in agg["product_name"]]
+    top_products = sorted(products, key=lambda x: x["revenue"], reverse=True)[:10]
+    categories = sorted([{"category": k, **{kk: round(vv, 2) for kk, vv in v.items()}} for k, v in agg["category"]], key=lambda x: x["revenue"], reverse=True)
+    stores_list = sorted([{"store": k, **{kk: round(vv, 2) for kk, vv in v.items()}} for k, v in agg["store"]], key=lambda x: x["revenue"], reverse=True)
     return {
         "period": f"Last {months} month(s)", "total_revenue": round(total_rev, 2), "total_profit": round(total_profit, 2),
         "total_ad_spend": round(total_ad, 2), "overall_margin": round(total_profit / total_rev * 100, 1) if total_rev > 0 else 0,
-        "roas": round(total_rev / total_ad, 2) if total_ad > 0 else 0, "total_orders": len(recent),
+        "roas": round(total_rev / total_ad, 2) if total_ad > 0 else 0, "total_orders": totals["orders"],
         "top_products": top_products, "categories": categories, "stores": stores_list,
     }
 
@@ -507,39 +2637,50 @@ AGENT_TOOLS = {
 }
 
 
+async def run_tool(fn, *args):
+    """Run a tool without blocking the event loop: async tools (e.g. live HTTP
+    sources) are awaited, sync ones run in the threadpool."""
+    with timed("tool_seconds", fn.__name__):
+        if inspect.iscoroutinefunction(fn):
+            return await fn(*args)
+        return await run_in_threadpool(fn, *args)
+
+
+def tool_args(tool_name: str, query: str, niche: str) -> tuple:
+    if tool_name in ("analyze_competitors", "score_opportunity"):
+        marker = "competitor" if tool_name == "analyze_competitors" else "score"
+        product = query.split("for ")[-1].strip() if "for " in query else query.split(marker)[-1].strip()
+        product = product.strip("?.,! ") or "Portable Ice Maker"
+        match = product_titles.best(product)
+        product = match.title if match else product
+        return (product,) if tool_name == "analyze_competitors" else (product, niche)
+    if tool_name == "get_sales_summary":
+        return (3,)
+    return (niche,)
+
+
 def detect_tool_call(query: str) -> Optional[str]:
-    ql = query.lower()
-    best, best_score = None, 0
-    for name, info in AGENT_TOOLS.items():
-        score = sum(1 for kw in info["trigger_keywords"] if kw in ql)
-        if score > best_score:
-            best_score = score; best = name
-    return best if best_score > 0 else None
+    return keyword_router.route(query)[0]
+
+
+NICHE_KEYWORDS = {
+    "Home & Kitchen": ["home", "kitchen", "cooking", "appliance"],
+    "Beauty & Personal Care": ["beauty", "skincare", "cosmetic", "makeup"],
+    "Health & Wellness": ["health", "wellness", "supplement", "vitamin"],
+    "Pet Supplies": ["pet", "dog", "cat", "animal"],
+    "Electronics & Gadgets": ["electronic", "gadget", "tech", "phone"],
+    "Fitness & Sports": ["fitness", "sport", "gym", "exercise", "workout"],
+    "Baby & Kids": ["baby", "kid", "child", "toddler"],
+    "Outdoor & Garden": ["outdoor", "garden", "patio", "camping"],
+    "Fashion & Accessories": ["fashion", "clothing", "jewelry", "watch"],
+    "Automotive": ["car", "auto", "vehicle"],
+    "Office & Productivity": ["office", "desk", "productivity"],
+    "Toys & Games": ["toy", "game", "puzzle"],
+}
 
 
 def extract_niche(query: str) -> str:
-    ql = query.lower()
-    for niche in PRODUCT_NICHES:
-        if niche.lower() in ql:
-            return niche
-    kw_map = {
-        "Home & Kitchen": ["home", "kitchen", "cooking", "appliance"],
-        "Beauty & Personal Care": ["beauty", "skincare", "cosmetic", "makeup"],
-        "Health & Wellness": ["health", "wellness", "supplement", "vitamin"],
-        "Pet Supplies": ["pet", "dog", "cat", "animal"],
-        "Electronics & Gadgets": ["electronic", "gadget", "tech", "phone"],
-        "Fitness & Sports": ["fitness", "sport", "gym", "exercise", "workout"],
-        "Baby & Kids": ["baby", "kid", "child", "toddler"],
-        "Outdoor & Garden": ["outdoor", "garden", "patio", "camping"],
-        "Fashion & Accessories": ["fashion", "clothing", "jewelry", "watch"],
-        "Automotive": ["car", "auto", "vehicle"],
-        "Office & Productivity": ["office", "desk", "productivity"],
-        "Toys & Games": ["toy", "game", "puzzle"],
-    }
-    for niche, kws in kw_map.items():
-        if any(k in ql for k in kws):
-            return niche
-    return "Home & Kitchen"
+    return keyword_router.route(query)[1]
 
 
 CATEGORY_KEYWORDS = {
@@ -555,19 +2696,154 @@ CATEGORY_KEYWORDS = {
 
 
 def detect_category(query: str) -> Optional[str]:
-    ql = query.lower()
-    scores = {cat: sum(1 for kw in kws if kw in ql) for cat, kws in CATEGORY_KEYWORDS.items()}
-    scores = {k: v for k, v in scores.items() if v > 0}
-    return max(scores, key=scores.get) if scores else None
+    return keyword_router.route(query)[2]
+
+
+# ─── Keyword Router ──────────────────────────────────────────
+def _trie_regex(words: Iterable[str]) -> str:
+    """Regex body matching the longest of `words` at the current position.
+
+    Words are merged into a trie; a word ending inside another becomes a
+    greedy optional group, so the longer continuation is tried first.
+    """
+    trie: Dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node: Dict[str, Any]) -> str:
+        alts = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        body = alts[0] if len(alts) == 1 else f"(?:{'|'.join(alts)})" if alts else ""
+        return f"(?:{body})?" if "" in node and body else body
+    return emit(trie)
+
+
+class KeywordRouter:
+    """Substring keyword tables (tools, niches, niche aliases, categories) resolved in one scan.
+
+    All keywords compile into one lookahead regex over a trie, which reports
+    the longest keyword starting at each position of the lowercased message;
+    every other keyword starting there is a prefix of it, so a precomputed
+    prefix closure recovers exactly the keywords `kw in ql` would find.
+    Keywords registered at runtime go to a small delta pattern scanned
+    alongside, which is folded into the main one past DELTA_LIMIT keywords.
+    """
+    DELTA_LIMIT = 64
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rank: Dict[tuple, int] = {}  # (table, owner) -> priority, in registration order
+        self.payload: Dict[str, List[tuple]] = defaultdict(list)  # keyword -> [(table, owner)], repeats kept
+        self.main_words: set = set()
+        self.delta_words: set = set()
+        self.main = self.delta = None  # (regex, prefix closure)
+        self.compiled: tuple = ()  # the non-empty ones of (main, delta), swapped in whole
+
+    @staticmethod
+    def _compile(words: set) -> tuple:
+        closure = {w: [w[:i] for i in range(1, len(w) + 1) if w[:i] in words] for w in words}
+        return re.compile(f"(?=({_trie_regex(words)}))"), closure
+
+    def add(self, table: str, owner: str, keywords: Iterable[str]):
+        with self.lock:
+            self.rank.setdefault((table, owner), len(self.rank))
+            fresh = False
+            for kw in keywords:
+                kw = kw.lower()
+                self.payload[kw].append((table, owner))
+                if kw not in self.main_words and kw not in self.delta_words:
+                    self.delta_words.add(kw)
+                    fresh = True
+            if len(self.delta_words) > self.DELTA_LIMIT:
+                self._fold()
+            elif fresh:
+                self.delta = self._compile(self.delta_words)
+                self.compiled = tuple(p for p in (self.main, self.delta) if p)
+
+    def _fold(self):
+        self.main_words |= self.delta_words
+        self.delta_words = set()
+        self.main, self.delta = self._compile(self.main_words), None
+        self.compiled = (self.main,)
+
+    def compact(self):
+        """Fold runtime-registered keywords into the main pattern."""
+        with self.lock:
+            if self.delta_words:
+                self._fold()
+
+    def scan(self, text: str) -> Dict[str, Counter]:
+        """Per table, how many of each owner's keywords occur in `text` (already lowercased)."""
+        found = set()
+        for regex, closure in self.compiled:
+            for longest in set(regex.findall(text)):
+                found.update(closure[longest])
+        hits: Dict[str, Counter] = defaultdict(Counter)
+        for kw in found:
+            for table, owner in self.payload[kw]:
+                hits[table][owner] += 1
+        return hits
+
+    def best(self, table: str, hits: Dict[str, Counter]) -> Optional[str]:
+        """Owner with the most keyword hits; earlier registration wins ties."""
+        counts = hits.get(table)
+        return min(counts, key=lambda o: (-counts[o], self.rank[table, o])) if counts else None
+
+    def first(self, table: str, hits: Dict[str, Counter]) -> Optional[str]:
+        """Earliest-registered owner with any keyword hit."""
+        counts = hits.get(table)
+        return min(counts, key=lambda o: self.rank[table, o]) if counts else None
+
+    def route(self, query: str) -> tuple:
+        """(tool, niche, category) for a chat message."""
+        hits = self.scan(query.lower())
+        niche = self.first("niche", hits) or self.first("niche_alias", hits) or "Home & Kitchen"
+        return self.best("tool", hits), niche, self.best("category", hits)
+
+
+keyword_router = KeywordRouter()
+for _name, _info in AGENT_TOOLS.items():
+    keyword_router.add("tool", _name, _info["trigger_keywords"])
+for _niche in PRODUCT_NICHES:
+    keyword_router.add("niche", _niche, [_niche])
+for _niche, _kws in NICHE_KEYWORDS.items():
+    keyword_router.add("niche_alias", _niche, _kws)
+for _cat, _kws in CATEGORY_KEYWORDS.items():
+    keyword_router.add("category", _cat, _kws)
+keyword_router.compact()
+
+
+def register_tool(name: str, fn, description: str, trigger_keywords: List[str]):
+    """Add an agent tool at runtime; chat routes to it from the next message on."""
+    if name in AGENT_TOOLS:
+        raise ValueError(f"Tool {name!r} is already registered")
+    AGENT_TOOLS[name] = {"fn": fn, "description": description, "trigger_keywords": trigger_keywords}
+    keyword_router.add("tool", name, trigger_keywords)
+
+
+def register_niche(niche: str, keywords: Iterable[str] = ()):
+    """Add a product niche (and optional alias keywords) at runtime."""
+    if niche in PRODUCT_NICHES:
+        raise ValueError(f"Niche {niche!r} is already registered")
+    PRODUCT_NICHES.append(niche)
+    NICHE_KEYWORDS[niche] = list(keywords)
+    index_catalog(niche)
+    keyword_router.add("niche", niche, [niche])
+    keyword_router.add("niche_alias", niche, NICHE_KEYWORDS[niche])
 
 
 # ─── Response Generation ─────────────────────────────────────
-def generate_response(query: str, chunks: List[Dict], tool_result: Optional[Dict] = None, tool_name: Optional[str] = None, past_ctx: Optional[List[Dict]] = None) -> Dict:
-    citations = []
-    answer_parts = []
-    for i, chunk in enumerate(chunks):
-        citations.append({"id": i + 1, "source": chunk.get("title", "Unknown"), "section": chunk.get("section", ""), "page": chunk.get("page"), "relevance": chunk.get("relevance_score", 0), "text": chunk["text"][:200] + "..." if len(chunk["text"]) > 200 else chunk["text"]})
+def make_citation(n: int, chunk: Dict, relevance: float) -> Dict:
+    return {"id": n, "source": chunk.get("title", "Unknown"), "section": chunk.get("section", ""), "page": chunk.get("page"), "relevance": relevance, "text": chunk["text"][:200] + "..." if len(chunk["text"]) > 200 else chunk["text"]}
+
 
+def response_sections(query: str, chunks: List[Dict], tool_result: Optional[Dict] = None, tool_name: Optional[str] = None, past_ctx: Optional[List[Dict]] = None) -> Iterator[str]:
+    """The answer's markdown one section at a time: tool result, knowledge, history
+    (or the help text). Joining the sections with newlines gives the full answer."""
+    answered = False
+    answer_parts = []
     if tool_result and not tool_result.get("error"):
         if tool_name == "search_trends":
             t = tool_result
@@ -619,32 +2895,130 @@ def generate_response(query: str, chunks: List[Dict], tool_result: Optional[Dict
             for i, p in enumerate(ss.get("top_products", [])[:5], 1):
                 margin = round(p["profit"] / p["revenue"] * 100, 1) if p["revenue"] > 0 else 0
                 answer_parts.append(f"- **{i}. {p['name']}** — ${p['revenue']:,.2f} rev | ${p['profit']:,.2f} profit ({margin}% margin)")
+    if answer_parts:
+        yield "\n".join(answer_parts)
+        answered = True
 
     if chunks:
-        if answer_parts:
-            answer_parts.append("\n\n---\n\n**Relevant Knowledge:**")
+        answer_parts = ["\n\n---\n\n**Relevant Knowledge:**"] if answered else []
         best = chunks[0]
         answer_parts.append(f"According to **{best.get('title', '')}**, **{best.get('section', '')}**:\n\n> {best['text']}")
         for c in chunks[1:3]:
             answer_parts.append(f"\n- **{c.get('section', '')}** ({c.get('title', '')}): {c['text'][:150]}...")
+        yield "\n".join(answer_parts)
+        answered = True
 
     if past_ctx:
-        answer_parts.append("\n\n**From Your History (RAG):**")
+        answer_parts = ["\n\n**From Your History (RAG):**"]
         for r in past_ctx[:2]:
             icon = "✅" if r["outcome"] == "winner" else "❌" if r["outcome"] == "failed" else "➡️"
             answer_parts.append(f"- {icon} **{r['product_name']}** ({r['niche']}) — {r['outcome'].title()}: {r['reason']} (Margin: {r['margin_pct']}%)")
+        yield "\n".join(answer_parts)
+        answered = True
 
-    if not answer_parts:
-        answer_parts.append("I'm your E-Commerce Product Research Agent! I can help with:\n\n- **Trend Analysis** — \"What's trending in Home & Kitchen?\"\n- **Amazon Research** — \"Find products on Amazon in Pet Supplies\"\n- **Competitor Analysis** — \"Analyze competitors for portable ice maker\"\n- **Opportunity Scoring** — \"Score the opportunity for LED closet lights\"\n- **Full Reports** — \"Generate a research report for Beauty & Personal Care\"\n- **Sales Analysis** — \"How are our sales performing?\"\n\nUpload your sales CSV for personalized insights powered by RAG!")
+    if not answered:
+        yield "I'm your E-Commerce Product Research Agent! I can help with:\n\n- **Trend Analysis** — \"What's trending in Home & Kitchen?\"\n- **Amazon Research** — \"Find products on Amazon in Pet Supplies\"\n- **Competitor Analysis** — \"Analyze competitors for portable ice maker\"\n- **Opportunity Scoring** — \"Score the opportunity for LED closet lights\"\n- **Full Reports** — \"Generate a research report for Beauty & Personal Care\"\n- **Sales Analysis** — \"How are our sales performing?\"\n\nUpload your sales CSV for personalized insights powered by RAG!"
 
-    return {"answer": "\n".join(answer_parts), "citations": citations, "tool_used": tool_name, "tool_result": tool_result if tool_result and not tool_result.get("error") else None}
+
+@timed("stage_seconds", "generate_response")
+def generate_response(query: str, chunks: List[Dict], tool_result: Optional[Dict] = None, tool_name: Optional[str] = None, past_ctx: Optional[List[Dict]] = None) -> Dict:
+    citations = [make_citation(i + 1, chunk, chunk.get("relevance_score", 0)) for i, chunk in enumerate(chunks)]
+    answer = "\n".join(response_sections(query, chunks, tool_result, tool_name, past_ctx))
+    return {"answer": answer, "citations": citations, "tool_used": tool_name, "tool_result": tool_result if tool_result and not tool_result.get("error") else None}
+
+
+@timed("stage_seconds", "record_chat")
+def record_chat(session_id: str, query: str, answer: str, chunks: List[Dict], tool_name: Optional[str], category: Optional[str], processing_time: float):
+    """Store a finished exchange and count it; the transcript and counters land in one commit."""
+    with storage.transaction():
+        count_analytics({
+            "total_queries": 1, "total_response_time": processing_time,
+            "products_researched": 1 if tool_name in ["score_opportunity", "analyze_competitors"] else 0,
+            **({f"queries_by_type.{category}": 1} if category else {}),
+        })
+        chat_sessions.append(session_id, {"role": "user", "content": query},
+                             {"role": "assistant", "content": answer, "citations": [(c["id"], c.get("relevance_score", 0)) for c in chunks]})
+
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}  # no proxy buffering of the stream
+
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
 
 
 # ─── CSV Parsing ──────────────────────────────────────────────
-def parse_sales_csv(content: str, filename: str) -> List[Dict]:
-    parsed = []
-    reader = csv.DictReader(io.StringIO(content))
-    fieldnames = reader.fieldnames or []
+SALES_BATCH_ROWS = int(os.environ.get("SALES_BATCH_ROWS", 50000))
+SALES_MERGE_ROWS = int(os.environ.get("SALES_MERGE_ROWS", 200000))  # finished rows buffered per merge into the store
+SALES_DATE_FORMATS = ["%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%d/%m/%Y", "%Y/%m/%d"]
+_MONEY_CHARS = str.maketrans("", "", "$,")
+
+
+def _uuid4_bytes(n: int) -> np.ndarray:
+    """`n` random version-4 UUIDs as raw 16-byte values, drawn in one urandom call."""
+    raw = np.frombuffer(os.urandom(16 * n), np.uint8).reshape(n, 16).copy()
+    raw[:, 6] = raw[:, 6] & 0x0F | 0x40
+    raw[:, 8] = raw[:, 8] & 0x3F | 0x80
+    return raw.view("S16").ravel()
+
+
+SALES_PARSED_FIELDS = ("day", "quantity", "revenue", "cost", "product_name", "category", "store")
+
+
+def _parsed_batch(raw: Dict[str, list], lookups: Dict[str, Dict[str, int]]) -> Dict[str, Any]:
+    """Pack raw parsed fields into compact arrays (cheap to pickle out of a worker).
+
+    Text fields arrive as codes into batch-local `lookups`; the store maps them
+    onto its own dictionaries on merge.
+    """
+    return {
+        "day": np.asarray(raw["day"], np.int32), "quantity": np.asarray(raw["quantity"], np.int64),
+        "revenue": np.asarray(raw["revenue"], np.float64), "cost": np.asarray(raw["cost"], np.float64),
+        **{f: (list(lookups[f]), np.asarray(raw[f], np.int32)) for f in ("product_name", "category", "store")},
+    }
+
+
+def _sales_batch(parsed: Dict[str, Any], rng: np.random.Generator, source: str = "uploaded") -> Dict[str, Any]:
+    """Finish a parsed batch: draw ad/fee rates, derive the money columns, assign ids.
+
+    Batches are finished in file order from the upload's own `rng`; a
+    Generator yields the same doubles however the draws are split, so the
+    rates line up row for row whether the file was parsed serially or in
+    workers, in any batch size.
+    """
+    n = len(parsed["day"])
+    u = rng.random((n, 2))
+    revenue, cost = parsed["revenue"], parsed["cost"]
+    ad_spend = _round_exact(revenue * (0.10 + 0.15 * u[:, 0]), 2)
+    fee = _round_exact(revenue * (0.03 + 0.12 * u[:, 1]), 2)
+    profit = _round_exact(revenue - cost - ad_spend - fee, 2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        margin = np.where(revenue > 0, _round_exact(profit / revenue * 100, 1), 0.0)
+    return {
+        "day": parsed["day"], "id": _uuid4_bytes(n), "quantity": parsed["quantity"],
+        "revenue": _round_exact(revenue, 2), "cost": _round_exact(cost, 2), "ad_spend": ad_spend, "platform_fee": fee,
+        "profit": profit, "margin_pct": margin,
+        **{f: parsed[f] for f in ("product_name", "category", "store")},
+        "source": ([source], np.zeros(n, np.int32)),
+    }
+
+
+def detect_date_format(samples: List[str]) -> Optional[str]:
+    """Pick the format that parses the most sample dates; earlier formats win ties."""
+    best, best_hits = None, 0
+    for fmt in SALES_DATE_FORMATS:
+        hits = 0
+        for s in samples:
+            try:
+                datetime.strptime(s, fmt); hits += 1
+            except ValueError:
+                pass
+        if hits > best_hits:
+            best, best_hits = fmt, hits
+    return best
+
+
+def _sales_col_map(fieldnames: List[str]) -> Optional[Dict[str, str]]:
     col_map = {}
     for col in fieldnames:
         cl = col.lower().strip()
@@ -664,41 +3038,403 @@ def parse_sales_csv(content: str, filename: str) -> List[Dict]:
             col_map["store"] = col
     if "date" not in col_map or "revenue" not in col_map:
         if len(fieldnames) >= 3:
-            col_map = {"date": fieldnames[0], "product": fieldnames[1], "revenue": fieldnames[2]}
-        else:
-            return []
-    for row in reader:
+            return {"date": fieldnames[0], "product": fieldnames[1], "revenue": fieldnames[2]}
+        return None
+    return col_map
+
+
+def _sales_layout(fieldnames: List[str]) -> Optional[tuple]:
+    """Column indices (date, revenue, product, cost, quantity, category, store) for a header row."""
+    col_map = _sales_col_map(fieldnames)
+    if col_map is None:
+        return None
+    # Same lookups csv.DictReader did: by header name, last duplicate wins.
+    pos = {name: i for i, name in enumerate(fieldnames)}
+    return (pos[col_map["date"]], pos[col_map["revenue"]],
+            *(pos.get(col_map.get(f, "")) for f in ("product", "cost", "quantity", "category", "store")))
+
+
+def _date_formats(sample: List[List[str]], di: int) -> List[str]:
+    """All known date formats, the one detected from `sample` first."""
+    detected = detect_date_format([r[di].strip() for r in sample if len(r) > di])
+    return [detected] + [f for f in SALES_DATE_FORMATS if f != detected] if detected else SALES_DATE_FORMATS
+
+
+def parse_sales_csv(lines: Iterable[str], filename: str, batch_size: int = SALES_BATCH_ROWS,
+                    date_formats: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+    """Parse CSV text lines into parsed batches of at most `batch_size` rows.
+
+    The column layout is resolved once from the header and the date format is
+    detected once from a sample of rows (unless `date_formats` is given); each
+    distinct date string is then parsed a single time and cached as a day
+    ordinal. Rows that don't match the detected format fall back to trying
+    every known format, and rows with an unparseable date or number are
+    skipped, as before. Only the current batch is held as Python objects, so
+    memory does not grow with the file. Pass each batch through `_sales_batch`
+    to get store columns.
+    """
+    reader = csv.reader(lines)
+    layout = _sales_layout(next(reader, None) or [])
+    if layout is None:
+        return
+    di, ri, pi, ci, qi, gi, si = layout
+
+    sample = list(itertools.islice(reader, 256))
+    formats = date_formats or _date_formats(sample, di)
+    day_cache: Dict[str, Optional[int]] = {}
+    raw: Dict[str, list] = {f: [] for f in SALES_PARSED_FIELDS}
+    lookups: Dict[str, Dict[str, int]] = {f: {} for f in ("product_name", "category", "store")}
+    days, qtys, revs, costs = (raw[f].append for f in SALES_PARSED_FIELDS[:4])
+    text_cols = [(lookups[f], raw[f].append) for f in ("product_name", "category", "store")]
+    for row in itertools.chain(sample, reader):
+        if not row:
+            continue
         try:
-            date_str = row.get(col_map["date"], "").strip()
-            product = row.get(col_map.get("product", ""), "Unknown").strip()
-            rev_str = row.get(col_map["revenue"], "0").strip().replace("$", "").replace(",", "")
-            revenue = float(rev_str)
-            cost_str = row.get(col_map.get("cost", ""), "0").strip().replace("$", "").replace(",", "")
+            date_str = row[di].strip()
+            product = row[pi].strip() if pi is not None else "Unknown"
+            revenue = float(row[ri].strip().translate(_MONEY_CHARS))
+            cost_str = row[ci].strip().translate(_MONEY_CHARS) if ci is not None else "0"
             cost = float(cost_str) if cost_str else revenue * 0.3
-            qty_str = row.get(col_map.get("quantity", ""), "1").strip()
+            qty_str = row[qi].strip() if qi is not None else "1"
             qty = int(float(qty_str)) if qty_str else 1
-            date_parsed = None
-            for fmt in ["%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%d/%m/%Y", "%Y/%m/%d"]:
-                try:
-                    date_parsed = datetime.strptime(date_str, fmt); break
-                except ValueError:
-                    continue
-            if not date_parsed:
+            day = day_cache.get(date_str, -1)
+            if day == -1:
+                day = None
+                for fmt in formats:
+                    try:
+                        day = datetime.strptime(date_str, fmt).toordinal(); break
+                    except ValueError:
+                        continue
+                if len(day_cache) < 100_000:
+                    day_cache[date_str] = day
+            if day is None:
                 continue
-            ad_spend = round(revenue * random.uniform(0.10, 0.25), 2)
-            fee = round(revenue * random.uniform(0.03, 0.15), 2)
-            profit = round(revenue - cost - ad_spend - fee, 2)
-            parsed.append({
-                "id": str(uuid.uuid4()), "date": date_parsed.strftime("%Y-%m-%d"),
-                "product_name": product, "category": row.get(col_map.get("category", ""), "Uncategorized").strip() or "Uncategorized",
-                "store": row.get(col_map.get("store", ""), "Uploaded Store").strip() or "Uploaded Store",
-                "quantity": qty, "revenue": round(revenue, 2), "cost": round(cost, 2),
-                "ad_spend": ad_spend, "platform_fee": fee, "profit": profit,
-                "margin_pct": round(profit / revenue * 100, 1) if revenue > 0 else 0, "source": "uploaded",
-            })
-        except (ValueError, KeyError):
+            category = (row[gi].strip() if gi is not None else "Uncategorized") or "Uncategorized"
+            store = (row[si].strip() if si is not None else "Uploaded Store") or "Uploaded Store"
+        except (ValueError, IndexError):
             continue
-    return parsed
+        days(day); qtys(qty); revs(revenue); costs(cost)
+        for (lookup, add), value in zip(text_cols, (product, category, store)):
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(lookup)
+            add(code)
+        if len(raw["day"]) >= batch_size:
+            yield _parsed_batch(raw, lookups)
+            for values in raw.values():
+                values.clear()
+            for lookup in lookups.values():
+                lookup.clear()
+    if raw["day"]:
+        yield _parsed_batch(raw, lookups)
+
+
+# ─── Parallel CSV Parsing ─────────────────────────────────────
+# Parsing runs at ~10 MiB/s per worker and a cold pool takes ~1 s to spawn, so two workers pay for
+# themselves on a first upload from ~24 MiB; 32 MiB also gives each of them two ranges.
+SALES_PARALLEL_MIN_BYTES = int(os.environ.get("SALES_PARALLEL_MIN_BYTES", 32 * 1024 * 1024))
+# Parsing is 25-40% of an in-memory ingest and ~12% of a SQLite one, so workers past two buy an upload
+# little and take cores from request handling; one core is always left to the server.
+SALES_PARSE_WORKERS = int(os.environ.get("SALES_PARSE_WORKERS", max(1, min(2, (os.cpu_count() or 1) - 1))))
+SALES_CHUNK_BYTES = 8 * 1024 * 1024
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Shared worker pool, started on first use.
+
+    Workers are spawned rather than forked, since forking a server that is
+    already running threads can deadlock the child.
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(SALES_PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _process_pool
+
+
+def _parse_sales_range(header: bytes, body: bytes, filename: str, date_formats: List[str]) -> List[Dict[str, Any]]:
+    """Worker entry point: parse one record-aligned byte range under the shared header."""
+    text = io.StringIO((header + body).decode("utf-8", errors="ignore"), newline="")
+    return list(parse_sales_csv(text, filename, SALES_BATCH_ROWS, date_formats))
+
+
+def _finish_record(raw: BinaryIO, body: bytes) -> bytes:
+    """Extend `body`, which starts on a record boundary, with whole lines until it ends on one.
+
+    An odd quote count means the last newline sits inside a quoted field
+    ("Widget\nDeluxe"). Quotes inside fields are doubled, so for properly
+    quoted CSV the parity is exact.
+    """
+    quotes = body.count(b'"')
+    parts = [body]
+    while quotes % 2:
+        line = raw.readline()
+        if not line:
+            break
+        parts.append(line)
+        quotes += line.count(b'"')
+    return b"".join(parts)
+
+
+def parse_sales_parallel(raw: BinaryIO, filename: str) -> Iterator[Dict[str, Any]]:
+    """Parse a binary CSV across the process pool, yielding parsed batches in file order.
+
+    The date format is detected here from the same 256-row head the serial
+    parser samples, and the body is cut into ~SALES_CHUNK_BYTES ranges on
+    record boundaries (quoted newlines included, see `_finish_record`), each
+    parsed under the shared header; so workers keep and skip exactly the rows
+    `parse_sales_csv` would. At most two ranges per worker are in flight.
+    """
+    header = _finish_record(raw, raw.readline())
+    start = raw.tell()
+    head = b"".join(_finish_record(raw, line) for line in itertools.islice(iter(raw.readline, b""), 256))
+    raw.seek(start)
+    reader = csv.reader(io.StringIO((header + head).decode("utf-8", errors="ignore"), newline=""))
+    layout = _sales_layout(next(reader, None) or [])
+    if layout is None:
+        return
+    formats = _date_formats(list(reader), layout[0])
+    pool = get_process_pool()
+    pending: deque = deque()
+    try:
+        for body in iter(lambda: _finish_record(raw, raw.read(SALES_CHUNK_BYTES) + raw.readline()), b""):
+            pending.append(pool.submit(_parse_sales_range, header, body, filename, formats))
+            if len(pending) >= 2 * SALES_PARSE_WORKERS:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def ingest_sales_file(raw: BinaryIO, filename: str) -> Dict[str, Any]:
+    """Stream a spooled CSV upload into `sales_data`; meant to run off the event loop.
+
+    Files of at least SALES_PARALLEL_MIN_BYTES are parsed across the process
+    pool, smaller ones are decoded incrementally and parsed here. Either way
+    batches are finished in file order and merged into the store, in date
+    order, every SALES_MERGE_ROWS rows, so memory beyond the store stays
+    bounded whatever the file size. Revenue and profit totals are running
+    sums. A file that fails midway keeps the groups merged before the failure.
+    The simulated ad/fee rates come from a stream seeded by the file's name,
+    size and head, so re-uploading a file reproduces them.
+    """
+    size = raw.seek(0, io.SEEK_END)
+    raw.seek(0)
+    rng = np.random.default_rng(_stable_seed(b"%s:%d:%s" % (filename.encode(), size, raw.read(65536))))
+    raw.seek(0)
+    text = None
+    if size >= SALES_PARALLEL_MIN_BYTES and SALES_PARSE_WORKERS > 1:
+        parsed = parse_sales_parallel(raw, filename)
+    else:
+        text = io.TextIOWrapper(raw, encoding="utf-8", errors="ignore", newline="")
+        parsed = parse_sales_csv(text, filename)
+    batches: List[Dict[str, Any]] = []
+    buffered = 0
+    stats = {"records": 0, "total_revenue": 0.0, "total_profit": 0.0, "first_day": None, "last_day": None, "size_bytes": size}
+    parse_seconds, resumed = 0.0, time.perf_counter()  # time spent inside the parser only
+    try:
+        for p in parsed:
+            parse_seconds += time.perf_counter() - resumed
+            batch = _sales_batch(p, rng)
+            # Continued from the running total in row order, like the old per-row sum(), so batch boundaries don't matter.
+            for field in ("revenue", "profit"):
+                stats[f"total_{field}"] = float(np.cumsum(np.concatenate(([stats[f"total_{field}"]], batch[field])))[-1])
+            stats["records"] += len(batch["day"])
+            if stats["first_day"] is None:
+                stats["first_day"] = int(batch["day"][0])
+            stats["last_day"] = int(batch["day"][-1])
+            batches.append(batch)
+            buffered += len(batch["day"])
+            if buffered >= SALES_MERGE_ROWS:
+                sales_data.extend_batches(batches)
+                batches, buffered = [], 0
+            resumed = time.perf_counter()
+        parse_seconds += time.perf_counter() - resumed
+        sales_data.extend_batches(batches)
+    finally:
+        parsed.close()
+        if text is not None:
+            text.detach()  # Starlette owns (and closes) the spooled file
+    product_clusters.sync(sales_data)
+    record_timing("stage_seconds", "parse_sales_csv", parse_seconds)
+    metrics.count({"csv_parse_rows_total": stats["records"], "csv_parse_bytes_total": size, "csv_parse_seconds_total": parse_seconds})
+    return stats
+
+
+# ─── Trend Comparison ────────────────────────────────────────
+TREND_COMPARE_MAX_NICHES = 500
+TREND_COMPARE_MAX_DAYS = 1825
+TREND_COMPARE_POINTS = 52
+
+
+@cached_tool("trend_series")
+def trend_series(niche: str, days: int, today: int) -> TrendSeries:
+    # `today` is part of the cache key, so a series cached before midnight isn't served with yesterday's dates.
+    return mock_trend_series(niche, days, today)
+
+
+def _window_means(matrix: np.ndarray, window: int) -> np.ndarray:
+    """Trailing `window`-day means along each row: column k averages days k..k+window-1."""
+    sums = np.cumsum(matrix, axis=1, dtype=np.float64)
+    sums[:, window:] -= sums[:, :-window].copy()
+    return (sums[:, window - 1:] / window).astype(np.float32)
+
+
+def tool_compare_trends(niches: Optional[List[str]] = None, days: int = 365, window: int = 7, points: int = TREND_COMPARE_POINTS) -> Dict:
+    """Velocity, slope, rolling averages and downsampled series for many niches at once.
+
+    Every niche covers the same days, so the series stack into one
+    niches × days float32 matrix and each statistic is a single array
+    operation across all of them. Velocity compares the first and last
+    `window`-day means rather than two single noisy days; slope is the
+    least-squares fit in interest points per day. Series are downsampled
+    to at most `points` buckets of `step_days` days, aligned to the most
+    recent day, and share one date axis: bucket k starts at
+    `series_start + k * step_days`.
+    """
+    niches = list(dict.fromkeys(niches or PRODUCT_NICHES))
+    window = max(1, min(window, days))
+    today = datetime.now().toordinal()  # one date axis for every niche, even across midnight
+    series = [trend_series(niche, days, today) for niche in niches]
+    matrix = np.vstack([s.values for s in series]).astype(np.float32)
+
+    rolling = _window_means(matrix, window)
+    first, last = rolling[:, 0], rolling[:, -1]
+    velocity = (last - first) / np.maximum(first, 1) * 100
+    x = np.arange(days, dtype=np.float32) - (days - 1) / 2
+    slope = (matrix - matrix.mean(axis=1, keepdims=True)) @ x / float(x @ x)
+
+    step = max(1, -(-days // points))
+    buckets = days // step
+    offset = days - buckets * step  # oldest days that don't fill a bucket are dropped
+    downsampled = matrix[:, offset:].reshape(len(niches), buckets, step).mean(axis=2)
+    bucket_ends = offset + step * np.arange(1, buckets + 1) - 1
+    rolling_at = rolling[:, np.maximum(bucket_ends - window + 1, 0)]  # the mean ending on each bucket's last day
+
+    def cols(a: np.ndarray, digits: int = 1) -> List[list]:
+        # Rounded in float64: a rounded float32 widens to e.g. 68.80000305175781 on the way out.
+        return np.round(a.astype(np.float64), digits).tolist()
+
+    velocity, slope, current = cols(velocity), cols(slope, 3), matrix[:, -1].astype(np.int16).tolist()
+    rolling_now, series_out, rolling_out = cols(last), cols(downsampled), cols(rolling_at)
+    return {
+        "days": days, "window": window, "step_days": step, "points": buckets,
+        "series_start": _day_string(series[0].start + offset), "end": _day_string(series[0].start + days - 1),
+        "niches": [{
+            "niche": niche, "current_interest": current[i], "rolling_avg": rolling_now[i],
+            "trend_velocity": velocity[i], "slope_per_day": slope[i],
+            "trend_direction": "rising" if velocity[i] > 10 else "stable" if velocity[i] > -10 else "declining",
+            "series": series_out[i], "rolling": rolling_out[i],
+        } for i, niche in enumerate(niches)],
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+# ─── Opportunity Scan ────────────────────────────────────────
+SCAN_BUDGET_SECONDS = float(os.environ.get("SCAN_BUDGET_SECONDS", 10))
+SCAN_MAX_NICHES = 1000
+SCAN_CHUNK_NICHES = 8  # niches per pool task: enough to amortize the round trip, small enough for a budget to cut in
+SCAN_WORKERS = int(os.environ.get("SCAN_WORKERS", max(1, min(2, (os.cpu_count() or 1) - 1))))
+SCAN_PROCESS_MIN_NICHES = int(os.environ.get("SCAN_PROCESS_MIN_NICHES", 32))
+
+_scan_pool: Optional[ProcessPoolExecutor] = None
+_scan_pool_started: List[Future] = []
+
+
+def get_scan_pool() -> Optional[ProcessPoolExecutor]:
+    """The scan's own worker pool, so a scan never queues behind an upload's parse ranges.
+
+    The first call starts every worker in the background and returns None, as
+    does every call until they are all up: a spawned worker takes about a
+    second to import this module, longer than a scan it could speed up.
+    """
+    global _scan_pool, _scan_pool_started
+    with _process_pool_lock:
+        if _scan_pool is None:
+            _scan_pool = ProcessPoolExecutor(SCAN_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+            _scan_pool_started = [_scan_pool.submit(abs, 0) for _ in range(SCAN_WORKERS)]  # one spawn per submit
+        return _scan_pool if all(f.done() for f in _scan_pool_started) else None
+
+
+def _scan_niches(niches: List[str]) -> List[tuple]:
+    """(niche, scored products) for each niche, scored as its report would be."""
+    return [(niche, [{"niche": niche, **p, **product_score(niche, p)} for p in tool_search_amazon(niche, 10)["products"][:8]])
+            for niche in niches]
+
+
+def _scan_niches_remote(niches: List[str]) -> tuple:
+    """Pool entry point: `_scan_niches`, plus the cache entries it loaded for the parent to keep."""
+    results = _scan_niches(niches)
+    keys = [k for niche, scored in results
+            for k in (tool_search_amazon.key(niche, 10), tool_search_trends.key(niche), *(product_score_key(niche, p) for p in scored))]
+    return results, tool_cache.export(keys)
+
+
+def tool_scan_niches(niches: Optional[List[str]] = None, top_n: int = 20, budget: float = SCAN_BUDGET_SECONDS) -> Dict:
+    """Score the report products of many niches and keep the global top `top_n`.
+
+    Niches already in the tool cache cost next to nothing, so they are scored
+    here. So is a scan with fewer than SCAN_PROCESS_MIN_NICHES uncached niches,
+    which a pool can't pay its round trips back on, and any scan while the pool
+    is still starting. Otherwise the uncached niches are cut into chunks for
+    the SCAN_WORKERS scan pool, and the cache entries each worker loads are
+    adopted here, so the next scan or report of those niches is warm too.
+    Results are merged as they arrive into a `top_n`-entry min-heap. Ties rank like a report: niche order, then
+    product order. Work still pending when `budget` seconds run out is
+    dropped. The result then covers the niches that finished and sets
+    `partial`.
+    """
+    niches = list(dict.fromkeys(niches or PRODUCT_NICHES))
+    start = time.perf_counter()
+    deadline = start + budget
+    order = {niche: i for i, niche in enumerate(niches)}
+    heap: List[tuple] = []
+    scanned = set()
+
+    def merge(results: List[tuple]):
+        for niche, scored in results:
+            scanned.add(niche)
+            for j, product in enumerate(scored):
+                entry = (product["composite_score"], -order[niche], -j, product)  # keys are unique, dicts never compared
+                if len(heap) < top_n:
+                    heapq.heappush(heap, entry)
+                else:
+                    heapq.heappushpop(heap, entry)
+
+    cold = [niche for niche in niches if tool_search_amazon.key(niche, 10) not in tool_cache]
+    pool = get_scan_pool() if SCAN_WORKERS > 1 and len(cold) >= SCAN_PROCESS_MIN_NICHES else None
+    local, futures = niches, []
+    if pool is not None:
+        size = max(1, min(SCAN_CHUNK_NICHES, math.ceil(len(cold) / (2 * SCAN_WORKERS))))
+        futures = [pool.submit(_scan_niches_remote, cold[i:i + size]) for i in range(0, len(cold), size)]
+        pooled = set(cold)
+        local = [niche for niche in niches if niche not in pooled]
+    try:
+        for niche in local:  # scored while the pool, if any, works on the rest
+            if time.perf_counter() >= deadline:
+                break
+            merge(_scan_niches([niche]))
+        for future in as_completed(futures, timeout=max(0.0, deadline - time.perf_counter())):
+            results, entries = future.result()
+            tool_cache.adopt(entries)
+            merge(results)
+    except FutureTimeoutError:
+        pass
+    finally:
+        for future in futures:
+            future.cancel()  # chunks already running finish in their worker; their results are dropped
+    skipped = [niche for niche in niches if niche not in scanned]
+    return {
+        "niches_requested": len(niches), "niches_scanned": len(scanned), "partial": bool(skipped), "skipped_niches": skipped,
+        "elapsed_seconds": round(time.perf_counter() - start, 3), "top_n": top_n,
+        "results": [{"rank": rank, **entry[3]} for rank, entry in enumerate(sorted(heap, reverse=True), 1)],
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
 
 
 # ─── Pydantic Models ─────────────────────────────────────────
@@ -723,17 +3459,53 @@ class FeedbackRequest(BaseModel):
     rating: str
     comment: Optional[str] = None
 
+class ScoreItem(BaseModel):
+    title: str
+    price: float = 50
+    seller_count: int = 20
+    rating: float = 4.0
+    fba_available: bool = False
+    avg_competitor_reviews: Optional[float] = None
+    trend_velocity: Optional[float] = None
+
+class TrendCompareRequest(BaseModel):
+    niches: Optional[List[str]] = None  # default: every registered niche
+    days: int = 365
+    window: int = 7
+    points: int = TREND_COMPARE_POINTS
+
+class ScanRequest(BaseModel):
+    niches: Optional[List[str]] = None  # default: every registered niche
+    top_n: int = 20
+    budget_seconds: float = SCAN_BUDGET_SECONDS
+
+
+class BatchScoreRequest(BaseModel):
+    products: List[ScoreItem]
+    niche: str = "Home & Kitchen"
+    top_k: Optional[int] = None
+
 
 # ─── Routes ──────────────────────────────────────────────────
 @app.on_event("startup")
 async def startup_event():
     initialize_knowledge_base()
-    sales_data.extend(generate_sample_sales())
-    product_research.extend(generate_sample_research())
+    # One write transaction, so only the first of several workers seeds an empty store.
+    with storage.transaction():
+        if not len(sales_data):
+            sales_data.extend(generate_sample_sales())
+        if not storage.has_research():
+            storage.add_research(generate_sample_research())
+    sync_shared_state()
     print(f"🚀 E-Commerce Product Researcher API starting...")
-    print(f"📚 Loaded {len(knowledge_chunks)} knowledge chunks")
-    print(f"💰 Pre-loaded {len(sales_data)} sample sales records (12 months)")
-    print(f"🔬 Pre-loaded {len(product_research)} past research records")
+    print(f"📚 Loaded {len(knowledge_chunks)} knowledge chunks ({type(chunk_index).__name__}, RAG_ENGINE={RAG_ENGINE})")
+    print(f"💰 Loaded {len(sales_data)} sales records ({type(storage).__name__}, STORAGE_BACKEND={STORAGE_BACKEND})")
+    print(f"🔬 Loaded {len(product_research)} past research records")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await run_in_threadpool(metrics.flush)  # samples from the last METRICS_FLUSH_SECONDS
 
 
 @app.get("/")
@@ -741,11 +3513,13 @@ async def root():
     return {
         "name": "E-Commerce Product Researcher Agent API", "version": "1.0.0", "status": "running", "docs": "/docs",
         "endpoints": {
-            "chat": "POST /api/v1/chat", "trends": "GET /api/v1/trends/{niche}",
+            "chat": "POST /api/v1/chat", "chat_stream": "POST /api/v1/chat/stream", "trends": "GET /api/v1/trends/{niche}",
+            "trends_compare": "POST /api/v1/trends/compare",
             "amazon": "GET /api/v1/amazon/{niche}", "competitors": "GET /api/v1/competitors/{product}",
-            "score": "GET /api/v1/score/{product}", "report": "GET /api/v1/report/{niche}",
-            "sales": "GET /api/v1/sales/summary", "upload": "POST /api/v1/sales/upload",
-            "research_history": "GET /api/v1/research/history", "analytics": "GET /api/v1/analytics",
+            "score": "GET /api/v1/score/{product}", "score_batch": "POST /api/v1/score/batch", "product_search": "GET /api/v1/products/search", "scan": "POST /api/v1/scan", "report": "GET /api/v1/report/{niche}",
+            "report_stream": "GET /api/v1/report/{niche}/stream",
+            "sales": "GET /api/v1/sales/summary", "sales_clusters": "GET /api/v1/sales/clusters", "upload": "POST /api/v1/sales/upload",
+            "research_history": "GET /api/v1/research/history", "analytics": "GET /api/v1/analytics", "metrics": "GET /metrics",
             "health": "GET /api/v1/health",
         },
     }
@@ -753,142 +3527,222 @@ async def root():
 
 @app.get("/api/v1/health")
 async def health_check():
-    return {"status": "healthy", "service": "ecommerce-product-researcher", "version": "1.0.0", "knowledge_chunks": len(knowledge_chunks), "sales_records": len(sales_data), "research_records": len(product_research)}
+    await run_in_threadpool(sync_shared_state)
+    sales_records = await run_in_threadpool(len, sales_data)  # a storage read on SQLite
+    return {"status": "healthy", "service": "ecommerce-product-researcher", "version": "1.0.0", "knowledge_chunks": len(knowledge_chunks), "sales_records": sales_records, "research_records": len(product_research)}
 
 
 @app.post("/api/v1/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, shape: ResponseShape = Depends()):
     start_time = time.time()
     session_id = request.session_id or str(uuid.uuid4())
-    if session_id not in chat_sessions:
-        chat_sessions[session_id] = []
     query = request.message.strip()
     if not query:
         raise HTTPException(status_code=400, detail="Message cannot be empty")
 
-    category = detect_category(query)
-    niche = extract_niche(query)
-    tool_name = detect_tool_call(query)
-    tool_result = None
-    if tool_name:
-        tool_fn = AGENT_TOOLS[tool_name]["fn"]
-        if tool_name == "search_trends":
-            tool_result = tool_fn(niche)
-        elif tool_name == "search_amazon":
-            tool_result = tool_fn(niche)
-        elif tool_name == "analyze_competitors":
-            product = query.split("for ")[-1].strip() if "for " in query else query.split("competitor")[-1].strip()
-            product = product.strip("?.,! ") or "Portable Ice Maker"
-            tool_result = tool_fn(product)
-        elif tool_name == "score_opportunity":
-            product = query.split("for ")[-1].strip() if "for " in query else query.split("score")[-1].strip()
-            product = product.strip("?.,! ") or "Portable Ice Maker"
-            tool_result = tool_fn(product, niche)
-        elif tool_name == "generate_report":
-            tool_result = tool_fn(niche)
-        elif tool_name == "get_sales_summary":
-            tool_result = tool_fn(3)
-        else:
-            tool_result = tool_fn()
-
-    chunks = retrieve_chunks(query, top_k=3)
-    past_ctx = retrieve_research(query, top_k=2)
-    response_data = generate_response(query, chunks, tool_result, tool_name, past_ctx)
+    with timed("stage_seconds", "detect_tool_call"):
+        tool_name, niche, category = keyword_router.route(query)
+    # The tool call and both retrievals are independent; run them side by side off the event loop.
+    tool_result, chunks, past_ctx = await asyncio.gather(
+        run_tool(AGENT_TOOLS[tool_name]["fn"], *tool_args(tool_name, query, niche)) if tool_name else asyncio.sleep(0),
+        run_in_threadpool(retrieve_chunks, query, 3),
+        run_in_threadpool(retrieve_research, query, 2),
+    )
+    response_data = await run_in_threadpool(generate_response, query, chunks, tool_result, tool_name, past_ctx)
     processing_time = round(time.time() - start_time, 3)
 
-    analytics["total_queries"] += 1
-    analytics["total_response_time"] += processing_time
-    analytics["avg_response_time"] = round(analytics["total_response_time"] / analytics["total_queries"], 3)
-    analytics["products_researched"] += 1 if tool_name in ["score_opportunity", "analyze_competitors"] else 0
-    if category:
-        analytics["queries_by_type"][category] = analytics["queries_by_type"].get(category, 0) + 1
-
-    chat_sessions[session_id].append({"role": "user", "content": query})
-    chat_sessions[session_id].append({"role": "assistant", "content": response_data["answer"], "citations": response_data["citations"]})
-
-    return ChatResponse(
-        session_id=session_id, message=query, answer=response_data["answer"],
-        citations=response_data["citations"], category=category,
-        tool_used=response_data.get("tool_used"), tool_result=response_data.get("tool_result"),
-        processing_time=processing_time, timestamp=time.strftime("%Y-%m-%d %H:%M:%S"),
-    )
+    await run_in_threadpool(record_chat, session_id, query, response_data["answer"], chunks, tool_name, category, processing_time)
+
+    # Built in ChatResponse's field order and rendered directly: the nested tool result needs no revalidation.
+    return shape({
+        "session_id": session_id, "message": query, "answer": response_data["answer"],
+        "citations": response_data["citations"], "category": category,
+        "tool_used": response_data.get("tool_used"), "tool_result": response_data.get("tool_result"),
+        "processing_time": processing_time, "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+    })
+
+
+@app.post("/api/v1/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """`/api/v1/chat` as Server-Sent Events.
+
+    Events: `meta` (session, category, tool) right away, `citations` once
+    retrieval is done, one `section` per answer section as it is produced
+    (their markdown joined with newlines is the full answer), then `done`
+    with the tool result and timing. A failure midway ends the stream with
+    an `error` event instead of `done`.
+    """
+    start_time = time.time()
+    session_id = request.session_id or str(uuid.uuid4())
+    query = request.message.strip()
+    if not query:
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+    with timed("stage_seconds", "detect_tool_call"):
+        tool_name, niche, category = keyword_router.route(query)
+
+    async def events():
+        yield sse_event("meta", {"session_id": session_id, "message": query, "category": category, "tool_used": tool_name})
+        tool_job = None
+        try:
+            tool_job = asyncio.ensure_future(run_tool(AGENT_TOOLS[tool_name]["fn"], *tool_args(tool_name, query, niche))) if tool_name else None
+            chunks, past_ctx = await asyncio.gather(run_in_threadpool(retrieve_chunks, query, 3), run_in_threadpool(retrieve_research, query, 2))
+            yield sse_event("citations", [make_citation(i + 1, c, c.get("relevance_score", 0)) for i, c in enumerate(chunks)])
+            tool_result = await tool_job if tool_job else None
+            sections = []
+            async for section in iterate_in_threadpool(response_sections(query, chunks, tool_result, tool_name, past_ctx)):
+                sections.append(section)
+                yield sse_event("section", {"index": len(sections) - 1, "markdown": section})
+            processing_time = round(time.time() - start_time, 3)
+            await run_in_threadpool(record_chat, session_id, query, "\n".join(sections), chunks, tool_name, category, processing_time)
+            yield sse_event("done", {
+                "tool_used": tool_name, "tool_result": tool_result if tool_result and not tool_result.get("error") else None,
+                "processing_time": processing_time, "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            })
+        except Exception:
+            # The 200 and the first events are already sent, so the failure can only be reported in the stream.
+            traceback.print_exc()
+            yield sse_event("error", {"detail": "The answer could not be completed."})
+        finally:
+            if tool_job and not tool_job.done():
+                tool_job.cancel()  # client went away, or the answer failed, before the tool finished
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
 
 
 @app.get("/api/v1/chat/{session_id}/history")
-async def get_chat_history(session_id: str):
-    return {"session_id": session_id, "messages": chat_sessions.get(session_id, [])}
+async def get_chat_history(session_id: str, cursor: Optional[int] = None, limit: int = SESSION_PAGE_SIZE):
+    page = await run_in_threadpool(chat_sessions.page, session_id, cursor, max(1, min(limit, 500)))
+    return {"session_id": session_id, **(page or {"messages": [], "first_index": 0, "next_cursor": None})}
 
 
 @app.post("/api/v1/chat/feedback")
 async def submit_feedback(request: FeedbackRequest):
-    if request.rating == "positive":
-        analytics["feedback_positive"] += 1
-    else:
-        analytics["feedback_negative"] += 1
+    await run_in_threadpool(count_analytics, {"feedback_positive" if request.rating == "positive" else "feedback_negative": 1})
     return {"success": True, "message": "Feedback recorded."}
 
 
 @app.get("/api/v1/trends/{niche}")
-async def get_trends(niche: str):
-    return tool_search_trends(niche)
+async def get_trends(niche: str, shape: ResponseShape = Depends()):
+    return shape(await run_tool(tool_search_trends, niche))
+
+
+@app.post("/api/v1/trends/compare")
+async def compare_trends(request: TrendCompareRequest, shape: ResponseShape = Depends()):
+    """Many niches over one long window: velocity, slope, rolling averages and downsampled series."""
+    niches = [n.strip() for n in request.niches or [] if n.strip()]
+    if request.niches is not None and not niches:
+        raise HTTPException(status_code=400, detail="Provide at least one niche, or omit `niches` to compare the catalog.")
+    if len(niches) > TREND_COMPARE_MAX_NICHES:
+        raise HTTPException(status_code=400, detail=f"At most {TREND_COMPARE_MAX_NICHES} niches per comparison.")
+    if not 2 <= request.days <= TREND_COMPARE_MAX_DAYS or not 1 <= request.window <= request.days or not 1 <= request.points <= request.days:
+        raise HTTPException(status_code=400, detail=f"days must be 2-{TREND_COMPARE_MAX_DAYS}, window and points 1-days.")
+    return shape(await run_tool(tool_compare_trends, niches or None, request.days, request.window, request.points))
 
 
 @app.get("/api/v1/amazon/{niche}")
-async def get_amazon_products(niche: str, count: int = 10):
-    return tool_search_amazon(niche, count)
+async def get_amazon_products(niche: str, count: int = 10, shape: ResponseShape = Depends()):
+    return shape(await run_tool(tool_search_amazon, niche, count))
 
 
 @app.get("/api/v1/competitors/{product}")
-async def get_competitors(product: str):
-    return tool_analyze_competitors(product)
+async def get_competitors(product: str, shape: ResponseShape = Depends()):
+    return shape(await run_tool(tool_analyze_competitors, product))
 
 
 @app.get("/api/v1/score/{product}")
-async def get_score(product: str, niche: str = "Home & Kitchen"):
-    return tool_score_opportunity(product, niche)
+async def get_score(product: str, niche: str = "Home & Kitchen", shape: ResponseShape = Depends()):
+    return shape(await run_tool(tool_score_opportunity, product, niche))
+
+
+@app.post("/api/v1/score/batch")
+async def score_batch(request: BatchScoreRequest, shape: ResponseShape = Depends()):
+    if any(p.price <= 0 for p in request.products):
+        raise HTTPException(status_code=400, detail="Product prices must be positive.")
+    return shape(await run_tool(tool_score_batch, [p.model_dump() for p in request.products], request.niche, request.top_k))
+
+
+@app.get("/api/v1/products/search")
+async def search_products(q: str, limit: int = 5):
+    """Catalog products whose titles best match `q`, typos and word order tolerated."""
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+    matches = product_titles.search(q, max(1, min(limit, 50)))
+    return {"query": q, "total_indexed": len(product_titles), "results": [{"similarity": m.similarity, **m.product} for m in matches]}
+
+
+@app.post("/api/v1/scan")
+async def scan_niches(request: ScanRequest, shape: ResponseShape = Depends()):
+    """Global top-N product opportunities across many niches, scored within a time budget."""
+    niches = [n.strip() for n in request.niches or [] if n.strip()]
+    if request.niches is not None and not niches:
+        raise HTTPException(status_code=400, detail="Provide at least one niche, or omit `niches` to scan the catalog.")
+    if len(niches) > SCAN_MAX_NICHES:
+        raise HTTPException(status_code=400, detail=f"At most {SCAN_MAX_NICHES} niches per scan.")
+    if not 1 <= request.top_n <= 500 or request.budget_seconds <= 0:
+        raise HTTPException(status_code=400, detail="top_n must be 1-500 and budget_seconds positive.")
+    return shape(await run_tool(tool_scan_niches, niches or None, request.top_n, request.budget_seconds))
 
 
 @app.get("/api/v1/report/{niche}")
-async def get_report(niche: str):
-    return tool_generate_report(niche)
+async def get_report(niche: str, shape: ResponseShape = Depends()):
+    return shape(await run_tool(tool_generate_report, niche))
+
+
+@app.get("/api/v1/report/{niche}/stream")
+async def stream_report(niche: str):
+    """The report as Server-Sent Events: a `product` event per product as soon as
+    it is scored, then the full `report`."""
+    return StreamingResponse((sse_event(kind, data) for kind, data in report_events(niche)), media_type="text/event-stream", headers=SSE_HEADERS)
 
 
 @app.get("/api/v1/sales/summary")
-async def get_sales_summary(months: int = 3):
-    return tool_get_sales_summary(months)
+async def get_sales_summary(months: int = 3, group_by: str = "product", shape: ResponseShape = Depends()):
+    if group_by not in ("product", "cluster"):
+        raise HTTPException(status_code=400, detail="group_by must be 'product' or 'cluster'.")
+    return shape(await run_tool(tool_get_sales_summary, months, group_by))
+
+
+@app.get("/api/v1/sales/clusters")
+async def get_product_clusters(min_size: int = 2):
+    """Groups of near-duplicate product names in the sales history, largest first."""
+    await run_in_threadpool(product_clusters.sync, sales_data)
+    clusters = product_clusters.clusters(max(1, min_size))
+    return {"total_names": len(product_clusters), "total_clusters": len(clusters), "clusters": clusters}
 
 
 @app.post("/api/v1/sales/upload")
 async def upload_sales(file: UploadFile = File(...)):
     if not file.filename.lower().endswith(".csv"):
         raise HTTPException(status_code=400, detail="Only CSV files are supported")
-    content = await file.read()
-    text = content.decode("utf-8", errors="ignore")
-    parsed = parse_sales_csv(text, file.filename)
-    if not parsed:
+    stats = await run_in_threadpool(ingest_sales_file, file.file, file.filename)
+    if not stats["records"]:
         raise HTTPException(status_code=400, detail="Could not parse CSV. Ensure it has Date and Revenue columns.")
-    sales_data.extend(parsed)
-    sales_data.sort(key=lambda x: x["date"])
     file_id = f"sales-{uuid.uuid4().hex[:8]}"
-    uploaded_files.append({"id": file_id, "filename": file.filename, "upload_time": time.strftime("%Y-%m-%d %H:%M:%S"), "records_parsed": len(parsed), "size_bytes": len(content)})
-    analytics["files_uploaded"] += 1
-    total_rev = sum(r["revenue"] for r in parsed)
-    total_profit = sum(r["profit"] for r in parsed)
+    record = {"id": file_id, "filename": file.filename, "upload_time": time.strftime("%Y-%m-%d %H:%M:%S"), "records_parsed": stats["records"], "size_bytes": stats["size_bytes"]}
+    await run_in_threadpool(storage.add_upload, record)
+    await run_in_threadpool(count_analytics, {"files_uploaded": 1})
     return {
-        "success": True, "file": {"id": file_id, "filename": file.filename, "records_parsed": len(parsed)},
-        "quick_summary": {"total_revenue": round(total_rev, 2), "total_profit": round(total_profit, 2), "date_range": f"{parsed[0]['date']} to {parsed[-1]['date']}" if parsed else "N/A"},
-        "message": f"Parsed {len(parsed)} sales records from '{file.filename}'.",
+        "success": True, "file": {"id": file_id, "filename": file.filename, "records_parsed": stats["records"]},
+        "quick_summary": {"total_revenue": round(stats["total_revenue"], 2), "total_profit": round(stats["total_profit"], 2), "date_range": f"{_day_string(stats['first_day'])} to {_day_string(stats['last_day'])}"},
+        "message": f"Parsed {stats['records']} sales records from '{file.filename}'.",
     }
 
 
 @app.get("/api/v1/sales/files")
 async def list_uploaded_files():
+    await run_in_threadpool(sync_shared_state)
     return {"total": len(uploaded_files), "files": uploaded_files}
 
 
 @app.get("/api/v1/research/history")
-async def get_research_history():
-    return {"total": len(product_research), "records": sorted(product_research, key=lambda x: x["date_researched"], reverse=True)}
+async def get_research_history(niche: Optional[str] = None, outcome: Optional[str] = None, after: Optional[str] = None,
+                               limit: int = RESEARCH_PAGE_SIZE, shape: ResponseShape = Depends()):
+    """Past research, newest first, optionally filtered by niche and/or outcome; page with `after=<next_cursor>`."""
+    await run_in_threadpool(sync_shared_state)
+    try:
+        page = await run_in_threadpool(research_history.page, niche, outcome, after, max(1, min(limit, 500)))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return shape(page)
 
 
 @app.get("/api/v1/niches")
@@ -898,15 +3752,55 @@ async def get_niches():
 
 @app.get("/api/v1/analytics")
 async def get_analytics():
+    await run_in_threadpool(sync_shared_state)
+    analytics, sessions, performance, sales_records = await run_in_threadpool(
+        lambda: (analytics_snapshot(), chat_sessions.stats(), metrics_report(), len(sales_data)))
     total_fb = analytics["feedback_positive"] + analytics["feedback_negative"]
     return {
         **analytics,
         "satisfaction_rate": round(analytics["feedback_positive"] / total_fb * 100, 1) if total_fb > 0 else 0,
-        "active_sessions": len(chat_sessions), "knowledge_chunks": len(knowledge_chunks),
-        "sales_records": len(sales_data), "research_records": len(product_research),
+        "active_sessions": sessions["count"], "sessions": sessions, "knowledge_chunks": len(knowledge_chunks),
+        "sales_records": sales_records, "research_records": len(product_research),
+        "tool_cache": tool_cache.stats(), **performance,
     }
 
 
+@app.get("/api/v1/admin/profile")
+async def profile_worker(seconds: float = 5, interval_ms: float = 10, format: str = "json", idle: bool = False, top: int = 30,
+                         x_admin_token: Optional[str] = Header(None)):
+    """Sample this worker's stacks for `seconds` (admin only; one profile per worker at a time).
+
+    `format=collapsed` returns flamegraph text (`frame;frame;frame count`
+    lines), otherwise JSON with a top-functions table as well. With several
+    workers, only the one serving the request is profiled.
+    """
+    require_admin(x_admin_token)
+    seconds, interval = min(max(seconds, 0.1), PROFILE_MAX_SECONDS), max(interval_ms, 1) / 1000
+    if not _profile_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A profile is already running in this worker")
+    try:
+        stacks = await run_in_threadpool(sample_stacks, seconds, interval)
+    finally:
+        _profile_lock.release()
+    report = profile_report(stacks, idle, top)
+    if format == "collapsed":
+        return PlainTextResponse("\n".join(report["collapsed"]) + "\n")
+    return {"pid": os.getpid(), "seconds": seconds, "interval_ms": interval * 1000, "idle_included": idle, **report}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus scrape endpoint: stage, tool and route latency histograms, summary scan sizes, CSV parse counters."""
+    return PlainTextResponse(await run_in_threadpool(prometheus_text), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True, log_level="info")
+    workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+    if workers > 1:
+        # Production mode: worker processes share state through the SQLite database.
+        if STORAGE_BACKEND != "sqlite":
+            raise SystemExit(f"WEB_CONCURRENCY={workers} needs STORAGE_BACKEND=sqlite; {STORAGE_BACKEND} state is per process.")
+        uvicorn.run("main:app", host="0.0.0.0", port=port, workers=workers, log_level="info")
+    else:
+        uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True, log_level="info")
@@ -0,0 +1,51 @@
+import importlib.util
+import itertools
+import os
+import sys
+
+import pytest
+
+# Tests run against the process-local store; nothing is written to backend/data.
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+_copies = itertools.count()
+
+
+@pytest.fixture(scope="session")
+def client():
+    import main
+    from fastapi.testclient import TestClient
+    with TestClient(main.app) as c:  # runs startup: knowledge base, sample sales and research
+        yield c
+
+
+@pytest.fixture
+def fresh_main(tmp_path, monkeypatch):
+    """Returns a loader for fresh copies of main, `load("sqlite")` or `load("memory")`.
+
+    Every call imports a new copy with its own stores. SQLite copies share a
+    temp DATABASE_PATH, so a second one opens the database the way another
+    or a restarted worker would.
+    """
+    monkeypatch.setenv("DATABASE_PATH", str(tmp_path / "researcher.db"))
+
+    def load(backend: str = "sqlite"):
+        monkeypatch.setenv("STORAGE_BACKEND", backend)
+        name = f"main_fresh_{next(_copies)}"
+        spec = importlib.util.spec_from_file_location(name, os.path.join(BACKEND, "main.py"))
+        module = sys.modules[name] = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    yield load
+    for name in [n for n in sys.modules if n.startswith("main_fresh_")]:
+        del sys.modules[name]
+
+
+@pytest.fixture
+def sqlite_client(fresh_main):
+    """A TestClient on a fresh SQLite-backed app, seeded by its startup; yields (main copy, client)."""
+    from fastapi.testclient import TestClient
+    module = fresh_main()
+    with TestClient(module.app) as c:
+        yield module, c
@@ -0,0 +1,56 @@
+import threading
+
+import pytest
+
+import main
+
+PROFILE = "/api/v1/admin/profile"
+
+
+def spin(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+@pytest.fixture
+def busy():
+    stop = threading.Event()
+    thread = threading.Thread(target=spin, args=(stop,))
+    thread.start()
+    yield
+    stop.set()
+    thread.join()
+
+
+def test_profile_is_hidden_without_admin_token(client, monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "")
+    assert client.get(PROFILE, params={"seconds": 0.1}).status_code == 404
+    assert client.get(PROFILE, params={"seconds": 0.1}, headers={"X-Admin-Token": ""}).status_code == 404
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Admin-Token": "wrong"}, {"X-Admin-Token": "s3cret-but-longer"}])
+def test_profile_rejects_a_wrong_token(client, monkeypatch, headers):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "s3cret")
+    response = client.get(PROFILE, params={"seconds": 0.1}, headers=headers)
+    assert response.status_code == 403 and response.json()["detail"] == "Invalid admin token"
+
+
+def test_profile_json_with_the_right_token(client, monkeypatch, busy):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "s3cret")
+    body = client.get(PROFILE, params={"seconds": 0.3, "interval_ms": 5}, headers={"X-Admin-Token": "s3cret"}).json()
+    assert body["seconds"] == 0.3 and body["interval_ms"] == 5 and body["samples"] > 0
+    assert "test_admin.py:spin" in {f["function"] for f in body["top_functions"]}
+
+
+def test_profile_collapsed_lines(client, monkeypatch, busy):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "s3cret")
+    response = client.get(PROFILE, params={"seconds": 0.3, "interval_ms": 5, "format": "collapsed"}, headers={"X-Admin-Token": "s3cret"})
+    assert response.status_code == 200 and response.headers["content-type"].startswith("text/plain")
+    lines = response.text.splitlines()
+    assert lines
+    stacks = []
+    for line in lines:
+        stack, _, count = line.rpartition(" ")  # `frame;frame;frame count`
+        assert stack and int(count) > 0
+        stacks.append(stack.split(";"))
+    assert any(frames[-1] == "test_admin.py:spin" and "threading.py:Thread.run" in frames for frames in stacks)
@@ -0,0 +1,52 @@
+from datetime import date, timedelta
+
+import main
+
+VARIANTS = {
+    "Cast Iron Skillet Set": ["Cast Iron Skillet Set (Set of 3)", "cast iron skillet-set", "Set Cast Iron Skillet"],
+    "Stainless Steel Water Bottle 32oz": ["Stainless Steel Water Bottle, 32 oz"],
+}
+LONERS = ["Garlic Press", "Garlic Press 2 Pack Stainless", "Yoga Block", "Dog Chew Toy"]
+
+
+def names():
+    return [n for name, variants in VARIANTS.items() for n in (name, *variants)] + LONERS
+
+
+def as_sets(clusters):
+    return {c["cluster"]: set(c["names"]) for c in clusters}
+
+
+def test_near_duplicates_cluster_independent_of_order():
+    expected = {name: {name, *variants} for name, variants in VARIANTS.items()}
+    for order in (names(), names()[::-1]):
+        clusters = main.ProductClusters()
+        assert clusters.add(order + order[:3]) == len(order)
+        assert as_sets(clusters.clusters()) == expected
+        assert len(clusters.clusters(1)) == len(expected) + len(LONERS)
+        assert clusters.cluster_of("cast iron skillet-set") == "Cast Iron Skillet Set"
+        assert clusters.cluster_of("Unseen Product") == "Unseen Product"
+
+
+def test_clusters_endpoint_and_cluster_summary(client):
+    day = (date.today() - timedelta(days=3)).isoformat()
+    # None of these look like the sample sales names, and the prefix keeps them apart from any other test's.
+    rows = [f'{day},"Zephyr {name}",{100 + i}.00,40.00,1,Kitchen,Store Z' for i, name in enumerate(names())]
+    csv = ("Order Date,Product Name,Revenue,Cost,Quantity,Category,Store\n" + "\n".join(rows) + "\n").encode()
+    assert client.post("/api/v1/sales/upload", files={"file": ("variants.csv", csv, "text/csv")}).status_code == 200
+
+    body = client.get("/api/v1/sales/clusters").json()
+    assert body["total_clusters"] == len(body["clusters"])
+    found = {c["cluster"]: set(c["names"]) for c in body["clusters"] if c["cluster"].startswith("Zephyr ")}
+    assert found == {f"Zephyr {name}": {f"Zephyr {n}" for n in (name, *variants)} for name, variants in VARIANTS.items()}
+    sizes = [len(c["names"]) for c in body["clusters"]]
+    assert sizes == sorted(sizes, reverse=True)
+
+    summary = client.get("/api/v1/sales/summary", params={"months": 1, "group_by": "cluster"}).json()
+    skillet = next(p for p in summary["top_products"] if p["name"] == "Zephyr Cast Iron Skillet Set")
+    assert sorted(skillet["variants"]) == sorted(f"Zephyr {n}" for n in ("Cast Iron Skillet Set", *VARIANTS["Cast Iron Skillet Set"]))
+    assert skillet["revenue"] == 100 + 101 + 102 + 103
+
+
+def test_summary_rejects_unknown_group_by(client):
+    assert client.get("/api/v1/sales/summary", params={"group_by": "store"}).status_code == 400
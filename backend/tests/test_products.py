@@ -0,0 +1,42 @@
+import main
+
+
+def catalog_product(niche: str) -> dict:
+    return next(p for p in main.product_titles.products if p["niche"] == niche)
+
+
+def test_product_search_tolerates_typos_and_word_order(client):
+    title = catalog_product("Pet Supplies")["title"]
+    words = main.TitleIndex.normalize(title).split()
+    typo = " ".join(reversed(words))[:-1]  # reordered, last letter dropped
+    body = client.get("/api/v1/products/search", params={"q": typo, "limit": 3}).json()
+    assert body["total_indexed"] == len(main.product_titles)
+    assert body["results"][0]["title"] == title
+    assert len(body["results"]) <= 3
+    assert [r["similarity"] for r in body["results"]] == sorted((r["similarity"] for r in body["results"]), reverse=True)
+
+
+def test_product_search_rejects_an_empty_query(client):
+    assert client.get("/api/v1/products/search", params={"q": "  "}).status_code == 400
+
+
+def test_search_filter_keeps_only_accepted_products():
+    title = catalog_product("Pet Supplies")["title"]
+    matches = main.product_titles.search(title, 10, where=lambda p: p["niche"] != "Pet Supplies")
+    assert all(m.product["niche"] != "Pet Supplies" for m in matches)
+    assert title not in [m.title for m in matches]
+
+
+def test_score_matches_within_the_requested_niche(client):
+    product = catalog_product("Pet Supplies")
+    body = client.get(f"/api/v1/score/{product['title']}", params={"niche": "Pet Supplies"}).json()
+    assert body["matched_product"]["asin"] == product["asin"] and body["other_niche_matches"] == []
+    assert all(c["niche"] == "Pet Supplies" for c in body["candidates"])
+
+
+def test_score_reports_a_match_from_another_niche(client):
+    product = next(p for p in main.product_titles.products if p["niche"] == "Pet Supplies"
+                   and not main.product_titles.search(p["title"], 1, where=lambda q: q["niche"] == "Home & Kitchen"))
+    body = client.get(f"/api/v1/score/{product['title']}", params={"niche": "Home & Kitchen"}).json()
+    assert body["niche"] == "Home & Kitchen" and body["matched_product"] is None
+    assert body["other_niche_matches"][0]["asin"] == product["asin"]
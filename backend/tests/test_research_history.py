@@ -0,0 +1,64 @@
+import pytest
+
+import main
+
+
+def newest_first(records):
+    return sorted(records, key=lambda r: r["date_researched"], reverse=True)  # stable: same-day records keep arrival order
+
+
+def walk(client, **params):
+    pages, after = [], None
+    while True:
+        body = client.get("/api/v1/research/history", params={**params, **({"after": after} if after else {})}).json()
+        pages.append(body)
+        after = body["next_cursor"]
+        if after is None:
+            return pages
+
+
+def test_cursor_pages_cover_history_newest_first(client):
+    pages = walk(client, limit=3)
+    records = [r for p in pages for r in p["records"]]
+    assert records == newest_first(main.product_research)
+    assert all(len(p["records"]) == 3 for p in pages[:-1]) and pages[0]["total"] == len(records)
+
+
+def test_filtered_pages_match_case_insensitively(client):
+    niche, outcome = main.product_research[0]["niche"], main.product_research[0]["outcome"]
+    pages = walk(client, niche=niche.upper(), outcome=outcome.lower(), limit=1)
+    expected = newest_first([r for r in main.product_research if r["niche"] == niche and r["outcome"] == outcome])
+    assert [r for p in pages for r in p["records"]] == expected
+    assert len(pages) == len(expected) > 1 and pages[0]["outcomes"][outcome] == len(expected)
+
+
+@pytest.mark.parametrize("cursor", ["garbage", "2024-01-01~", "2024-01-01~-3", "2024-01-01~x"])
+def test_bad_cursor_is_a_400(client, cursor):
+    response = client.get("/api/v1/research/history", params={"after": cursor})
+    assert response.status_code == 400 and "Invalid cursor" in response.json()["detail"]
+
+
+def test_same_day_records_keep_arrival_order():
+    history = main.ResearchHistory()
+    history.add({"date_researched": d, "niche": "N", "outcome": "Launched", "n": i} for i, d in enumerate(["2024-02-01", "2024-03-01", "2024-02-01", "2024-02-01"]))
+    first = history.page(limit=2)
+    rest = history.page(after=first["next_cursor"], limit=2)
+    assert [r["n"] for r in first["records"] + rest["records"]] == [1, 0, 2, 3]
+    assert rest["next_cursor"] is None
+
+
+def test_sqlite_history_filters_and_pages_records_from_other_workers(sqlite_client, fresh_main):
+    module, sqlite = sqlite_client
+    other = fresh_main()  # a second worker on the same database
+    added = [{"id": f"r{i}", "date_researched": f"2024-0{1 + i % 3}-1{i % 5}", "product_name": f"Added {i}",
+              "niche": "Home & Kitchen" if i % 2 else "Pet Supplies", "outcome": "winner" if i % 3 else "failed",
+              "reason": "Added by another worker.", "margin_pct": 20.0, "months_active": 3, "revenue_total": 1000.0} for i in range(12)]
+    other.storage.add_research(added)
+
+    records = [r for p in walk(sqlite, niche="home & kitchen", outcome="WINNER", limit=2) for r in p["records"]]
+    everything = other.storage.poll("research")  # seeded sample plus the added records, as stored
+    assert len(everything) == 10 + len(added)
+    assert records == newest_first([r for r in everything if r["niche"] == "Home & Kitchen" and r["outcome"] == "winner"])
+    assert {"r1", "r5", "r7", "r11"} <= {r["id"] for r in records}
+    response = sqlite.get("/api/v1/research/history", params={"niche": "Home & Kitchen", "after": "2024-01-01~x"})
+    assert response.status_code == 400 and "Invalid cursor" in response.json()["detail"]
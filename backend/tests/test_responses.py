@@ -0,0 +1,49 @@
+import json
+import random
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import main
+
+
+def batch(n: int):
+    rng = random.Random(9)
+    return [{"title": f"Product {i}", "price": round(rng.uniform(5, 300), 2), "seller_count": rng.randint(2, 60),
+             "rating": round(rng.uniform(2.5, 5), 1), "fba_available": rng.random() < 0.7} for i in range(n)]
+
+
+PAYLOADS = {
+    "report": lambda: main.tool_generate_report("Pet Supplies"),
+    "sales summary": lambda: main.tool_get_sales_summary(3),
+    "sales summary by cluster": lambda: main.tool_get_sales_summary(3, "cluster"),
+    "trends": lambda: main.tool_search_trends("Pet Supplies"),
+    "competitors": lambda: main.tool_analyze_competitors("ice maker"),
+    "score": lambda: main.tool_score_opportunity("ice maker"),
+    "score batch": lambda: main.tool_score_batch(batch(200), "Pet Supplies"),
+}
+
+
+@pytest.mark.parametrize("name", PAYLOADS)
+def test_fast_path_matches_jsonable_encoder(client, name):
+    data = PAYLOADS[name]()
+    assert json.loads(main.FastJSONResponse(data).body) == json.loads(JSONResponse(jsonable_encoder(data)).body)
+
+
+def test_fast_path_matches_chat_response_model(client):
+    query = "Generate a research report for Pet Supplies"
+    tool_result = main.tool_generate_report("Pet Supplies")
+    chat = {"session_id": "s", "message": query, **main.generate_response(query, main.retrieve_chunks(query), tool_result, "generate_report"),
+            "category": "product_research", "processing_time": 0.01, "timestamp": "2024-01-01 00:00:00"}
+    legacy = JSONResponse(main.ChatResponse.model_validate(chat).model_dump(mode="json")).body
+    assert json.loads(main.FastJSONResponse(chat).body) == json.loads(legacy)
+
+
+def test_slim_and_fields_shape_the_payload(client):
+    full = client.get("/api/v1/trends/Pet Supplies").json()
+    assert full == json.loads(JSONResponse(jsonable_encoder(main.tool_search_trends("Pet Supplies"))).body)
+    slim = client.get("/api/v1/trends/Pet Supplies", params={"slim": True}).json()
+    assert "interest_over_time" not in slim and slim == main.slim_payload(full)
+    picked = client.get("/api/v1/trends/Pet Supplies", params={"fields": "niche,rising_queries"}).json()
+    assert picked == {"niche": full["niche"], "rising_queries": full["rising_queries"]}
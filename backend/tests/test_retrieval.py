@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+import main
+
+needs_scipy = pytest.mark.skipif(main.sparse is None, reason="the vector engine needs scipy")
+
+QUERIES = ["winning product rising google trends low competition", "amazon ppc acos launch budget",
+           "supplier samples moq certifications", "pricing margin landed cost shipping", "no such words"]
+
+
+def corpus(n: int):
+    words = sorted({w for doc in main.ECOMMERCE_KNOWLEDGE for s in doc["sections"] for w in main.text_to_vector(s["content"])})
+    return [{"id": i, "text": " ".join(words[(i * 7 + k * 13) % len(words)] for k in range(30 + i % 40))} for i in range(n)]
+
+
+def ranked(index):
+    return [[(d["id"], round(score, 9)) for score, d in hits] for hits in index.search_batch(QUERIES, 8)]
+
+
+@needs_scipy
+@pytest.mark.parametrize("mode", ["tfidf", "bm25"])
+def test_appends_rank_like_a_full_build(mode, monkeypatch):
+    monkeypatch.setattr(main, "VECTOR_DELTA_MIN_DOCS", 64)
+    docs = corpus(900)
+    grown, source = main.VectorIndex(lambda c: c["text"], mode), []
+    for step in (1, 40, 1, 200, 3, 655):  # stays in the delta block, then folds it into the base
+        source.extend(docs[len(source):len(source) + step])
+        grown.sync(source)
+        full = main.VectorIndex(lambda c: c["text"], mode)
+        full.sync(list(source))
+        assert ranked(grown) == ranked(full)
+    assert grown.by_term.shape[1] > 0
+
+
+@needs_scipy
+def test_replaced_source_is_reindexed():
+    index = main.VectorIndex(lambda c: c["text"])
+    index.sync(corpus(50))
+    replaced = corpus(80)[40:]
+    index.sync(replaced)
+    assert [d["id"] for d in index.docs] == [d["id"] for d in replaced]
+
+
+def linear_scan(query, docs, text_fn, top_k):
+    """The original retrieval: cosine against every document, stable sort, then the 0.05 cut."""
+    qv = main.text_to_vector(query)
+    scored = sorted(((main.cosine_sim(qv, main.text_to_vector(text_fn(d))), d) for d in docs), key=lambda x: x[0], reverse=True)
+    return [(s, d) for s, d in scored[:top_k] if s > 0.05]
+
+
+@pytest.mark.skipif(main.RAG_ENGINE != "cosine", reason="tfidf and bm25 rank differently by design")
+def test_retrieval_matches_linear_scan_including_ties(client, monkeypatch):
+    research_text = lambda r: f"{r['product_name']} {r['niche']} {r['outcome']} {r['reason']}"
+    # Exact copies under new ids tie with their originals; ties must keep corpus order.
+    chunks = main.knowledge_chunks + [{**c, "id": f"{c['id']}-copy"} for c in main.knowledge_chunks[::2]]
+    research = main.product_research + [{**r, "id": f"{r['id']}-copy"} for r in main.product_research[1::2]]
+    monkeypatch.setattr(main, "knowledge_chunks", chunks)
+    monkeypatch.setattr(main, "product_research", research)
+    monkeypatch.setattr(main, "chunk_index", main.InvertedIndex(lambda c: c["text"]))
+    monkeypatch.setattr(main, "research_index", main.InvertedIndex(research_text))
+
+    rng = random.Random(11)
+    vocab = sorted({w for d in chunks for w in main.text_to_vector(d["text"])} | {w for r in research for w in main.text_to_vector(research_text(r))})
+    queries = QUERIES + [" ".join(rng.choice(vocab) for _ in range(rng.randint(1, 8))) for _ in range(400)]
+    for i, query in enumerate(queries):
+        top_k = 1 + i % 6
+        expected = [{**c, "relevance_score": round(s, 4)} for s, c in linear_scan(query, chunks, lambda c: c["text"], top_k)]
+        assert main.retrieve_chunks(query, top_k) == expected, query
+        assert main.retrieve_research(query, top_k) == [r for _, r in linear_scan(query, research, research_text, top_k)], query
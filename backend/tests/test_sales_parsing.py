@@ -0,0 +1,85 @@
+import io
+import random
+
+import numpy as np
+import pytest
+
+import main
+
+
+def messy_export(n: int, seed: int = 3) -> bytes:
+    """A sales export with the rows the parser must skip or repair mixed in."""
+    rng = random.Random(seed)
+    lines = ["Order Date,Product Name,Revenue,Cost,Quantity,Category,Store"]
+    for i in range(n):
+        day, month = rng.randint(1, 28), rng.randint(1, 12)
+        kind = rng.random()
+        if kind < 0.04:
+            lines.append(f"13/45/2024,Broken Date {i},10,2,1,Misc,Store 1")
+        elif kind < 0.08:
+            lines.append(f"{month:02d}/{day:02d}/2024,Bad Revenue {i},n/a,2,1,Misc,Store 1")
+        elif kind < 0.10:
+            lines.append(f"{month:02d}/{day:02d}/2024,Short Row {i}")
+        elif kind < 0.12:
+            lines.append("")
+        elif kind < 0.16:
+            lines.append(f"2024-{month:02d}-{day:02d},ISO Date {i},{rng.uniform(5, 90):.2f},,,,")
+        else:
+            lines.append(f'{month:02d}/{day:02d}/2024,Product {rng.randrange(40)},"${rng.uniform(5, 2500):,.2f}",'
+                         f'{rng.uniform(1, 40):.2f},{rng.randint(1, 6)},Category {rng.randrange(5)},Store {rng.randrange(3)}')
+    return ("\n".join(lines) + "\n").encode()
+
+
+def rows(batches) -> list:
+    """Parsed batches flattened to row tuples, so batch boundaries don't matter."""
+    out = []
+    for b in batches:
+        text = [np.asarray(b[f][0], dtype=object)[b[f][1]] for f in ("product_name", "category", "store")]
+        out.extend(zip(b["day"].tolist(), b["quantity"].tolist(), b["revenue"].tolist(), b["cost"].tolist(), *(t.tolist() for t in text)))
+    return out
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(main, "SALES_PARSE_WORKERS", 2)
+    monkeypatch.setattr(main, "SALES_CHUNK_BYTES", 4096)  # many ranges from a small file
+    monkeypatch.setattr(main, "_process_pool", None)
+    yield
+    main.get_process_pool().shutdown()
+
+
+def test_parallel_parse_matches_serial(pool):
+    data = messy_export(5000)
+    serial = rows(main.parse_sales_csv(io.TextIOWrapper(io.BytesIO(data), encoding="utf-8", newline=""), "t.csv"))
+    parallel = rows(main.parse_sales_parallel(io.BytesIO(data), "t.csv"))
+    assert parallel == serial
+    assert 4000 < len(serial) < 5000  # rows were both kept and skipped
+
+
+def test_parallel_parse_keeps_quoted_newlines(pool):
+    rng = random.Random(4)
+    lines = ["Order Date,Product Name,Revenue,Cost,Quantity,Category,Store"]
+    for i in range(2000):
+        name = f'"Widget {i}\nDeluxe"' if i % 3 == 0 else f'"Widget ""{i}"" Pro\r\n2-Pack"' if i % 7 == 0 else f"Widget {i}"
+        lines.append(f"03/{rng.randint(1, 28):02d}/2024,{name},{rng.uniform(5, 90):.2f},2,1,Misc,Store 1")
+    data = ("\n".join(lines) + "\n").encode()
+    serial = rows(main.parse_sales_csv(io.TextIOWrapper(io.BytesIO(data), encoding="utf-8", newline=""), "t.csv"))
+    parallel = rows(main.parse_sales_parallel(io.BytesIO(data), "t.csv"))
+    assert len(serial) == 2000
+    assert parallel == serial
+
+
+def test_parallel_ingest_matches_serial(pool, monkeypatch):
+    data = messy_export(5000)
+    stored = []
+    for min_bytes in (len(data) + 1, 0):  # serial, then across the pool
+        monkeypatch.setattr(main, "SALES_PARALLEL_MIN_BYTES", min_bytes)
+        store = main.MemoryStorage().sales
+        monkeypatch.setattr(main, "sales_data", store)
+        stats = main.ingest_sales_file(io.BytesIO(data), "t.csv")
+        stored.append((stats, store.cols))
+    (serial_stats, serial_cols), (parallel_stats, parallel_cols) = stored
+    assert parallel_stats == serial_stats
+    assert serial_cols.keys() == parallel_cols.keys()
+    for field in serial_cols.keys() - {"id"}:  # ids are random
+        assert np.array_equal(serial_cols[field], parallel_cols[field]), field
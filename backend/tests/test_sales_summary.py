@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+HEADER = "Order Date,Product Name,Revenue,Cost,Quantity,Category,Store"
+
+
+def upload(client, name, rows):
+    day = lambda ago: (datetime.now() - timedelta(days=ago)).strftime("%Y-%m-%d")
+    csv = "\n".join([HEADER] + [f"{day(ago)},{product},{revenue:.2f},10.00,1,{category},{store}" for ago, product, revenue, category, store in rows])
+    assert client.post("/api/v1/sales/upload", files={"file": (name, (csv + "\n").encode(), "text/csv")}).status_code == 200
+
+
+# Every "Tie" product totals 90,000, so their order comes from first appearance alone:
+# by date, then arrival. The second file brings older rows, including an earlier first
+# sale of Tie E and a Tie B sale that arrives after Tie C's on the same day although
+# Tie B was seen first.
+RECENT = [(3, "Tie F", 30000, "Cat 2", "Store 2"), (3, "Tie B", 45000, "Cat 1", "Store 1"), (2, "Tie E", 60000, "Cat 2", "Store 1"),
+          (2, "Tie F", 60000, "Cat 1", "Store 2"), (1, "Tie B", 15000, "Cat 2", "Store 1"), (1, "Tie D", 90000, "Cat 1", "Store 2")]
+OLDER = [(20, "Tie C", 90000, "Cat 3", "Store 3"), (20, "Tie B", 30000, "Cat 3", "Store 3"), (25, "Tie E", 30000, "Cat 3", "Store 3"),
+         (20, "Tie A", 45000, "Cat 3", "Store 3"), (9, "Tie A", 45000, "Cat 3", "Store 3")]
+
+
+def baseline_order(rows, months):
+    """The original summary: rows by date (stable), groups in first-seen order, stable sort by revenue."""
+    cutoff = datetime.now() - timedelta(days=months * 30)
+    recent = [r for r in rows if datetime.strptime(r["date"], "%Y-%m-%d") >= cutoff]
+    out = {}
+    for field in ("product_name", "category", "store"):
+        sums = {}
+        for r in recent:
+            sums[r[field]] = sums.get(r[field], 0) + r["revenue"]
+        out[field] = sorted(sums, key=lambda k: sums[k], reverse=True)
+    return out
+
+
+@pytest.mark.parametrize("months", [1, 3, 12, 40])
+def test_memory_and_sqlite_summaries_match_the_baseline(fresh_main, months):
+    memory, sqlite = fresh_main("memory"), fresh_main("sqlite")
+    with TestClient(memory.app) as mem, TestClient(sqlite.app) as sql:
+        for c in (mem, sql):
+            upload(c, "recent.csv", RECENT)
+            upload(c, "older.csv", OLDER)
+        body = mem.get("/api/v1/sales/summary", params={"months": months}).json()
+        assert sql.get("/api/v1/sales/summary", params={"months": months}).json() == body
+    expected = baseline_order(list(memory.sales_data), months)
+    assert [p["name"] for p in body["top_products"]] == expected["product_name"][:10]
+    assert [c["category"] for c in body["categories"]] == expected["category"]
+    assert [s["store"] for s in body["stores"]] == expected["store"]
+    if months == 1:
+        assert [p["name"] for p in body["top_products"]] == ["Tie E", "Tie C", "Tie B", "Tie A", "Tie F", "Tie D"]
@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+import main
+
+
+def ranking(result):
+    return [(r["niche"], r["title"], r["composite_score"]) for r in result["results"]]
+
+
+def test_scan_endpoint_ranks_the_catalog(client):
+    body = client.post("/api/v1/scan", json={"top_n": 5}).json()
+    assert body["niches_requested"] == body["niches_scanned"] == len(main.PRODUCT_NICHES)
+    assert not body["partial"] and [r["rank"] for r in body["results"]] == [1, 2, 3, 4, 5]
+    scores = [r["composite_score"] for r in body["results"]]
+    assert scores == sorted(scores, reverse=True)
+
+
+@pytest.mark.parametrize("payload", [{"niches": [" "]}, {"top_n": 0}, {"budget_seconds": 0}])
+def test_scan_endpoint_rejects_bad_requests(client, payload):
+    assert client.post("/api/v1/scan", json=payload).status_code == 400
+
+
+def test_small_scan_stays_in_process(monkeypatch):
+    monkeypatch.setattr(main, "SCAN_WORKERS", 2)
+    monkeypatch.setattr(main, "_scan_pool", None)
+    main.tool_cache.clear()
+    result = main.tool_scan_niches([f"Small Scan {i}" for i in range(main.SCAN_PROCESS_MIN_NICHES - 1)], 10, 60)
+    assert main._scan_pool is None and not result["partial"]
+    assert main.tool_search_amazon.key("Small Scan 0", 10) in main.tool_cache
+
+
+def test_pool_scan_matches_in_process_and_fills_cache(monkeypatch):
+    names = [f"Pool Scan {i}" for i in range(24)]
+    main.tool_cache.clear()
+    reference = ranking(main.tool_scan_niches(names, 15, 60))
+    monkeypatch.setattr(main, "SCAN_WORKERS", 2)
+    monkeypatch.setattr(main, "SCAN_PROCESS_MIN_NICHES", 1)
+    monkeypatch.setattr(main, "_scan_pool", None)
+    try:
+        while main.get_scan_pool() is None:
+            time.sleep(0.05)
+        main.tool_cache.clear()
+        assert ranking(main.tool_scan_niches(names, 15, 60)) == reference
+        # Entries the workers loaded were adopted: a rescan is scored here, from the cache.
+        assert all(main.tool_search_amazon.key(n, 10) in main.tool_cache for n in names)
+        hits = main.tool_cache.stats()["hits"]
+        assert ranking(main.tool_scan_niches(names, 15, 60)) == reference
+        assert main.tool_cache.stats()["hits"] > hits
+    finally:
+        main._scan_pool.shutdown()
+
+
+def test_scan_budget_returns_partial_results(monkeypatch):
+    monkeypatch.setattr(main, "SCAN_WORKERS", 1)
+    main.tool_cache.clear()
+    result = main.tool_scan_niches([f"Budget Scan {i}" for i in range(50)], 5, 0.02)
+    assert result["partial"] and result["niches_scanned"] < 50
+    assert result["niches_scanned"] + len(result["skipped_niches"]) == 50
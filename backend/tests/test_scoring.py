@@ -0,0 +1,32 @@
+import random
+
+import main
+
+
+def products(n: int, seed: int = 5):
+    rng = random.Random(seed)
+    return [{"title": f"Product {i}", "price": round(rng.uniform(5, 300), 2), "seller_count": rng.randint(1, 80),
+             "rating": round(rng.uniform(1, 5), 1), "fba_available": rng.random() < 0.7} for i in range(n)]
+
+
+def test_batch_scores_match_score_product():
+    rng = random.Random(6)
+    prods = products(500)
+    # Edge prices and ratings hit every branch of the dimension rules.
+    prods += [{"title": f"Edge {i}", "price": price, "seller_count": sellers, "rating": rating, "fba_available": fba}
+              for i, (price, sellers, rating, fba) in enumerate([(0.5, 0, 0, False), (15, 5, 3.5, True), (50, 20, 4.0, True), (1000, 300, 5, False)])]
+    comps = [[{"review_count": rng.randint(0, 8000)} for _ in range(rng.randint(1, 10))] for _ in prods]
+    velocity = [round(rng.uniform(-60, 120), 1) for _ in prods]
+    avg_reviews = [sum(c["review_count"] for c in cl) / len(cl) for cl in comps]
+    loop = [main.score_product(p, {"trend_velocity": v}, cl) for p, v, cl in zip(prods, velocity, comps)]
+    assert main.score_products_batch(prods, velocity, avg_reviews) == loop
+
+
+def test_score_batch_endpoint_ranks_like_score_product(client):
+    prods = products(40)
+    body = client.post("/api/v1/score/batch", json={"niche": "Pet Supplies", "products": prods, "top_k": 10}).json()
+    trends = main.tool_search_trends("Pet Supplies")
+    expected = sorted(({"title": p["title"], **main.score_product(p, trends, main.tool_analyze_competitors(p["title"])["competitors"])} for p in prods),
+                      key=lambda r: r["composite_score"], reverse=True)[:10]
+    assert [{k: v for k, v in r.items() if k != "rank"} for r in body["results"]] == expected
+    assert [r["rank"] for r in body["results"]] == list(range(1, 11))
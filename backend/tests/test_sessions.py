@@ -0,0 +1,44 @@
+import os
+import tempfile
+import uuid
+
+import pytest
+
+import main
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def sessions(request):
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = main.MemoryStorage() if request.param == "memory" else main.SQLiteStorage(os.path.join(tmp, "t.db"))
+        yield storage.open_sessions(5, 3600, 100, 1 << 20)
+
+
+def test_pages_follow_the_cursor_past_trimmed_messages(sessions):
+    sessions.append("s", *({"role": "user", "content": f"m{i}"} for i in range(8)))  # keeps m3..m7
+    page = sessions.page("s", limit=2)
+    assert page["first_index"] == 3 and [m["content"] for m in page["messages"]] == ["m3", "m4"] and page["next_cursor"] == 5
+    page = sessions.page("s", page["next_cursor"], limit=2)
+    assert [m["content"] for m in page["messages"]] == ["m5", "m6"]
+    last = sessions.page("s", page["next_cursor"], limit=2)
+    assert [m["content"] for m in last["messages"]] == ["m7"] and last["next_cursor"] is None
+    # A cursor into trimmed history starts at the oldest kept message.
+    assert [m["content"] for m in sessions.page("s", 0, limit=1)["messages"]] == ["m3"]
+    assert sessions.page("missing") is None
+
+
+def test_chat_history_endpoint_pages_a_conversation(client):
+    session_id = str(uuid.uuid4())
+    for message in ("What is a good FBA margin?", "Show me Pet Supplies trends"):
+        assert client.post("/api/v1/chat", json={"session_id": session_id, "message": message}).status_code == 200
+    contents, cursor = [], None
+    while True:
+        body = client.get(f"/api/v1/chat/{session_id}/history", params={"limit": 1, **({"cursor": cursor} if cursor is not None else {})}).json()
+        contents += [(m["role"], m["content"]) for m in body["messages"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert [c for r, c in contents if r == "user"] == ["What is a good FBA margin?", "Show me Pet Supplies trends"]
+    assert len(contents) == 4
+    assert client.get(f"/api/v1/chat/{uuid.uuid4()}/history").json()["messages"] == []
+    assert client.get(f"/api/v1/chat/{session_id}/history", params={"cursor": "x"}).status_code == 422
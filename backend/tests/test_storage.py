@@ -0,0 +1,50 @@
+import random
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+
+def sales_export(n: int, seed: int = 8) -> bytes:
+    """`n` orders over the last ~400 days, in no particular date order."""
+    rng = random.Random(seed)
+    today = datetime.now()
+    lines = ["Order Date,Product Name,Revenue,Cost,Quantity,Category,Store"]
+    for _ in range(n):
+        day = (today - timedelta(days=rng.randint(1, 400))).strftime("%Y-%m-%d")
+        lines.append(f"{day},Product {rng.randrange(300)},{rng.uniform(5, 900):.2f},{rng.uniform(1, 40):.2f},{rng.randint(1, 6)},"
+                     f"Category {rng.randrange(12)},Store {rng.randrange(4)}")
+    return ("\n".join(lines) + "\n").encode()
+
+
+def summaries(client):
+    return {(months, group_by): client.get("/api/v1/sales/summary", params={"months": months, "group_by": group_by}).json()
+            for months in (1, 3, 7, 40) for group_by in ("product", "cluster")}
+
+
+def test_sqlite_bulk_upload_summaries_and_reopen(fresh_main):
+    data = sales_export(30_000)
+    memory, sqlite = fresh_main("memory"), fresh_main("sqlite")
+    for module in (memory, sqlite):
+        module.SALES_MERGE_ROWS = 4096  # several merge transactions per file
+    with TestClient(memory.app) as mem, TestClient(sqlite.app) as sql:
+        for c in (mem, sql):
+            res = c.post("/api/v1/sales/upload", files={"file": ("bulk.csv", data, "text/csv")})
+            assert res.status_code == 200 and res.json()["file"]["records_parsed"] == 30_000
+        seeded = len(memory.generate_sample_sales())
+        assert sql.get("/api/v1/health").json()["sales_records"] == seeded + 30_000
+        # Summaries are pushed down to SQL group-bys over the rollup tables; they must match the in-memory store.
+        expected = summaries(mem)
+        assert summaries(sql) == expected
+        c_sql = sql.post("/api/v1/chat", json={"message": "How are our sales performing?", "session_id": "persist-me"})
+        assert c_sql.status_code == 200
+
+    reopened = fresh_main("sqlite")  # a restarted worker: nothing but the database file carries over
+    with TestClient(reopened.app) as again:
+        assert len(reopened.sales_data) == seeded + 30_000  # startup saw a non-empty store and did not reseed
+        assert summaries(again) == expected
+        files = again.get("/api/v1/sales/files").json()
+        assert [f["filename"] for f in files["files"]] == ["bulk.csv"]
+        assert again.get("/api/v1/research/history").json()["total"] == len(reopened.generate_sample_research())
+        history = again.get("/api/v1/chat/persist-me/history").json()["messages"]
+        assert [m["role"] for m in history] == ["user", "assistant"]
+        assert again.get("/api/v1/analytics").json()["files_uploaded"] == 1
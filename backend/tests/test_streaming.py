@@ -0,0 +1,78 @@
+import json
+import re
+
+import pytest
+
+import main
+
+
+def events(response):
+    assert response.status_code == 200 and response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["cache-control"] == "no-cache"
+    out = []
+    for block in response.text.split("\n\n"):
+        if block:
+            kind, data = block.split("\n")
+            out.append((kind.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return out
+
+
+def drop_times(data: dict) -> dict:
+    """Without the fields that differ between any two runs: times and random report ids."""
+    return {k: v for k, v in data.items() if k not in ("timestamp", "processing_time", "generated_at", "report_id")}
+
+
+def drop_report_id(text: str) -> str:
+    return re.sub(r"RPT-[0-9A-F]{8} \| [0-9-]+ [0-9:]+", "RPT", text)
+
+
+@pytest.mark.parametrize("message", ["Generate a research report for Pet Supplies", "What is a good FBA profit margin?", "Analyze competitors for ice maker"])
+def test_chat_stream_matches_the_chat_answer(client, message):
+    streamed = events(client.post("/api/v1/chat/stream", json={"message": message}))
+    kinds = [kind for kind, _ in streamed]
+    assert kinds[:2] == ["meta", "citations"] and kinds[-1] == "done" and set(kinds[2:-1]) == {"section"}
+    plain = client.post("/api/v1/chat", json={"message": message}).json()
+    meta, citations, done = streamed[0][1], streamed[1][1], streamed[-1][1]
+    assert (meta["message"], meta["category"], meta["tool_used"]) == (plain["message"], plain["category"], plain["tool_used"])
+    assert citations == plain["citations"]
+    sections = [data for kind, data in streamed if kind == "section"]
+    assert [s["index"] for s in sections] == list(range(len(sections)))
+    assert drop_report_id("\n".join(s["markdown"] for s in sections)) == drop_report_id(plain["answer"])
+    assert drop_times(done["tool_result"] or {}) == drop_times(plain["tool_result"] or {})
+    # The streamed turn is kept in the session like a plain one.
+    history = client.get(f"/api/v1/chat/{meta['session_id']}/history").json()["messages"]
+    assert [m["content"] for m in history] == [message, "\n".join(s["markdown"] for s in sections)]
+
+
+def test_chat_stream_rejects_an_empty_message(client):
+    assert client.post("/api/v1/chat/stream", json={"message": "  "}).status_code == 400
+
+
+def test_report_stream_sends_each_product_then_the_report(client):
+    streamed = events(client.get("/api/v1/report/Pet Supplies/stream"))
+    assert [kind for kind, _ in streamed] == ["product"] * 8 + ["report"]
+    report = streamed[-1][1]
+    assert drop_times(report) == drop_times(client.get("/api/v1/report/Pet Supplies").json())
+    scored = {p["asin"]: p["composite_score"] for _, p in streamed[:-1]}
+    top = report["top_products"]
+    assert len(scored) == 8 and all(scored[p["asin"]] == p["composite_score"] for p in top)
+    assert [p["composite_score"] for p in top] == sorted(scored.values(), reverse=True)[:len(top)]
+
+
+def test_chat_stream_failure_ends_with_an_error_event(client, monkeypatch):
+    def broken_sections(*args, **kwargs):
+        yield "## First section"
+        raise RuntimeError("template bug")
+    monkeypatch.setattr(main, "response_sections", broken_sections)
+    streamed = events(client.post("/api/v1/chat/stream", json={"message": "What is a good FBA profit margin?"}))
+    assert [kind for kind, _ in streamed] == ["meta", "citations", "section", "error"]
+    assert streamed[-1][1] == {"detail": "The answer could not be completed."}
+
+
+def test_chat_stream_tool_failure_ends_with_an_error_event(client, monkeypatch):
+    def broken_tool(*args):
+        raise RuntimeError("upstream down")
+    monkeypatch.setitem(main.AGENT_TOOLS["search_trends"], "fn", broken_tool)
+    streamed = events(client.post("/api/v1/chat/stream", json={"message": "What's trending in Home & Kitchen?"}))
+    assert streamed[0][1]["tool_used"] == "search_trends"
+    assert [kind for kind, _ in streamed] == ["meta", "citations", "error"]
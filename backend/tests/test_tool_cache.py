@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+
+import main
+
+
+class Loader:
+    """Counts calls; each call blocks until `release` is set, then returns a fresh object or raises."""
+
+    def __init__(self, fail_first: bool = False):
+        self.calls = 0
+        self.release = threading.Event()
+        self.fail_first = fail_first
+
+    def __call__(self):
+        self.calls += 1
+        self.release.wait(10)
+        if self.fail_first and self.calls == 1:
+            raise RuntimeError("upstream down")
+        return {"call": self.calls}
+
+
+def hammer(cache, loader, n):
+    """`n` threads miss on one key together; returns their results (or exceptions) once all are done."""
+    results = [None] * n
+
+    def call(i):
+        try:
+            results[i] = cache.get_or_load(("tool", "k"), 60, loader)
+        except RuntimeError as e:
+            results[i] = e
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    deadline = time.monotonic() + 10
+    while cache.stats()["coalesced"] < n - 1 and time.monotonic() < deadline:  # everyone but the loader is waiting
+        time.sleep(0.001)
+    loader.release.set()
+    for t in threads:
+        t.join(10)
+    return results
+
+
+def test_concurrent_misses_load_once():
+    cache, loader = main.ToolCache(8), Loader()
+    results = hammer(cache, loader, 8)
+    assert loader.calls == 1
+    assert all(r is results[0] for r in results)
+    stats = cache.stats()
+    assert (stats["misses"], stats["coalesced"], stats["hits"]) == (1, 7, 7)  # waiters wake to a hit
+    assert cache.get_or_load(("tool", "k"), 60, loader) is results[0] and loader.calls == 1
+
+
+def test_failed_load_is_not_cached_and_waiters_retry():
+    cache, loader = main.ToolCache(8), Loader(fail_first=True)
+    results = hammer(cache, loader, 5)
+    errors = [r for r in results if isinstance(r, RuntimeError)]
+    values = [r for r in results if not isinstance(r, RuntimeError)]
+    assert len(errors) == 1 and loader.calls == 2  # one waiter took over the load
+    assert len(values) == 4 and all(v is values[0] for v in values) and values[0] == {"call": 2}
+    assert ("tool", "k") in cache
+
+
+def test_entries_expire_after_their_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(main.time, "monotonic", lambda: now[0])
+    cache, loads = main.ToolCache(8), []
+    load = lambda: loads.append(1) or len(loads)
+    assert cache.get_or_load(("tool", "k"), 30, load) == 1
+    now[0] += 29.9
+    assert cache.get_or_load(("tool", "k"), 30, load) == 1
+    now[0] += 0.1
+    assert ("tool", "k") not in cache
+    assert cache.get_or_load(("tool", "k"), 30, load) == 2
+    assert cache.stats()["expirations"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = main.ToolCache(2)
+    for key in ("a", "b"):
+        cache.get_or_load(("tool", key), 60, lambda: key)
+    cache.get_or_load(("tool", "a"), 60, lambda: pytest.fail("a is cached"))  # a is now the most recent
+    cache.get_or_load(("tool", "c"), 60, lambda: "c")
+    assert [("tool", k) in cache for k in "abc"] == [True, False, True]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cached_tool_shares_entries_across_call_styles():
+    key = main.tool_search_trends.key
+    assert key("Pet Supplies") == key(niche="Pet Supplies") == ("search_trends", "Pet Supplies")
+    assert key() == ("search_trends", "Home & Kitchen")
+    assert main.tool_search_trends(niche="Pet Supplies") is main.tool_search_trends("Pet Supplies")
@@ -0,0 +1,67 @@
+import re
+from datetime import datetime, timedelta
+
+import pytest
+
+import main
+
+
+def python_stats(niche: str, days: int, window: int):
+    values = [float(v) for v in main.mock_trend_series(niche, days).values]
+    first, last = sum(values[:window]) / window, sum(values[-window:]) / window
+    mid = (days - 1) / 2
+    slope = sum((x - mid) * v for x, v in enumerate(values)) / sum((x - mid) ** 2 for x in range(days))
+    return (last - first) / max(first, 1) * 100, slope, last, values
+
+
+def test_compare_matches_python_statistics(client):
+    niches = ["Pet Supplies", "Home & Kitchen", "Fitness Equipment"]
+    res = client.post("/api/v1/trends/compare", json={"niches": niches, "days": 200, "window": 14, "points": 30})
+    assert res.status_code == 200
+    body = res.json()
+    assert (body["days"], body["window"], body["step_days"], body["points"]) == (200, 14, 7, 28)
+    assert [n["niche"] for n in body["niches"]] == niches
+    for row in body["niches"]:
+        velocity, slope, rolling, values = python_stats(row["niche"], 200, 14)
+        assert row["trend_velocity"] == pytest.approx(velocity, abs=0.051)
+        assert row["slope_per_day"] == pytest.approx(slope, abs=0.0006)
+        assert row["rolling_avg"] == pytest.approx(rolling, abs=0.051)
+        assert row["current_interest"] == int(values[-1])
+        assert len(row["series"]) == len(row["rolling"]) == 28
+        # Buckets are aligned to the last day; the 4 oldest days don't fill one.
+        assert row["series"][-1] == pytest.approx(sum(values[-7:]) / 7, abs=0.051)
+        assert row["series"][0] == pytest.approx(sum(values[4:11]) / 7, abs=0.051)
+
+
+def test_compare_numbers_are_short_decimals(client):
+    text = client.post("/api/v1/trends/compare", json={"days": 365}).text
+    decimals = [len(d) for d in re.findall(r"\d\.(\d+)", text)]
+    assert decimals and max(decimals) <= 3
+
+
+@pytest.mark.parametrize("payload", [
+    {"niches": [" ", ""]},
+    {"niches": [f"Niche {i}" for i in range(main.TREND_COMPARE_MAX_NICHES + 1)]},
+    {"days": 1},
+    {"days": main.TREND_COMPARE_MAX_DAYS + 1},
+    {"days": 30, "window": 31},
+    {"days": 30, "points": 0},
+])
+def test_compare_rejects_bad_input(client, payload):
+    assert client.post("/api/v1/trends/compare", json=payload).status_code == 400
+
+
+def test_compare_dates_move_past_midnight_despite_the_cache(monkeypatch):
+    clock = [datetime(2026, 3, 9, 23, 50)]
+
+    class Clock(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return clock[0]
+    monkeypatch.setattr(main, "datetime", Clock)
+    before = main.tool_compare_trends(["Pet Supplies"], days=30, window=7, points=30)
+    clock[0] += timedelta(minutes=20)
+    after = main.tool_compare_trends(["Pet Supplies"], days=30, window=7, points=30)
+    assert (before["series_start"], before["end"]) == ("2026-02-07", "2026-03-08")
+    assert (after["series_start"], after["end"]) == ("2026-02-08", "2026-03-09")
+    assert after["niches"][0]["series"] == before["niches"][0]["series"]  # same mock values, one day later
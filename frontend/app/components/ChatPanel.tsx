@@ -3,7 +3,7 @@
 import { useState, useRef, useEffect } from "react";
 import { Send, Bot, User, Clock, Wrench, BookOpen, ThumbsUp, ThumbsDown } from "lucide-react";
 import ReactMarkdown from "react-markdown";
-import { API, ChatMessage, Citation } from "../config/api";
+import { API, ChatMessage, ChatStreamEvent, Citation, readEvents } from "../config/api";
 
 export default function ChatPanel() {
   const [messages, setMessages] = useState<ChatMessage[]>([]);
@@ -28,37 +28,49 @@ export default function ChatPanel() {
     setMessages((prev) => [...prev, userMessage]);
     setInput("");
     setLoading(true);
+    let started = false;
+    let finished = false;
 
     try {
-      const res = await fetch(API.chat, {
+      const res = await fetch(API.chatStream, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ message: userMessage.content, session_id: sessionId }),
       });
 
-      if (!res.ok) {
+      if (!res.ok || !res.body) {
         throw new Error("Failed to get response");
       }
 
-      const data = await res.json();
-      if (!sessionId) setSessionId(data.session_id);
-
-      const assistantMessage: ChatMessage = {
-        role: "assistant",
-        content: data.answer,
-        citations: data.citations,
-        category: data.category,
-        tool_used: data.tool_used,
-        tool_result: data.tool_result,
-        processing_time: data.processing_time,
-        timestamp: data.timestamp,
-      };
-
-      setMessages((prev) => [...prev, assistantMessage]);
+      // The answer arrives as events: fill in one assistant message as they come.
+      // Without a final `done` (an `error` event, or the connection dropping) the answer is incomplete.
+      const updateAssistant = (patch: (msg: ChatMessage) => ChatMessage) =>
+        setMessages((prev) => [...prev.slice(0, -1), patch(prev[prev.length - 1])]);
+
+      await readEvents<ChatStreamEvent>(res, (e) => {
+        if (e.event === "meta") {
+          started = true;
+          if (!sessionId) setSessionId(e.data.session_id);
+          setMessages((prev) => [...prev, { role: "assistant", content: "", category: e.data.category, tool_used: e.data.tool_used }]);
+        } else if (e.event === "citations") {
+          updateAssistant((msg) => ({ ...msg, citations: e.data }));
+        } else if (e.event === "section") {
+          updateAssistant((msg) => ({ ...msg, content: msg.content ? `${msg.content}\n${e.data.markdown}` : e.data.markdown }));
+        } else if (e.event === "done") {
+          finished = true;
+          updateAssistant((msg) => ({ ...msg, ...e.data }));
+        } else if (e.event === "error") {
+          throw new Error(e.data.detail);
+        }
+      });
+      if (!finished) throw new Error("The response ended early");
     } catch {
+      // Replace a half-filled answer rather than leaving it above the error.
       setMessages((prev) => [
-        ...prev,
-        { role: "assistant", content: "Sorry, I couldn't connect to the backend. Make sure the API server is running on port 8000." },
+        ...(started ? prev.slice(0, -1) : prev),
+        started
+          ? { role: "assistant", content: "Sorry, the answer was interrupted before it finished. Please try again." }
+          : { role: "assistant", content: "Sorry, I couldn't connect to the backend. Make sure the API server is running on port 8000." },
       ]);
     } finally {
       setLoading(false);
@@ -210,8 +222,8 @@ export default function ChatPanel() {
           </div>
         ))}
 
-        {/* Typing indicator */}
-        {loading && (
+        {/* Typing indicator, until the first answer section streams in */}
+        {loading && !(messages[messages.length - 1]?.role === "assistant" && messages[messages.length - 1].content) && (
           <div className="flex gap-3 animate-fade-in">
             <div className="w-7 h-7 rounded-lg bg-amber-500/10 border border-amber-500/20 flex items-center justify-center flex-shrink-0">
               <Bot size={14} className="text-amber-400" />
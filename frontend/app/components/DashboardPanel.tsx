@@ -3,13 +3,15 @@
 import { useState, useEffect } from "react";
 import { DollarSign, TrendingUp, ShoppingBag, BarChart3, Package, Store, RefreshCw, AlertCircle } from "lucide-react";
 import { BarChart, Bar, XAxis, YAxis, Tooltip, ResponsiveContainer, PieChart, Pie, Cell } from "recharts";
-import { API, SalesSummary, ResearchRecord } from "../config/api";
+import { API, SalesSummary, ResearchRecord, ResearchHistoryPage } from "../config/api";
 
 const COLORS = ["#f59e0b", "#3b82f6", "#10b981", "#ef4444", "#8b5cf6", "#ec4899", "#06b6d4", "#f97316"];
 
 export default function DashboardPanel() {
   const [sales, setSales] = useState<SalesSummary | null>(null);
   const [research, setResearch] = useState<ResearchRecord[]>([]);
+  const [researchOutcomes, setResearchOutcomes] = useState<Record<string, number>>({});
+  const [researchTotal, setResearchTotal] = useState(0);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState("");
 
@@ -19,15 +21,17 @@ export default function DashboardPanel() {
     try {
       const [salesRes, researchRes] = await Promise.all([
         fetch(API.salesSummary(3)),
-        fetch(API.researchHistory),
+        fetch(API.researchHistory({ limit: 10 })),
       ]);
       if (salesRes.ok) {
         const salesData = await salesRes.json();
         if (!salesData.error) setSales(salesData);
       }
       if (researchRes.ok) {
-        const researchData = await researchRes.json();
+        const researchData: ResearchHistoryPage = await researchRes.json();
         setResearch(researchData.records || []);
+        setResearchOutcomes(researchData.outcomes || {});
+        setResearchTotal(researchData.total || 0);
       }
     } catch {
       setError("Could not connect to backend. Make sure the API is running.");
@@ -77,12 +81,10 @@ export default function DashboardPanel() {
     fill: COLORS[i % COLORS.length],
   })) || [];
 
-  const outcomeCount = { winner: 0, failed: 0, breakeven: 0 };
-  research.forEach((r) => {
-    if (r.outcome === "winner") outcomeCount.winner++;
-    else if (r.outcome === "failed") outcomeCount.failed++;
-    else outcomeCount.breakeven++;
-  });
+  // Counts cover the whole history; only the latest page of records is fetched.
+  const winners = researchOutcomes.winner || 0;
+  const failed = researchOutcomes.failed || 0;
+  const outcomeCount = { winner: winners, failed, breakeven: researchTotal - winners - failed };
 
   const outcomeData = [
     { name: "Winners", value: outcomeCount.winner, fill: "#10b981" },
@@ -3,17 +3,28 @@ const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
 export const API = {
   base: API_BASE_URL,
   chat: `${API_BASE_URL}/api/v1/chat`,
+  chatStream: `${API_BASE_URL}/api/v1/chat/stream`,
   chatHistory: (sessionId: string) => `${API_BASE_URL}/api/v1/chat/${sessionId}/history`,
   chatFeedback: `${API_BASE_URL}/api/v1/chat/feedback`,
   trends: (niche: string) => `${API_BASE_URL}/api/v1/trends/${encodeURIComponent(niche)}`,
+  trendsCompare: `${API_BASE_URL}/api/v1/trends/compare`,
   amazon: (niche: string) => `${API_BASE_URL}/api/v1/amazon/${encodeURIComponent(niche)}`,
   competitors: (product: string) => `${API_BASE_URL}/api/v1/competitors/${encodeURIComponent(product)}`,
   score: (product: string, niche?: string) => `${API_BASE_URL}/api/v1/score/${encodeURIComponent(product)}${niche ? `?niche=${encodeURIComponent(niche)}` : ""}`,
+  productSearch: (q: string, limit = 5) => `${API_BASE_URL}/api/v1/products/search?q=${encodeURIComponent(q)}&limit=${limit}`,
   report: (niche: string) => `${API_BASE_URL}/api/v1/report/${encodeURIComponent(niche)}`,
-  salesSummary: (months?: number) => `${API_BASE_URL}/api/v1/sales/summary${months ? `?months=${months}` : ""}`,
+  reportStream: (niche: string) => `${API_BASE_URL}/api/v1/report/${encodeURIComponent(niche)}/stream`,
+  salesSummary: (months?: number, groupBy?: "product" | "cluster") => {
+    const query = new URLSearchParams({ ...(months ? { months: String(months) } : {}), ...(groupBy ? { group_by: groupBy } : {}) }).toString();
+    return `${API_BASE_URL}/api/v1/sales/summary${query ? `?${query}` : ""}`;
+  },
+  salesClusters: `${API_BASE_URL}/api/v1/sales/clusters`,
   salesUpload: `${API_BASE_URL}/api/v1/sales/upload`,
   salesFiles: `${API_BASE_URL}/api/v1/sales/files`,
-  researchHistory: `${API_BASE_URL}/api/v1/research/history`,
+  researchHistory: (params: { niche?: string; outcome?: string; after?: string; limit?: number } = {}) => {
+    const query = new URLSearchParams(Object.entries(params).filter(([, v]) => v !== undefined).map(([k, v]) => [k, String(v)])).toString();
+    return `${API_BASE_URL}/api/v1/research/history${query ? `?${query}` : ""}`;
+  },
   niches: `${API_BASE_URL}/api/v1/niches`,
   analytics: `${API_BASE_URL}/api/v1/analytics`,
   health: `${API_BASE_URL}/api/v1/health`,
@@ -51,6 +62,36 @@ export interface ChatResponse {
   timestamp: string;
 }
 
+export type ChatStreamEvent =
+  | { event: "meta"; data: Pick<ChatResponse, "session_id" | "message" | "category" | "tool_used"> }
+  | { event: "citations"; data: Citation[] }
+  | { event: "section"; data: { index: number; markdown: string } }
+  | { event: "done"; data: Pick<ChatResponse, "tool_used" | "tool_result" | "processing_time" | "timestamp"> }
+  | { event: "error"; data: { detail: string } };
+
+/** Reads a text/event-stream response body, calling `onEvent` for each event as it arrives. */
+export async function readEvents<E extends { event: string; data: unknown }>(res: Response, onEvent: (e: E) => void): Promise<void> {
+  const reader = res.body!.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) return;
+    buffer += value;
+    let end;
+    while ((end = buffer.indexOf("\n\n")) >= 0) {
+      const block = buffer.slice(0, end);
+      buffer = buffer.slice(end + 2);
+      let event = "message";
+      let data = "";
+      for (const line of block.split("\n")) {
+        if (line.startsWith("event: ")) event = line.slice(7);
+        else if (line.startsWith("data: ")) data += line.slice(6);
+      }
+      onEvent({ event, data: data ? JSON.parse(data) : null } as E);
+    }
+  }
+}
+
 export interface TrendData {
   niche: string;
   period: string;
@@ -62,6 +103,27 @@ export interface TrendData {
   timestamp: string;
 }
 
+/** POST /api/v1/trends/compare. Series share one axis: point k covers `step_days` days from `series_start + k * step_days`. */
+export interface TrendComparison {
+  days: number;
+  window: number;
+  step_days: number;
+  points: number;
+  series_start: string;
+  end: string;
+  niches: {
+    niche: string;
+    current_interest: number;
+    rolling_avg: number;
+    trend_velocity: number;
+    slope_per_day: number;
+    trend_direction: string;
+    series: number[];
+    rolling: number[];
+  }[];
+  timestamp: string;
+}
+
 export interface AmazonProduct {
   asin: string;
   title: string;
@@ -100,6 +162,16 @@ export interface ProductScore {
   estimated_margin_pct: number;
   estimated_landed_cost: number;
   estimated_ad_cost_per_unit: number;
+  matched_product?: CatalogMatch | null;
+  candidates?: CatalogMatch[];
+  other_niche_matches?: CatalogMatch[];
+}
+
+export interface CatalogMatch {
+  title: string;
+  asin: string;
+  niche: string;
+  similarity: number;
 }
 
 export interface SalesSummary {
@@ -110,11 +182,17 @@ export interface SalesSummary {
   overall_margin: number;
   roas: number;
   total_orders: number;
-  top_products: { name: string; revenue: number; profit: number; quantity: number; orders: number }[];
+  top_products: { name: string; variants?: string[]; revenue: number; profit: number; quantity: number; orders: number }[];
   categories: { category: string; revenue: number; profit: number; quantity: number }[];
   stores: { store: string; revenue: number; profit: number }[];
 }
 
+export interface ProductClusters {
+  total_names: number;
+  total_clusters: number;
+  clusters: { cluster: string; names: string[] }[];
+}
+
 export interface ResearchRecord {
   id: string;
   date_researched: string;
@@ -127,6 +205,13 @@ export interface ResearchRecord {
   revenue_total: number;
 }
 
+export interface ResearchHistoryPage {
+  total: number;
+  outcomes: Record<string, number>;
+  records: ResearchRecord[];
+  next_cursor: string | null;
+}
+
 export interface Analytics {
   total_queries: number;
   queries_by_type: Record<string, number>;
@@ -141,4 +226,14 @@ export interface Analytics {
   knowledge_chunks: number;
   sales_records: number;
   research_records: number;
+  latency_ms?: Record<"stage" | "tool" | "route", Record<string, LatencySummary>>;
+  csv_parse?: { rows: number; bytes: number; seconds: number; rows_per_second: number | null; mb_per_second: number | null };
+}
+
+export interface LatencySummary {
+  count: number;
+  mean: number | null;
+  p50: number | null;
+  p95: number | null;
+  p99: number | null;
 }